@@ -0,0 +1,71 @@
+import asyncio
+import random
+import statistics
+import time
+
+from onx.server.ai import AiEngine
+from onx.server.ai import search
+
+BUDGET = 0.2
+BOARDS = ((3, 3), (5, 4), (8, 4), (10, 5), (14, 5))
+CONCURRENCY = (1, 2, 4, 8, 16, 32)
+
+
+def position(grid_size: int) -> tuple[int, int]:
+    # a few stones around the center of the board
+    rand = random.Random(grid_size)
+    center = grid_size // 2
+    boxes = {
+        (center + rand.randint(-1, 1)) * grid_size + center + rand.randint(-1, 1)
+        for _ in range(4)
+    }
+    own = other = 0
+    for num, box in enumerate(sorted(boxes)):
+        if num % 2:
+            other |= 1 << box
+        else:
+            own |= 1 << box
+    return other, own
+
+
+async def move(engine: AiEngine, grid_size: int, winning_length: int) -> float:
+    started = time.perf_counter()
+    await engine.search(grid_size, winning_length, *position(grid_size), 0, BUDGET)
+    return time.perf_counter() - started
+
+
+async def concurrent_moves(engine: AiEngine, games: int) -> list[float]:
+    return await asyncio.gather(*(move(engine, 14, 5) for _ in range(games)))
+
+
+def main() -> None:
+    print(f"{'grid':>4} {'win':>3} {'depth':>5} {'nodes':>7} {'nodes/s':>8}")
+    for grid_size, winning_length in BOARDS:
+        started = time.perf_counter()
+        _, depth, nodes = search(
+            grid_size, winning_length, *position(grid_size), 0, BUDGET
+        )
+        elapsed = time.perf_counter() - started
+        print(
+            f"{grid_size:>4} {winning_length:>3} {depth:>5} {nodes:>7} "
+            f"{nodes / elapsed:>8.0f}"
+        )
+
+    print()
+    print(f"{'games':>5} {'median move ms':>15} {'max move ms':>12}")
+    engine = AiEngine()
+    loop = asyncio.new_event_loop()
+    # warm the pool up
+    loop.run_until_complete(concurrent_moves(engine, 1))
+    for games in CONCURRENCY:
+        latencies = loop.run_until_complete(concurrent_moves(engine, games))
+        print(
+            f"{games:>5} {statistics.median(latencies) * 10**3:>15.0f} "
+            f"{max(latencies) * 10**3:>12.0f}"
+        )
+    engine.stop()
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from onx.server.analytics import analyze
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.journal import Journal
+
+GAMES = 20_000
+WORKERS = (1, os.cpu_count() or 1)
+
+
+async def write(directory: str) -> int:
+    journal = Journal(directory, segment_size=2**20)
+    context = GameContext(grid_size=8, winning_length=4)
+    moves = 0
+    for _ in range(GAMES):
+        game = Game(context)
+        players = [Player(id="first", ws=None), Player(id="second", ws=None)]  # type: ignore
+        game.add_player(players[0])
+        journal.created(game, players[0])
+        game.add_player(players[1])
+        game.toss()
+        journal.started(game)
+        for turn in random.sample(
+            range(context.grid_size**2), context.grid_size**2
+        ):
+            player = game.whose_turn
+            game.turn(player, turn)  # type: ignore
+            journal.turn(game, player, turn)  # type: ignore
+            if game.winner is not None:
+                break
+        journal.finished(game)
+        moves += game.moves
+    await journal.stop()
+    return moves
+
+
+def main() -> None:
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        moves = asyncio.run(write(directory))
+        print(f"{GAMES} games, {moves} moves")
+        print(f"{'workers':>7} {'seconds':>8} {'M moves/s':>10}")
+        for workers in sorted(set(WORKERS)):
+            started = time.perf_counter()
+            analyze(directory, workers)
+            elapsed = time.perf_counter() - started
+            print(f"{workers:>7} {elapsed:>8.2f} {moves / elapsed / 10**6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
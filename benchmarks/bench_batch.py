@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from onx.server.batch import evaluate
+from onx.server.bitboard import get_layout
+from onx.server.bitboard import is_winning_move
+from onx.server.game import BoxType
+
+BOARDS = 10_000
+
+
+# a board without a known last move is checked box by box
+def evaluate_python(grids: list[list[int]], grid_size: int, winning_length: int):
+    layout = get_layout(grid_size, winning_length)
+    results = []
+    for grid in grids:
+        boards = {BoxType.nought: 0, BoxType.cross: 0}
+        for box, box_type in enumerate(grid):
+            if box_type != BoxType.empty:
+                boards[box_type] |= 1 << box
+        winner = 0
+        for box, box_type in enumerate(grid):
+            if box_type != BoxType.empty and is_winning_move(
+                layout, boards[box_type], box
+            ):
+                winner = box_type
+                break
+        results.append((winner, winner or BoxType.empty not in grid))
+    return results
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(
+        f"{'grid':>4} {'win':>3} {'python boards/s':>16} {'numpy boards/s':>15} {'speedup':>8}"
+    )
+    for grid_size in (3, 5, 8, 10, 14):
+        for winning_length in range(3, min(grid_size, 5) + 1):
+            boards = rng.choice(
+                [BoxType.empty, BoxType.nought, BoxType.cross],
+                size=(BOARDS, grid_size, grid_size),
+                p=[0.5, 0.25, 0.25],
+            ).astype(np.int8)
+            grids = boards.reshape(BOARDS, -1).tolist()
+            started = time.perf_counter()
+            evaluate_python(grids, grid_size, winning_length)
+            python = BOARDS / (time.perf_counter() - started)
+            started = time.perf_counter()
+            evaluate(boards, winning_length)
+            batch = BOARDS / (time.perf_counter() - started)
+            print(
+                f"{grid_size:>4} {winning_length:>3} {python:>16.0f} {batch:>15.0f}"
+                f" {batch / python:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import random
+import time
+import uuid
+
+from aiohttp.http_websocket import WebSocketWriter
+
+from onx.deflate import DeflateWriter
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+
+LEVELS = (1, 6)
+REPEAT = 20
+
+
+class Protocol:
+    async def _drain_helper(self) -> None:
+        pass
+
+
+class Transport:
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+
+    def is_closing(self) -> bool:
+        return False
+
+
+# the json states of a game played at random to its end, as a player gets them
+def states(grid_size: int) -> list[str]:
+    game = Game(GameContext(grid_size=grid_size, winning_length=min(grid_size, 5)))
+    for _ in range(2):
+        game.add_player(Player(id=str(uuid.uuid4()), ws=None))  # type: ignore
+    game.toss()
+    frames = [game.encode_json("state")]
+    boxes = list(range(grid_size**2))
+    random.shuffle(boxes)
+    for box in boxes:
+        if game.winner is not None:
+            break
+        game.turn(game.whose_turn, box)  # type: ignore
+        frames.append(game.encode_json("state"))
+    return frames
+
+
+# bytes on the wire and cpu per frame of a connection that gets every frame
+async def measure(frames: list[str], level: int | None) -> tuple[float, float]:
+    transport = Transport()
+    writer = WebSocketWriter(Protocol(), transport)  # type: ignore
+    if level is not None:
+        writer = DeflateWriter(
+            WebSocketWriter(Protocol(), transport, compress=15),  # type: ignore
+            wbits=15,
+            level=level,
+            min_size=0,
+        )
+    started = time.process_time()
+    for _ in range(REPEAT):
+        for frame in frames:
+            await writer.send(frame)
+    cpu = (time.process_time() - started) / REPEAT / len(frames)
+    return transport.size / REPEAT / len(frames), cpu
+
+
+async def run() -> None:
+    header = f"{'grid':>4} {'json B':>7} {'plain us':>9}"
+    for level in LEVELS:
+        header += f" {f'level {level} B':>10} {'saved':>6} {'us':>6}"
+    print(header)
+    random.seed(0)
+    for grid_size in range(3, 15):
+        frames = states(grid_size)
+        size, cpu = await measure(frames, None)
+        line = f"{grid_size:>4} {size:>7.0f} {cpu * 10**6:>9.2f}"
+        for level in LEVELS:
+            deflated, deflate_cpu = await measure(frames, level)
+            line += (
+                f" {deflated:>10.0f} {1 - deflated / size:>6.0%}"
+                f" {deflate_cpu * 10**6:>6.2f}"
+            )
+        print(line)
+
+
+def main() -> None:
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import random
+import timeit
+
+from onx.server.bitboard import is_winning_move
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+
+POSITIONS = 200
+REPEAT = 5
+
+
+def legacy_is_winner(game: Game, grid: list[int], box_type: int, turn: int) -> bool:
+    return any(
+        any(
+            len(s.replace(str(BoxType.empty), "")) == game.context.winning_length
+            for s in "".join(map(lambda x: str(grid[x]), line)).split(
+                str(BoxType.opposite[box_type])
+            )
+        )
+        for line in game.gen_winning_lines(turn)
+    )
+
+
+def gen_positions(game: Game) -> list[tuple[list[int], dict[int, int], int, int]]:
+    size = game.context.grid_size**2
+    positions = []
+    for _ in range(POSITIONS):
+        boxes = random.sample(range(size), random.randint(1, size))
+        game.grid = [BoxType.empty] * size
+        grid = game.grid
+        for num, box in enumerate(boxes):
+            grid[box] = BoxType.cross if num % 2 else BoxType.nought
+        game.grid = grid
+        positions.append((grid, dict(game.boards), grid[boxes[-1]], boxes[-1]))
+    return positions
+
+
+def main() -> None:
+    random.seed(0)
+    print(
+        f"{'grid':>4} {'win':>3} {'legacy us':>10} {'bitboard us':>12} {'speedup':>8}"
+    )
+    for grid_size in range(3, 15):
+        for winning_length in range(3, min(grid_size, 5) + 1):
+            game = Game(GameContext(grid_size=grid_size, winning_length=winning_length))
+            positions = gen_positions(game)
+            legacy = min(
+                timeit.repeat(
+                    lambda: [
+                        legacy_is_winner(game, grid, box_type, turn)
+                        for grid, _, box_type, turn in positions
+                    ],
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            bitboard = min(
+                timeit.repeat(
+                    lambda: [
+                        is_winning_move(game.layout, boards[box_type], turn)
+                        for _, boards, box_type, turn in positions
+                    ],
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            print(
+                f"{grid_size:>4} {winning_length:>3} "
+                f"{legacy / POSITIONS * 10**6:>10.2f} "
+                f"{bitboard / POSITIONS * 10**6:>12.2f} "
+                f"{legacy / bitboard:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+import time
+
+RUNS = 5
+TOP = 8
+# modules imported by each entry path before it does any work
+PATHS = (
+    ("cli", "run"),
+    ("client", "onx.tui.app"),
+    ("server", "onx.server.event_loop"),
+)
+
+
+def import_times(module: str) -> list[tuple[int, int, str]]:
+    # -X importtime lines are "import time: self | cumulative | name" where the
+    # name is indented by two spaces per nesting level
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append((depth, int(cumulative), name.strip()))
+    return times
+
+
+def breakdown(module: str) -> tuple[int, list[tuple[int, str]]]:
+    times = import_times(module)
+    end = max(num for num, (depth, _, name) in enumerate(times) if name == module)
+    # the entry module is preceded by the interpreter startup imports
+    first = 1 + max(
+        (num for num, (depth, _, _) in enumerate(times[:end]) if depth == 0),
+        default=-1,
+    )
+    children = [
+        (cumulative, name) for depth, cumulative, name in times[first:end] if depth == 1
+    ]
+    return times[end][1], sorted(children, reverse=True)
+
+
+def command_time(*args: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, *args], capture_output=True, check=True)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    for path, module in PATHS:
+        total, children = min(breakdown(module) for _ in range(RUNS))
+        print(f"{path} import {module} {total / 1000:.1f}ms")
+        for cumulative, name in children[:TOP]:
+            print(f"  {cumulative / 1000:>7.1f}ms {name}")
+    interpreter = min(command_time("-c", "pass") for _ in range(RUNS))
+    cli_help = min(command_time("run.py", "--help") for _ in range(RUNS))
+    print(f"onx --help {cli_help * 1000:.1f}ms, interpreter {interpreter * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
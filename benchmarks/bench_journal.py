@@ -0,0 +1,51 @@
+import asyncio
+import tempfile
+import time
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.journal import Journal
+from onx.server.journal import read_journal
+from onx.server.journal import RECORD
+
+RECORDS = 1_000_000
+# a day of a million games, created, started, turns and finished
+DAY = 10_000_000
+
+
+async def write(directory: str) -> float:
+    journal = Journal(directory, segment_size=16 * 2**20)
+    game = Game(GameContext(grid_size=14, winning_length=5))
+    for player_id in ("nought", "cross"):
+        game.add_player(Player(id=player_id, ws=None))  # type: ignore
+    game.toss()
+    player = game.players[0]
+    started = time.perf_counter()
+    for num in range(RECORDS):
+        journal.turn(game, player, num % 196)
+    appended = time.perf_counter() - started
+    await journal.stop()
+    return appended
+
+
+def scan(directory: str) -> float:
+    started = time.perf_counter()
+    turns = 0
+    for record in read_journal(directory):
+        turns += record.value
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        appended = asyncio.run(write(directory))
+        scanned = scan(directory)
+    print(f"record {RECORD.size} bytes")
+    print(f"append {appended / RECORDS * 10**6:.2f} us/record on the loop")
+    print(f"scan {RECORDS / scanned / 10**6:.2f} M records/s")
+    print(f"a day of {DAY // 10**6} M records scans in {scanned * DAY / RECORDS:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
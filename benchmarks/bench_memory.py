@@ -0,0 +1,72 @@
+import asyncio
+import gc
+import tracemalloc
+import uuid
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameStatus
+from onx.server.game import Player
+
+GAMES = 2_000
+# noughts and crosses fill the first two rows of a 3x3 grid in turn
+TURNS = (0, 3, 1, 4, 2)
+
+
+class NullWebSocket:
+    ws_protocol = None
+
+    async def send_str(self, data: str) -> None:
+        pass
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+
+WS = NullWebSocket()
+
+
+async def make_game(stage: int) -> Game:
+    game = Game(GameContext())
+    game.add_player(Player(id=str(uuid.uuid4()), ws=WS))  # type: ignore
+    await game.publish_state()
+    if stage == GameStatus.awaiting:
+        return game
+    game.add_player(Player(id=str(uuid.uuid4()), ws=WS))  # type: ignore
+    game.toss()
+    await game.publish_state()
+    turns = TURNS if stage == GameStatus.finished else TURNS[:2]
+    first = game.whose_turn
+    second = game.players[1] if first is game.players[0] else game.players[0]
+    for num, turn in enumerate(turns):
+        game.turn(second if num % 2 else first, turn)  # type: ignore
+        await game.publish_state(delta=True)
+    assert game.status == stage
+    return game
+
+
+async def measure(stage: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [await make_game(stage) for _ in range(GAMES)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return size / GAMES
+
+
+def main() -> None:
+    print(f"{'stage':>12} {'bytes/game':>11} {'MB/10^6 games':>14}")
+    for name, stage in (
+        ("awaiting", GameStatus.awaiting),
+        ("in progress", GameStatus.in_progress),
+        ("finished", GameStatus.finished),
+    ):
+        per_game = asyncio.run(measure(stage))
+        print(f"{name:>12} {per_game:>11.0f} {per_game * 10**6 / 2**20:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
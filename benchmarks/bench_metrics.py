@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import random
+import time
+import timeit
+import uuid
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GamePool
+from onx.server.game import GameRegistry
+from onx.server.game import GameStatus
+from onx.server.game import Player
+
+GAMES = 500
+REPEAT = 5
+# awaiting games when the metrics are scraped
+SCRAPED_GAMES = 10_000
+
+
+class NullWebSocket:
+    ws_protocol = None
+
+    async def send_str(self, data: str) -> None:
+        pass
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+
+WS = NullWebSocket()
+
+
+def new_games(context: GameContext) -> list[tuple[Game, list[int]]]:
+    games = []
+    for _ in range(GAMES):
+        game = Game(context)
+        for _ in range(2):
+            game.add_player(Player(id=str(uuid.uuid4()), ws=WS))  # type: ignore
+        game.toss()
+        turns = random.sample(range(context.grid_size**2), context.grid_size**2)
+        games.append((game, turns))
+    return games
+
+
+# the turn path of the registry without the instrumentation
+async def play_bare(registry: GameRegistry, game: Game, player: Player, turn: int):
+    game.turn(player, turn)
+    if game.status == GameStatus.finished:
+        registry.retire(game)
+    await game.publish_state(delta=True)
+
+
+async def run(context: GameContext, instrumented: bool) -> float:
+    registry = GameRegistry()
+    play = registry.play if instrumented else functools.partial(play_bare, registry)
+    games = new_games(context)
+    turns = 0
+    started = time.perf_counter()
+    for game, boxes in games:
+        for box in boxes:
+            await play(game, game.whose_turn, box)  # type: ignore
+            turns += 1
+            if game.status == GameStatus.finished:
+                break
+    return (time.perf_counter() - started) / turns
+
+
+# the instrumentation a turn adds to the registry, measured alone
+def instrumentation() -> float:
+    metrics = GameRegistry().metrics
+
+    def turn() -> None:
+        started = time.perf_counter()
+        turned = time.perf_counter()
+        metrics.turn_seconds.observe(turned - started)
+        metrics.turns.inc()
+        metrics.publish_seconds.observe(time.perf_counter() - turned)
+
+    number = 100_000
+    return min(timeit.repeat(turn, number=number, repeat=REPEAT)) / number
+
+
+async def scrape() -> float:
+    registry = GameRegistry()
+    for num in range(SCRAPED_GAMES):
+        context = GameContext(grid_size=3 + num % 12)
+        pool = GamePool(context, Player(id=str(num), ws=WS), registry)  # type: ignore
+        registry.awaiting[str(num)] = pool
+    started = time.perf_counter()
+    registry.metrics.expose()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    random.seed(0)
+    print(f"{'grid':>4} {'bare us/turn':>13} {'metrics us/turn':>16} {'overhead':>9}")
+    for grid_size in (3, 8, 14):
+        context = GameContext(grid_size=grid_size, winning_length=min(grid_size, 5))
+        # interleaved, so a noisy neighbour slows both alike
+        runs = [
+            (asyncio.run(run(context, False)), asyncio.run(run(context, True)))
+            for _ in range(REPEAT)
+        ]
+        bare = min(pair[0] for pair in runs)
+        instrumented = min(pair[1] for pair in runs)
+        print(
+            f"{grid_size:>4} {bare * 10**6:>13.2f} {instrumented * 10**6:>16.2f}"
+            f" {instrumented / bare - 1:>+9.1%}"
+        )
+    print(f"instrumentation {instrumentation() * 10**6:.2f} us/turn")
+    scraped = asyncio.run(scrape())
+    print(f"scrape with {SCRAPED_GAMES} awaiting games {scraped * 10**3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
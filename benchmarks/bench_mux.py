@@ -0,0 +1,91 @@
+import asyncio
+import time
+import uuid
+from typing import Any
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from onx.models import GameStatus
+from onx.server.app import get_application
+from onx.server.connections import ConnectionLimits
+from onx.server.connections import Connections
+
+GAMES = (10, 100, 500)
+
+
+async def receive(ws: aiohttp.ClientWebSocketResponse) -> Any:
+    return await ws.receive_json()
+
+
+# a connection per player, as the tui client plays
+async def single(
+    server: TestServer, session: aiohttp.ClientSession, games: int
+) -> None:
+    sockets = []
+    for _ in range(2 * games):
+        sockets.append(
+            await session.ws_connect(
+                server.make_url("/ws"),
+                headers={"Cookie": f"player_id={uuid.uuid4()}"},
+            )
+        )
+    await asyncio.gather(*(receive(ws) for ws in sockets))
+    # the first of a pair got the awaiting state before the start
+    await asyncio.gather(*(receive(ws) for ws in sockets[::2]))
+    await asyncio.gather(*(ws.close() for ws in sockets))
+
+
+# both players of every game over one multiplexed connection
+async def mux(server: TestServer, session: aiohttp.ClientSession, games: int) -> None:
+    ws = await session.ws_connect(
+        server.make_url("/ws/mux"), headers={"Cookie": f"player_id={uuid.uuid4()}"}
+    )
+    started = 0
+    for num in range(2 * games):
+        await ws.send_json({"game": f"g{num}", "operation": "join"})
+    while started < 2 * games:
+        events = await receive(ws)
+        started += sum(
+            event["data"]["payload"]["status"] == GameStatus.in_progress
+            for event in events
+        )
+    await ws.close()
+
+
+async def run(games: int) -> tuple[float, float]:
+    app = get_application()
+    registry = app["registry"]
+    registry.connections = Connections(
+        registry.metrics,
+        ConnectionLimits(
+            max_connections=0,
+            max_connections_per_ip=0,
+            connection_rate=0,
+            message_rate=0,
+            ip_message_rate=0,
+            mux_message_rate=0,
+        ),
+    )
+    timings = []
+    async with TestServer(app) as server:
+        # a connection per player is over the default pool limit of a session
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for play in (single, mux):
+                started = time.perf_counter()
+                await play(server, session, games)
+                timings.append(time.perf_counter() - started)
+    return timings[0], timings[1]
+
+
+# time to get every game of a batch started, on localhost
+def main() -> None:
+    print(f"{'games':>6} {'connections ms':>15} {'multiplexed ms':>15}")
+    for games in GAMES:
+        single_time, mux_time = asyncio.run(run(games))
+        print(f"{games:>6} {single_time * 10**3:>15.1f} {mux_time * 10**3:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
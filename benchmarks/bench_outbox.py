@@ -0,0 +1,70 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.outbox import Outbox
+
+TURNS = 40
+# a write to the slow peer takes that long, as on a congested link
+SLOW_SEND = 0.02
+
+
+# in-memory sockets, so the numbers show the time a turn spends publishing
+# without the kernel and the network
+class NullWebSocket:
+    ws_protocol = None
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.frames = 0
+
+    async def send_str(self, data: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.frames += 1
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.send_str("")
+
+    async def close(self) -> None:
+        pass
+
+
+async def run(queued: bool) -> tuple[float, int]:
+    game = Game(GameContext(grid_size=14, winning_length=5))
+    sockets = [NullWebSocket(), NullWebSocket(SLOW_SEND)]
+    outboxes = [Outbox(ws, size=TURNS) for ws in sockets]  # type: ignore
+    for ws, outbox in zip(sockets, outboxes):
+        if queued:
+            outbox.start()
+        game.add_player(
+            Player(id=str(uuid.uuid4()), ws=outbox if queued else ws)  # type: ignore
+        )
+    game.toss()
+    publish = []
+    for turn in range(TURNS):
+        started = time.perf_counter()
+        game.turn(game.whose_turn, turn)  # type: ignore
+        await game.publish_state()
+        publish.append(time.perf_counter() - started)
+        # the fast player answers right away
+        await asyncio.sleep(0)
+    for outbox in outboxes:
+        if queued:
+            await outbox.close()
+    return statistics.median(publish), sockets[1].frames
+
+
+def main() -> None:
+    print(f"{'sockets':>8} {'turn publish us':>16} {'slow peer frames':>17}")
+    for queued in (False, True):
+        publish, frames = asyncio.run(run(queued))
+        name = "outbox" if queued else "direct"
+        print(f"{name:>8} {publish * 10**6:>16.1f} {frames:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import random
+import timeit
+import uuid
+
+from onx import binary
+from onx.models import WsEvent
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+
+NUMBER = 2000
+
+
+def gen_game(grid_size: int) -> Game:
+    game = Game(GameContext(grid_size=grid_size))
+    game.add_player(Player(id=str(uuid.uuid4()), ws=None))  # type: ignore
+    game.add_player(Player(id=str(uuid.uuid4()), ws=None))  # type: ignore
+    game.toss()
+    game.grid = [
+        random.choice([BoxType.empty, BoxType.nought, BoxType.cross])
+        for _ in range(grid_size**2)
+    ]
+    return game
+
+
+def measure(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 10**6
+
+
+def main() -> None:
+    random.seed(0)
+    print(
+        f"{'grid':>4} {'json B':>7} {'binary B':>9} "
+        f"{'json enc us':>12} {'binary enc us':>14} "
+        f"{'json dec us':>12} {'binary dec us':>14}"
+    )
+    for grid_size in range(3, 15):
+        game = gen_game(grid_size)
+        player = game.players[0]
+        text = game.state_event().json()
+        data = game.encode_binary("state", game.slot(player))
+        print(
+            f"{grid_size:>4} {len(text.encode()):>7} {len(data):>9} "
+            f"{measure(lambda: game.state_event().json()):>12.2f} "
+            f"{measure(lambda: game.encode_binary('state', 1)):>14.2f} "
+            f"{measure(lambda: WsEvent.parse_raw(text)):>12.2f} "
+            f"{measure(lambda: binary.decode_event(data, player.id)):>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
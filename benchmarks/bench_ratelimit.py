@@ -0,0 +1,42 @@
+import json
+import time
+import timeit
+
+from pydantic.error_wrappers import ValidationError
+
+from onx import codec
+from onx.server.connections import TokenBucket
+
+NUMBER = 20000
+
+# frames a flooding client sends, a valid turn and a malformed operation that
+# goes through pydantic validation before it is rejected
+FRAMES = {
+    "turn": json.dumps({"operation": "turn", "payload": {"turn": 4}}),
+    "malformed": json.dumps({"operation": "turn", "payload": {"turn": "x" * 64}}),
+}
+
+
+def parse(frame: str) -> None:
+    try:
+        codec.decode_operation(frame)
+    except ValidationError:
+        pass
+
+
+def measure(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 10**6
+
+
+def main() -> None:
+    # an empty bucket, every frame is dropped
+    bucket = TokenBucket(rate=0.001, burst=1)
+    bucket.take(time.monotonic())
+    dropped = measure(lambda: bucket.take(time.monotonic()))
+    print(f"{'frame':>10} {'parsed us':>10} {'dropped us':>11}")
+    for name, frame in FRAMES.items():
+        print(f"{name:>10} {measure(lambda: parse(frame)):>10.2f} {dropped:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+
+from onx.server.game import GameContext
+from onx.server.selfplay import play_batch
+from onx.server.selfplay import run
+
+GAMES = 2000
+CONTEXTS = (
+    GameContext(grid_size=3, winning_length=3),
+    GameContext(grid_size=8, winning_length=5),
+    GameContext(grid_size=14, winning_length=5),
+)
+
+
+# full games of random policies, so the time is spent in Game.turn and in
+# picking an empty box
+def main() -> None:
+    print(f"{'context':>7} {'games/s':>9} {'moves/s':>10} {'pool games/s':>13}")
+    for context in CONTEXTS:
+        stats = play_batch(
+            context.grid_size, context.winning_length, ("random", "random"), GAMES, 0
+        )
+        summary, elapsed = run([context], ("random", "random"), GAMES * 4, batch=GAMES)
+        print(
+            f"{context.key:>7} {stats.games / stats.seconds:>9.0f} "
+            f"{stats.moves / stats.seconds:>10.0f} "
+            f"{summary[context.key].games / elapsed:>13.0f}"
+        )
+    print(f"pool of {os.cpu_count()} processes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameRegistry
+from onx.server.game import Player
+from onx.server.snapshot import load
+
+# a full registry of a million players
+GAMES = 500_000
+CLAIMS = 100_000
+
+
+def fill(registry: GameRegistry) -> None:
+    context = GameContext(grid_size=14, winning_length=5)
+    for num in range(GAMES):
+        game = Game(context)
+        for side in range(2):
+            player = Player(id=f"{num:032x}-{side}", ws=None)  # type: ignore
+            game.add_player(player)
+            registry.active_games[player.id] = game
+        game.toss()
+        game.turn(game.whose_turn, num % 196)
+
+
+def main() -> None:
+    registry = GameRegistry()
+    fill(registry)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.snapshot")
+        started = time.perf_counter()
+        saved = registry.save(path)
+        dumped = time.perf_counter() - started
+        size = os.path.getsize(path)
+        del registry
+
+        restored = GameRegistry()
+        started = time.perf_counter()
+        restored.snapshot = load(path)
+        loaded = time.perf_counter() - started
+    started = time.perf_counter()
+    for num in range(CLAIMS):
+        restored.restore(f"{num:032x}-0")
+    claimed = time.perf_counter() - started
+    print(f"snapshot of {saved} games {size / 2**20:.0f} MiB")
+    print(f"dump {dumped:.2f}s")
+    print(f"load and index {loaded:.2f}s")
+    print(f"restore {claimed / CLAIMS * 10**6:.2f} us/game on reconnect")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import io
+import time
+from unittest import mock
+
+from pyfiglet import Figlet  # type: ignore
+from rich.console import Console
+
+from onx.tui import tile
+from onx.tui.tile import FigletText
+
+REDRAWS = 20
+# tile sizes of a 14x14 and a 3x3 board in a 200x60 terminal
+BOARDS = ((14, 14, 4), (3, 66, 20))
+
+
+def uncached(text: str, font_name: str, width: int) -> str:
+    # a font load and a render per tile, as before the cache
+    return Figlet(font=font_name, width=width).renderText(text).rstrip("\n")
+
+
+def redraw(console: Console, grid_size: int, width: int, height: int) -> float:
+    options = console.options.update(width=width, height=height)
+    started = time.perf_counter()
+    for num in range(grid_size**2):
+        console.render_lines(FigletText(("0", "X", " ")[num % 3]), options)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    console = Console(file=io.StringIO(), width=200, height=60)
+    for grid_size, width, height in BOARDS:
+        with mock.patch.object(tile, "render_glyph", uncached):
+            before = min(
+                redraw(console, grid_size, width, height) for _ in range(REDRAWS)
+            )
+        tile.render_glyph.cache_clear()
+        cold = redraw(console, grid_size, width, height)
+        after = min(redraw(console, grid_size, width, height) for _ in range(REDRAWS))
+        print(
+            f"{grid_size}x{grid_size} board redraw: uncached {before * 1000:.2f}ms "
+            f"first {cold * 1000:.2f}ms cached {after * 1000:.2f}ms "
+            f"x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.watchers import stream
+
+TURNS = 20
+# one watcher in a hundred never drains its socket
+STALLED_EVERY = 100
+
+
+# watchers are served by in-memory sockets, so the numbers show the server side
+# cost of the fan out without the kernel and the network
+class Delivery:
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.count = 0
+        self.done = asyncio.Event()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.done.clear()
+
+    def add(self) -> None:
+        self.count += 1
+        if self.count == self.expected:
+            self.done.set()
+
+
+class NullWebSocket:
+    ws_protocol = None
+
+    def __init__(self, delivery: Delivery | None = None, stalled: bool = False):
+        self.delivery = delivery
+        self.stalled = stalled
+
+    async def send_str(self, data: str) -> None:
+        if self.stalled:
+            await asyncio.sleep(60)
+        # a real socket write yields to the loop as well
+        await asyncio.sleep(0)
+        if self.delivery is not None:
+            self.delivery.add()
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+async def run(watchers: int) -> tuple[float, float]:
+    game = Game(GameContext(grid_size=14, winning_length=5))
+    for _ in range(2):
+        game.add_player(Player(id=str(uuid.uuid4()), ws=NullWebSocket()))  # type: ignore
+    game.toss()
+    delivery = Delivery(watchers - len(range(0, watchers, STALLED_EVERY)))
+    sockets = [
+        NullWebSocket(delivery, stalled=not num % STALLED_EVERY)
+        for num in range(watchers)
+    ]
+    broadcast = game.watch()
+    tasks = [asyncio.create_task(stream(ws, broadcast)) for ws in sockets]  # type: ignore
+    await delivery.done.wait()
+    publish, delivered = [], []
+    for turn in range(TURNS):
+        delivery.reset()
+        started = time.perf_counter()
+        game.turn(game.whose_turn, turn)  # type: ignore
+        await game.publish_state(delta=True)
+        publish.append(time.perf_counter() - started)
+        await delivery.done.wait()
+        delivered.append(time.perf_counter() - started)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return statistics.median(publish), statistics.median(delivered)
+
+
+def main() -> None:
+    print(f"{'watchers':>8} {'player publish us':>18} {'all watchers ms':>16}")
+    for watchers in (10, 100, 1000, 10000):
+        publish, delivery = asyncio.run(run(watchers))
+        print(f"{watchers:>8} {publish * 10**6:>18.1f} {delivery * 10**3:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
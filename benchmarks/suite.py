@@ -0,0 +1,196 @@
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from collections.abc import Callable
+from datetime import datetime
+from datetime import timezone
+
+import click
+
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+# a measured batch runs at least that long, the fastest of REPEAT batches wins
+BATCH_TIME = 0.02
+REPEAT = 7
+
+
+class NullWebSocket:
+    ws_protocol = None
+
+
+def contexts() -> list[GameContext]:
+    return [
+        GameContext(grid_size=grid_size, winning_length=winning_length)
+        for grid_size in range(3, 15)
+        for winning_length in range(3, min(grid_size, 5) + 1)
+    ]
+
+
+def new_game(context: GameContext) -> Game:
+    game = Game(context)
+    game.add_player(Player(id="nought", ws=NullWebSocket()))  # type: ignore
+    game.add_player(Player(id="cross", ws=NullWebSocket()))  # type: ignore
+    game.toss()
+    return game
+
+
+def play(context: GameContext, turns: list[int]) -> None:
+    game = new_game(context)
+    for turn in turns:
+        game.turn(game.whose_turn, turn)  # type: ignore
+        if game.winner is not None:
+            break
+
+
+def last_move_win(context: GameContext) -> tuple[Game, Player, int]:
+    # the minor diagonal is checked last, the rest of the board is taken by the
+    # other side, so the winning line is found after every other line
+    size, length = context.grid_size, context.winning_length
+    start = max(0, min(size // 2 - length // 2, size - length))
+    line = [row * size + size - 1 - row for row in range(start, start + length)]
+    game = new_game(context)
+    player = game.players[0]
+    other = BoxType.opposite[player.box_type]
+    game.grid = [player.box_type if box in line else other for box in range(size**2)]
+    return game, player, line[len(line) // 2]
+
+
+def mid_game(context: GameContext) -> Game:
+    game = new_game(context)
+    rand = random.Random(context.key)
+    boxes = rand.sample(range(context.grid_size**2), context.grid_size**2 // 2)
+    for box in boxes:
+        game.turn(game.whose_turn, box)  # type: ignore
+        if game.winner is not None:
+            break
+    return game
+
+
+def cases(context: GameContext) -> dict[str, Callable[[], object]]:
+    rand = random.Random(context.key)
+    turns = rand.sample(range(context.grid_size**2), context.grid_size**2)
+    won, winner, last_turn = last_move_win(context)
+    game = mid_game(context)
+    return {
+        "random_game": lambda: play(context, turns),
+        "is_winner_last_move": lambda: won.is_winner(winner, last_turn),
+        "gen_winning_lines": lambda: won.gen_winning_lines(last_turn),
+        "to_dict": game.to_dict,
+        "models_json": lambda: game.state_event().json(),
+        "codec_json": lambda: game.encode_json("state"),
+        "binary": lambda: game.encode_binary("state", 1),
+    }
+
+
+def measure(func: Callable[[], object]) -> float:
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < BATCH_TIME:
+        number *= 2
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def run_suite(selected: str) -> dict[str, float]:
+    results = {}
+    for context in contexts():
+        for name, func in cases(context).items():
+            case = f"{context.key}/{name}"
+            if selected in case:
+                results[case] = measure(func) * 10**6
+    return results
+
+
+def load(path: str) -> dict[str, float]:
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+@click.group()
+def main() -> None:
+    """
+    Engine micro-benchmarks. Times are microseconds per operation.
+    """
+
+
+@main.command()
+@click.option("-o", "--output", default=DEFAULT_BASELINE, help="Results file.")
+@click.option("-k", "--select", default="", help="Run cases containing it only.")
+def run(output: str, select: str) -> None:
+    """
+    Run the suite and save the results.
+    """
+    started = time.perf_counter()
+    results = run_suite(select)
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": datetime.now(timezone.utc).isoformat(),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    click.echo(
+        f"{len(results)} cases in {time.perf_counter() - started:.0f}s saved to {output}"
+    )
+
+
+@main.command()
+@click.argument("baseline", default=DEFAULT_BASELINE)
+@click.option(
+    "-c",
+    "--current",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Results file to compare, the suite is run if omitted.",
+)
+@click.option("-k", "--select", default="", help="Compare cases containing it only.")
+@click.option(
+    "-t",
+    "--threshold",
+    default=0.1,
+    show_default=True,
+    help="Slowdown ratio reported as a regression.",
+)
+def compare(baseline: str, current: str | None, select: str, threshold: float) -> None:
+    """
+    Compare results with a baseline, exit with 1 on regressions.
+    """
+    if not os.path.exists(baseline):
+        raise click.ClickException(
+            f"No baseline at {baseline}, save one with "
+            f"`python -m benchmarks.suite run -o {baseline}` first"
+        )
+    base = load(baseline)
+    results = load(current) if current else run_suite(select)
+    regressions = 0
+    click.echo(f"{'case':<32} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for case, value in results.items():
+        if case not in base or select not in case:
+            continue
+        change = value / base[case] - 1
+        flag = ""
+        if change > threshold:
+            flag = " slower"
+            regressions += 1
+        elif change < -threshold:
+            flag = " faster"
+        click.echo(
+            f"{case:<32} {base[case]:>12.2f} {value:>12.2f} {change:>+8.1%}{flag}"
+        )
+    if regressions:
+        click.echo(f"{regressions} cases are slower by more than {threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
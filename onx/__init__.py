@@ -1,5 +1,3 @@
-from pathlib import Path
+from onx._version import __version__
 
-from single_source import get_version
-
-__version__ = get_version(__name__, Path(__file__).parent.parent)
+__all__ = ["__version__"]
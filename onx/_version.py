@@ -0,0 +1,2 @@
+# written by make release, read instead of the package metadata at import
+__version__ = "0.3.1"
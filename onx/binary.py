@@ -0,0 +1,155 @@
+import struct
+
+from onx.models import WsErrorEvent
+from onx.models import WsErrorEventPayload
+from onx.models import WsEvent
+from onx.models import WsGameDeltaEvent
+from onx.models import WsGameDeltaPayload
+from onx.models import WsGameSnapshotEvent
+from onx.models import WsGameSnapshotPayload
+from onx.models import WsOperation
+from onx.models import WsResyncOperation
+
+PROTOCOL = "onx.binary.v1"
+
+# player ids do not fit a fixed layout, so the other player is reported by name
+OPPONENT = "opponent"
+
+
+class MessageType:
+    # server events
+    state: int = 1
+    delta: int = 2
+    error: int = 3
+    # client operations
+    turn: int = 1
+    resync: int = 2
+
+
+class DecodeError(ValueError):
+    def __str__(self):
+        return "invalid binary message"
+
+
+HEADER = struct.Struct("!B")
+# type, seq, status, whose turn slot, winner slot, recipient slot, grid size
+STATE = struct.Struct("!BIHBBBB")
+# type, seq, status, whose turn slot, winner slot, recipient slot, turn, box type
+DELTA = struct.Struct("!BIHBBBBB")
+# type, turn
+TURN = struct.Struct("!BB")
+
+
+def pack_grid(grid: list[int]) -> bytes:
+    # box types 1..3 fit two bits as 0..2, four boxes per byte
+    packed = bytearray((len(grid) + 3) // 4)
+    for num, box_type in enumerate(grid):
+        packed[num >> 2] |= (box_type - 1) << ((num & 3) << 1)
+    return bytes(packed)
+
+
+def unpack_grid(packed: bytes, grid_size: int, offset: int = 0) -> list[int]:
+    return [
+        (packed[offset + (num >> 2)] >> ((num & 3) << 1) & 3) + 1
+        for num in range(grid_size**2)
+    ]
+
+
+# one argument per field of the frame
+def encode_state(  # pylint: disable=too-many-arguments
+    seq: int,
+    status: int,
+    whose_turn: int,
+    winner: int,
+    slot: int,
+    grid_size: int,
+    grid: list[int],
+) -> bytes:
+    return STATE.pack(
+        MessageType.state, seq, status, whose_turn, winner, slot, grid_size
+    ) + pack_grid(grid)
+
+
+# one argument per field of the frame
+def encode_delta(  # pylint: disable=too-many-arguments
+    seq: int,
+    status: int,
+    whose_turn: int,
+    winner: int,
+    slot: int,
+    turn: int,
+    box_type: int,
+) -> bytes:
+    return DELTA.pack(
+        MessageType.delta, seq, status, whose_turn, winner, slot, turn, box_type
+    )
+
+
+def encode_error(message: str) -> bytes:
+    return HEADER.pack(MessageType.error) + message.encode()
+
+
+def encode_operation(operation: WsOperation | WsResyncOperation) -> bytes:
+    if isinstance(operation, WsResyncOperation):
+        return HEADER.pack(MessageType.resync)
+    return TURN.pack(MessageType.turn, operation.payload.turn)
+
+
+# returns a turn number, or None for a resync operation
+def decode_operation(data: bytes) -> int | None:
+    if len(data) == TURN.size and data[0] == MessageType.turn:
+        return data[1]
+    if len(data) == HEADER.size and data[0] == MessageType.resync:
+        return None
+    raise DecodeError()
+
+
+def _player_id(slot: int, recipient_slot: int, player_id: str) -> str | None:
+    if not slot:
+        return None
+    return player_id if slot == recipient_slot else OPPONENT
+
+
+def decode_event(data: bytes, player_id: str) -> WsEvent:
+    if not data:
+        raise DecodeError()
+    if data[0] == MessageType.state and len(data) >= STATE.size:
+        _, seq, status, whose_turn, winner, slot, grid_size = STATE.unpack_from(data)
+        if len(data) != STATE.size + (grid_size**2 + 3) // 4:
+            raise DecodeError()
+        return WsEvent.construct(
+            data=WsGameSnapshotEvent.construct(
+                payload=WsGameSnapshotPayload.construct(
+                    whose_turn=_player_id(whose_turn, slot, player_id),
+                    grid=unpack_grid(data, grid_size, STATE.size),
+                    winner=_player_id(winner, slot, player_id),
+                    status=status,
+                    seq=seq,
+                )
+            )
+        )
+    if data[0] == MessageType.delta and len(data) == DELTA.size:
+        _, seq, status, whose_turn, winner, slot, turn, box_type = DELTA.unpack(data)
+        return WsEvent.construct(
+            data=WsGameDeltaEvent.construct(
+                payload=WsGameDeltaPayload.construct(
+                    seq=seq,
+                    turn=turn,
+                    box_type=box_type,
+                    whose_turn=_player_id(whose_turn, slot, player_id),
+                    winner=_player_id(winner, slot, player_id),
+                    status=status,
+                )
+            )
+        )
+    if data[0] == MessageType.error:
+        try:
+            message = data[1:].decode()
+        except UnicodeDecodeError as err:
+            raise DecodeError() from err
+        return WsEvent.construct(
+            data=WsErrorEvent.construct(
+                payload=WsErrorEventPayload.construct(message=message)
+            )
+        )
+    raise DecodeError()
@@ -0,0 +1,144 @@
+import json
+import re
+from typing import Any
+
+from onx.models import MUX_GAME_PATTERN
+from onx.models import parse_mux_operation
+from onx.models import parse_operation
+from onx.models import WsMuxJoinOperation
+from onx.models import WsMuxJoinPayload
+from onx.models import WsMuxTurnOperation
+from onx.models import WsResyncOperation
+
+# Hot path encoders and decoders for the json protocol. They produce exactly what
+# the pydantic models in onx.models produce, without building model objects.
+# Anything off the happy path is handed over to the models, so validation errors
+# keep their messages.
+
+
+# returns a turn number, or None for a resync operation
+def decode_operation(raw: str | bytes) -> int | None:
+    data = json.loads(raw)
+    if isinstance(data, dict):
+        operation = data.get("operation", "turn")
+        if operation == "turn":
+            payload = data.get("payload")
+            if isinstance(payload, dict):
+                turn = payload.get("turn")
+                if isinstance(turn, int) and not isinstance(turn, bool):
+                    return turn
+        elif operation == "resync":
+            return None
+    return from_model(data)
+
+
+def from_model(data: Any) -> int | None:
+    operation = parse_operation(data)
+    if isinstance(operation, WsResyncOperation):
+        return None
+    # pylint infers the payload of either operation model here
+    return int(operation.payload.turn)  # pylint: disable=no-member
+
+
+_mux_game = re.compile(MUX_GAME_PATTERN)
+
+
+# returns the game id, the operation and its turn number or join payload
+def decode_mux_operation(
+    raw: str | bytes,
+) -> tuple[str, str, int | WsMuxJoinPayload | None]:
+    data = json.loads(raw)
+    if isinstance(data, dict) and data.get("operation", "turn") == "turn":
+        game, payload = data.get("game"), data.get("payload")
+        if (
+            isinstance(game, str)
+            and _mux_game.fullmatch(game)
+            and isinstance(payload, dict)
+        ):
+            turn = payload.get("turn")
+            if isinstance(turn, int) and not isinstance(turn, bool):
+                return game, "turn", turn
+    try:
+        operation = parse_mux_operation(data)
+    except TypeError as err:
+        # json that is not an object
+        raise ValueError("invalid multiplexed message") from err
+    if isinstance(operation, WsMuxTurnOperation):
+        # pylint infers the payload of every operation model here
+        turn = operation.payload.turn  # pylint: disable=no-member
+        return operation.game, operation.operation, int(turn)
+    if isinstance(operation, WsMuxJoinOperation):
+        return operation.game, operation.operation, operation.payload
+    return operation.game, operation.operation, None
+
+
+# tags an encoded event with the game id of a multiplexed connection
+def tag_event(game: str, frame: str) -> str:
+    return f'{{"game": "{game}", {frame[1:]}'
+
+
+def encode_state(
+    whose_turn: str | None, grid: list[int], winner: str | None, status: int
+) -> str:
+    return json.dumps(
+        {
+            "data": {
+                "event": "game_state",
+                "payload": {
+                    "whose_turn": whose_turn,
+                    "grid": grid,
+                    "winner": winner,
+                    "status": status,
+                },
+            }
+        }
+    )
+
+
+def encode_snapshot(
+    whose_turn: str | None, grid: list[int], winner: str | None, status: int, seq: int
+) -> str:
+    return json.dumps(
+        {
+            "data": {
+                "event": "game_snapshot",
+                "payload": {
+                    "whose_turn": whose_turn,
+                    "grid": grid,
+                    "winner": winner,
+                    "status": status,
+                    "seq": seq,
+                },
+            }
+        }
+    )
+
+
+# one argument per field of the event
+def encode_delta(  # pylint: disable=too-many-arguments
+    seq: int,
+    turn: int,
+    box_type: int,
+    whose_turn: str | None,
+    winner: str | None,
+    status: int,
+) -> str:
+    return json.dumps(
+        {
+            "data": {
+                "event": "game_delta",
+                "payload": {
+                    "seq": seq,
+                    "turn": turn,
+                    "box_type": box_type,
+                    "whose_turn": whose_turn,
+                    "winner": winner,
+                    "status": status,
+                },
+            }
+        }
+    )
+
+
+def encode_error(message: str) -> str:
+    return json.dumps({"data": {"event": "error", "payload": {"message": message}}})
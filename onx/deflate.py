@@ -0,0 +1,90 @@
+import zlib
+from typing import Any
+
+import aiohttp
+from aiohttp import hdrs
+from aiohttp import web
+from aiohttp.http_websocket import ws_ext_gen
+from aiohttp.http_websocket import WebSocketWriter
+from aiohttp.web_request import BaseRequest
+
+try:
+    from aiohttp.compression_utils import ZLibCompressor
+    from aiohttp.http_websocket import WEBSOCKET_MAX_SYNC_CHUNK_SIZE
+except ImportError:  # aiohttp < 3.9 compresses in the writer itself
+    ZLibCompressor = None  # type: ignore
+
+from onx import settings
+
+
+# permessage-deflate with a tunable level, frames under the minimum size are
+# sent uncompressed. The peer only inflates the frames flagged as compressed,
+# so the frames left out do not touch the shared compression context.
+class DeflateWriter(WebSocketWriter):
+    def __init__(
+        self,
+        writer: WebSocketWriter,
+        wbits: int,
+        level: int = settings.WS_COMPRESS_LEVEL,
+        min_size: int = settings.WS_COMPRESS_MIN_SIZE,
+    ) -> None:
+        super().__init__(
+            writer.protocol,
+            writer.transport,
+            use_mask=writer.use_mask,
+            compress=wbits,
+            notakeover=writer.notakeover,
+        )
+        self.level: int = level
+        self.min_size: int = min_size
+        self._compressobj = self._make_compress_obj(wbits)
+
+    def _make_compress_obj(self, compress: int) -> Any:
+        if ZLibCompressor is None:
+            return zlib.compressobj(level=self.level, wbits=-compress)
+        return ZLibCompressor(
+            level=self.level,
+            wbits=-compress,
+            max_sync_chunk_size=WEBSOCKET_MAX_SYNC_CHUNK_SIZE,
+        )
+
+    async def _send_frame(
+        self, message: bytes, opcode: int, compress: int | None = None
+    ) -> None:
+        if not self.compress or opcode >= 8 or len(message) >= self.min_size:
+            await super()._send_frame(message, opcode, compress)
+            return
+        # a frame sent meanwhile goes uncompressed as well, which is allowed
+        wbits, self.compress = self.compress, 0
+        try:
+            await super()._send_frame(message, opcode, compress)
+        finally:
+            self.compress = wbits
+
+
+# negotiates compression with the clients that offer it, within the window
+# bits of the settings
+class DeflateResponse(web.WebSocketResponse):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(compress=bool(settings.WS_COMPRESS_WBITS), **kwargs)
+
+    def _pre_start(self, request: BaseRequest) -> tuple[str, WebSocketWriter]:
+        protocol, writer = super()._pre_start(request)
+        if not writer.compress:
+            return protocol, writer
+        wbits = min(writer.compress, settings.WS_COMPRESS_WBITS)
+        if wbits != writer.compress:
+            # the server may use a smaller window than the client offered
+            self.headers[hdrs.SEC_WEBSOCKET_EXTENSIONS] = ws_ext_gen(
+                compress=wbits, isserver=True, server_notakeover=writer.notakeover
+            )
+        return protocol, DeflateWriter(writer, wbits)
+
+
+class DeflateClientResponse(aiohttp.ClientWebSocketResponse):
+    def __init__(
+        self, reader: Any, writer: WebSocketWriter, *args: Any, **kwargs: Any
+    ) -> None:
+        if writer.compress:
+            writer = DeflateWriter(writer, writer.compress)
+        super().__init__(reader, writer, *args, **kwargs)
@@ -1,10 +1,30 @@
+from typing import Any
 from typing import Literal
 
 from pydantic import BaseModel
+from pydantic import conint
+from pydantic import constr
+from pydantic import validator
 
 from onx import settings
 
 
+class BoxType:
+    empty: int = 1
+    nought: int = 2
+    cross: int = 3
+    opposite: dict = {cross: nought, nought: cross}
+
+
+class GameStatus:
+    # game is waiting for a player
+    awaiting: int = 100
+    # game is in progress
+    in_progress: int = 200
+    # game is finished
+    finished: int = 300
+
+
 class WsErrorEventPayload(BaseModel):
     message: str
 
@@ -26,8 +46,31 @@ class WsGameStateEvent(BaseModel):
     payload: WsGameStatePayload
 
 
+class WsGameSnapshotPayload(WsGameStatePayload):
+    seq: int
+
+
+class WsGameSnapshotEvent(BaseModel):
+    event: Literal["game_snapshot"] = "game_snapshot"
+    payload: WsGameSnapshotPayload
+
+
+class WsGameDeltaPayload(BaseModel):
+    seq: int
+    turn: int
+    box_type: int
+    whose_turn: str | None
+    winner: str | None
+    status: int
+
+
+class WsGameDeltaEvent(BaseModel):
+    event: Literal["game_delta"] = "game_delta"
+    payload: WsGameDeltaPayload
+
+
 class WsEvent(BaseModel):
-    data: WsGameStateEvent | WsErrorEvent
+    data: WsGameStateEvent | WsGameSnapshotEvent | WsGameDeltaEvent | WsErrorEvent
 
 
 class WsOperationPayload(BaseModel):
@@ -39,7 +82,63 @@ class WsOperation(BaseModel):
     payload: WsOperationPayload
 
 
-class WsCookie(BaseModel):
+class WsResyncOperation(BaseModel):
+    operation: Literal["resync"] = "resync"
+
+
+def parse_operation(data: Any) -> WsOperation | WsResyncOperation:
+    if isinstance(data, dict) and data.get("operation") == "resync":
+        return WsResyncOperation(**data)
+    return WsOperation(**data)
+
+
+# game ids of a multiplexed connection are picked by the client
+MUX_GAME_PATTERN = r"^[A-Za-z0-9_-]{1,64}\Z"
+
+
+# the game a player asks for, within the bounds of the cli options
+class WsGameOptions(BaseModel):
+    grid_size: conint(ge=3, le=14) = settings.DEFAULT_GRID_SIZE  # type: ignore
+    winning_length: conint(ge=3, le=5) = settings.DEFAULT_WINNING_LENGTH  # type: ignore
+    delta: bool = False
+    ai: bool = False
+
+    @validator("winning_length")
+    @classmethod
+    def fits_grid(cls, value: int, values: dict) -> int:
+        if value > values.get("grid_size", value):
+            raise ValueError("winning length has to be less or equal to grid size")
+        return value
+
+
+class WsMuxJoinPayload(WsGameOptions):
+    pass
+
+
+class WsMuxOperation(BaseModel):
+    game: constr(regex=MUX_GAME_PATTERN)  # type: ignore
+    operation: Literal["join", "turn", "resync", "leave"] = "turn"
+
+
+class WsMuxJoinOperation(WsMuxOperation):
+    operation: Literal["join"] = "join"
+    payload: WsMuxJoinPayload = WsMuxJoinPayload()
+
+
+class WsMuxTurnOperation(WsMuxOperation):
+    operation: Literal["turn"] = "turn"
+    payload: WsOperationPayload
+
+
+def parse_mux_operation(data: Any) -> WsMuxOperation:
+    if isinstance(data, dict):
+        operation = data.get("operation", "turn")
+        if operation == "join":
+            return WsMuxJoinOperation(**data)
+        if operation == "turn":
+            return WsMuxTurnOperation(**data)
+    return WsMuxOperation(**data)
+
+
+class WsCookie(WsGameOptions):
     player_id: str
-    grid_size: int = settings.DEFAULT_GRID_SIZE
-    winning_length: int = settings.DEFAULT_WINNING_LENGTH
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from onx import settings
+from onx.models import BoxType
+from onx.models import GameStatus
+from onx.server.bitboard import get_layout
+from onx.server.bitboard import is_winning_move
+from onx.server.bitboard import Layout
+
+if TYPE_CHECKING:
+    from onx.server.game import Game
+    from onx.server.game import GameRegistry
+    from onx.server.game import Player
+
+logger = logging.getLogger(__name__)
+
+WIN = 10**6
+# score of a line holding 0..5 stones of one side only
+WEIGHTS = (0, 1, 8, 64, 512, 4096)
+# table entry bounds
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# random keys per side and box for the biggest board the cli allows
+_random = random.Random(0)
+ZOBRIST = tuple(
+    tuple(_random.getrandbits(64) for _ in range(14**2)) for _ in range(2)
+)
+
+
+class TimeIsUp(Exception):
+    pass
+
+
+@lru_cache(maxsize=64)
+def get_windows(grid_size: int, winning_length: int) -> tuple[tuple[int, ...], ...]:
+    # masks of every winning line through each box
+    layout = get_layout(grid_size, winning_length)
+    windows = []
+    for box_lines in layout.lines:
+        masks = []
+        for shift, starts in box_lines:
+            while starts:
+                start = (starts & -starts).bit_length() - 1
+                starts &= starts - 1
+                masks.append(
+                    sum(1 << start + step * shift for step in range(winning_length))
+                )
+        windows.append(tuple(masks))
+    return tuple(windows)
+
+
+@lru_cache(maxsize=64)
+def get_edges(grid_size: int) -> tuple[int, int]:
+    # boxes off the first and off the last column
+    not_first = not_last = 0
+    for box in range(grid_size**2):
+        if box % grid_size:
+            not_first |= 1 << box
+        if box % grid_size != grid_size - 1:
+            not_last |= 1 << box
+    return not_first, not_last
+
+
+def line_score(own: int, other: int) -> int:
+    if own and not other:
+        return WEIGHTS[own.bit_count()]
+    if other and not own:
+        return -WEIGHTS[other.bit_count()]
+    return 0
+
+
+# iterative deepening negamax with alpha-beta pruning and a transposition table
+# keyed by zobrist hashes. Scores are seen by the side to move.
+class Search:
+    def __init__(self, layout: Layout, deadline: float) -> None:
+        self.layout: Layout = layout
+        self.windows = get_windows(layout.grid_size, layout.winning_length)
+        self.edges = get_edges(layout.grid_size)
+        self.deadline: float = deadline
+        self.table: dict[int, tuple[int, int, int, int]] = {}
+        self.nodes: int = 0
+
+    # change of the score of the side to move when it takes the box
+    def gain(self, own: int, other: int, box: int) -> int:
+        bit = 1 << box
+        return sum(
+            line_score(own & mask | bit, other & mask)
+            - line_score(own & mask, other & mask)
+            for mask in self.windows[box]
+        )
+
+    def candidates(self, own: int, other: int) -> list[int]:
+        taken = own | other
+        if not taken:
+            return [self.layout.grid_size**2 // 2]
+        # empty boxes next to a taken one
+        not_first, not_last = self.edges
+        size = self.layout.grid_size
+        near = taken | taken << size | taken >> size
+        near |= (near << 1) & not_first | (near >> 1) & not_last
+        near &= self.layout.full & ~taken
+        boxes = []
+        while near:
+            boxes.append((near & -near).bit_length() - 1)
+            near &= near - 1
+        return boxes
+
+    def ordered(self, own: int, other: int, best: int) -> list[tuple[int, int]]:
+        # boxes with their gains, the best known box and strong boxes first
+        moves = [
+            (box, self.gain(own, other, box)) for box in self.candidates(own, other)
+        ]
+        moves.sort(
+            key=lambda move: (
+                move[0] != best,
+                -move[1] - self.gain(other, own, move[0]),
+            )
+        )
+        return moves
+
+    # the hot path of the search, the position is passed in plain arguments
+    # and kept in locals
+    def negamax(  # pylint: disable=too-many-arguments,too-many-locals,too-many-branches
+        self,
+        own: int,
+        other: int,
+        score: int,
+        key: int,
+        side: int,
+        depth: int,
+        alpha: int,
+        beta: int,
+    ) -> int:
+        self.nodes += 1
+        if not self.nodes & 63 and time.monotonic() > self.deadline:
+            raise TimeIsUp()
+        if depth == 0:
+            return score
+        entry = self.table.get(key)
+        best_box = -1
+        if entry is not None:
+            entry_depth, value, bound, best_box = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                elif bound == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        moves = self.ordered(own, other, best_box)
+        if not moves:
+            return 0
+        origin, best = alpha, -WIN * 2
+        for box, gain in moves:
+            taken = own | 1 << box
+            if is_winning_move(self.layout, taken, box):
+                value = WIN + depth
+            elif taken | other == self.layout.full:
+                value = 0
+            else:
+                value = -self.negamax(
+                    other,
+                    taken,
+                    -(score + gain),
+                    key ^ ZOBRIST[side][box],
+                    1 - side,
+                    depth - 1,
+                    -beta,
+                    -alpha,
+                )
+            if value > best:
+                best, best_box = value, box
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        bound = UPPER if best <= origin else LOWER if best >= beta else EXACT
+        self.table[key] = (depth, best, bound, best_box)
+        return best
+
+    def root(  # pylint: disable=too-many-arguments
+        self, own: int, other: int, side: int, depth: int, best: int
+    ) -> int:
+        key = hash_position(own, other, side)
+        score = self.score(own, other)
+        alpha, best_value = -WIN * 2, -WIN * 2
+        for box, gain in self.ordered(own, other, best):
+            taken = own | 1 << box
+            if is_winning_move(self.layout, taken, box):
+                return box
+            if taken | other == self.layout.full:
+                value = 0
+            else:
+                value = -self.negamax(
+                    other,
+                    taken,
+                    -(score + gain),
+                    key ^ ZOBRIST[side][box],
+                    1 - side,
+                    depth - 1,
+                    -WIN * 2,
+                    -alpha,
+                )
+            if value > best_value:
+                best_value, best = value, box
+            alpha = max(alpha, value)
+        return best
+
+    def score(self, own: int, other: int) -> int:
+        lines = {mask for masks in self.windows for mask in masks}
+        return sum(line_score(own & mask, other & mask) for mask in lines)
+
+
+def hash_position(own: int, other: int, side: int) -> int:
+    key = 0
+    for board, board_side in ((own, side), (other, 1 - side)):
+        while board:
+            box = (board & -board).bit_length() - 1
+            board &= board - 1
+            key ^= ZOBRIST[board_side][box]
+    return key
+
+
+# returns the box to take, the depth completed and the amount of visited nodes.
+# Runs in pool processes, so it only takes and returns plain values.
+def search(  # pylint: disable=too-many-arguments
+    grid_size: int,
+    winning_length: int,
+    own: int,
+    other: int,
+    side: int,
+    budget: float,
+) -> tuple[int, int, int]:
+    layout = get_layout(grid_size, winning_length)
+    engine = Search(layout, time.monotonic() + budget)
+    empty = grid_size**2 - (own | other).bit_count()
+    best, completed = -1, 0
+    for depth in range(1, empty + 1):
+        try:
+            best = engine.root(own, other, side, depth, best)
+        except TimeIsUp:
+            break
+        completed = depth
+    if best < 0:
+        best = engine.candidates(own, other)[0]
+    return best, completed, engine.nodes
+
+
+# the process pool shared by every ai game of a server process, with a bound on
+# the searches submitted at once
+class AiEngine:
+    def __init__(
+        self,
+        workers: int | None = settings.AI_WORKERS,
+        pending: int = settings.AI_MAX_PENDING,
+    ) -> None:
+        self.workers: int | None = workers
+        self.pending: int = pending
+        self._pool: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    async def search(  # pylint: disable=too-many-arguments
+        self,
+        grid_size: int,
+        winning_length: int,
+        own: int,
+        other: int,
+        side: int,
+        budget: float | None = None,
+    ) -> tuple[int, int, int]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._slots = asyncio.Semaphore(self.pending)
+        assert self._slots is not None
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool,
+                search,
+                grid_size,
+                winning_length,
+                own,
+                other,
+                side,
+                settings.AI_MOVE_TIME if budget is None else budget,
+            )
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# stands in for the websocket of an ai player. Every state published to the ai
+# wakes it, and it searches for a move in the shared process pool on its turn.
+class AiSocket:
+    ws_protocol: str | None = None
+
+    def __init__(self, registry: "GameRegistry", game: "Game", player_id: str) -> None:
+        self.registry: "GameRegistry" = registry
+        self.game: "Game" = game
+        self.player_id: str = player_id
+        self._move: asyncio.Task | None = None
+
+    async def send_str(self, _data: str) -> None:
+        self.wake()
+
+    async def send_bytes(self, _data: bytes) -> None:
+        self.wake()
+
+    async def close(self) -> None:
+        if self._move is not None:
+            self._move.cancel()
+
+    def wake(self) -> None:
+        game = self.game
+        if (
+            game.status == GameStatus.in_progress
+            and game.whose_turn is not None
+            and game.whose_turn.id == self.player_id
+            and (self._move is None or self._move.done())
+        ):
+            self._move = asyncio.create_task(self.move(game.whose_turn))
+
+    async def move(self, player: "Player") -> None:
+        game = self.game
+        seq = game.seq
+        try:
+            turn, depth, nodes = await self.registry.ai.search(
+                game.context.grid_size,
+                game.context.winning_length,
+                game.board(player.box_type),
+                game.board(BoxType.opposite[player.box_type]),
+                0 if player.box_type == BoxType.nought else 1,
+            )
+            logger.debug("Ai searched %s nodes to depth %s", nodes, depth)
+            if game.seq == seq:
+                await self.registry.play(game, player, turn)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Ai failed to make a turn")
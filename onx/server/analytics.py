@@ -0,0 +1,228 @@
+from collections import Counter
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+
+from onx.server.errors import BaseGameValidationError
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameStatus
+from onx.server.game import Player
+from onx.server.journal import EventKind
+from onx.server.journal import read_segment
+from onx.server.journal import Record
+from onx.server.journal import segment_time_us
+from onx.server.journal import segments
+
+
+@dataclass
+class ContextStats:
+    games: int = 0
+    first_wins: int = 0
+    second_wins: int = 0
+    draws: int = 0
+    moves: int = 0
+    # games that were abandoned, are in progress or lost their start
+    unfinished: int = 0
+    # games that do not replay by the rules
+    invalid: int = 0
+    # first turns by box
+    openings: Counter[int] = field(default_factory=Counter)
+
+    def merge(self, other: "ContextStats") -> None:
+        self.games += other.games
+        self.first_wins += other.first_wins
+        self.second_wins += other.second_wins
+        self.draws += other.draws
+        self.moves += other.moves
+        self.unfinished += other.unfinished
+        self.invalid += other.invalid
+        self.openings.update(other.openings)
+
+    def add(self, records: list[Record]) -> None:
+        if records[-1].kind != EventKind.finished:
+            self.unfinished += 1
+            return
+        try:
+            game, first = replay(records)
+        except (BaseGameValidationError, AssertionError):
+            self.invalid += 1
+            return
+        self.games += 1
+        self.moves += game.moves
+        self.openings[next(r.value for r in records if r.kind == EventKind.turn)] += 1
+        if game.winner is None:
+            self.draws += 1
+        elif game.winner is first:
+            self.first_wins += 1
+        else:
+            self.second_wins += 1
+
+
+# stats by game context key
+Summary = dict[str, ContextStats]
+# records of games that are not complete in one segment by game id
+Pending = dict[bytes, list[Record]]
+
+# microseconds after which the server has dropped a game with no events, the
+# ttl of the active games
+HORIZON_US = 60 * 60 * 10**6
+
+
+def merge(summary: Summary, other: Summary) -> None:
+    for key, stats in other.items():
+        summary.setdefault(key, ContextStats()).merge(stats)
+
+
+def stats_of(summary: Summary, record: Record) -> ContextStats:
+    key = GameContext(
+        grid_size=record.grid_size, winning_length=record.winning_length
+    ).key
+    if key not in summary:
+        summary[key] = ContextStats()
+    return summary[key]
+
+
+# replays a finished game by the server rules, returns it with its first player
+def replay(records: list[Record]) -> tuple[Game, Player]:
+    head = records[0]
+    game = Game(
+        GameContext(grid_size=head.grid_size, winning_length=head.winning_length)
+    )
+    players: dict[bytes, Player] = {}
+    for record in records:
+        if record.kind == EventKind.started:
+            player = Player(
+                id=record.player.hex(),
+                ws=None,  # type: ignore
+                box_type=record.box_type,
+            )
+            game.add_player(player)
+            players[record.player] = player
+            if record.value:
+                game.whose_turn = player
+                game.status = GameStatus.in_progress
+        elif record.kind == EventKind.turn:
+            if record.player not in players:
+                raise BaseGameValidationError()
+            game.turn(players[record.player], record.value)
+    first = next(
+        (
+            players[record.player]
+            for record in records
+            if record.kind == EventKind.started and record.value
+        ),
+        None,
+    )
+    if first is None or game.status != GameStatus.finished:
+        raise BaseGameValidationError()
+    return game, first
+
+
+def settle(summary: Summary, records: list[Record]) -> None:
+    stats = stats_of(summary, records[0])
+    if records[0].kind == EventKind.created:
+        stats.add(records)
+    else:
+        stats.unfinished += 1
+
+
+# groups a stream of records into games. Games created and finished or closed
+# within the stream are yielded, so are the ones idle for the horizon. The
+# records of the others are left in pending.
+def complete_games(
+    records: Iterable[Record], pending: Pending, horizon_us: int = HORIZON_US
+) -> Iterator[list[Record]]:
+    swept = 0
+    for record in records:
+        game = pending.get(record.game_id)
+        if game is None:
+            game = pending[record.game_id] = []
+        game.append(record)
+        if (
+            record.kind in (EventKind.finished, EventKind.closed)
+            and game[0].kind == EventKind.created
+        ):
+            yield pending.pop(record.game_id)
+        if record.time_us - swept >= horizon_us:
+            swept = record.time_us
+            for game_id, game in list(pending.items()):
+                if (
+                    game[0].kind == EventKind.created
+                    and game[-1].time_us < swept - horizon_us
+                ):
+                    yield pending.pop(game_id)
+
+
+def analyze_records(records: Iterable[Record], pending: Pending) -> Summary:
+    summary: Summary = {}
+    for game in complete_games(records, pending):
+        stats_of(summary, game[0]).add(game)
+    return summary
+
+
+# runs in pool processes, only the stats and the games cut by the segment
+# bounds are sent back
+def analyze_segment(path: str) -> tuple[Summary, Pending]:
+    pending: Pending = {}
+    return analyze_records(read_segment(path), pending), pending
+
+
+# segments are analyzed in parallel, games that span segments are stitched
+# together in segment order afterwards. A stitched game is settled once it is
+# over, or once it has been idle for the horizon when a later segment starts,
+# so that only the games open at a time are kept.
+def analyze(directory: str, workers: int | None = None) -> Summary:
+    summary: Summary = {}
+    pending: Pending = {}
+    paths = segments(directory)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, (part, cut) in zip(paths, pool.map(analyze_segment, paths)):
+            merge(summary, part)
+            for game_id, records in cut.items():
+                pending.setdefault(game_id, []).extend(records)
+            expired_us = segment_time_us(path) - HORIZON_US
+            for game_id, records in list(pending.items()):
+                if (
+                    records[-1].kind in (EventKind.finished, EventKind.closed)
+                    or records[-1].time_us < expired_us
+                ):
+                    settle(summary, pending.pop(game_id))
+    for records in pending.values():
+        settle(summary, records)
+    return summary
+
+
+def format_summary(summary: Summary) -> str:
+    contexts = sorted(
+        summary.items(), key=lambda item: tuple(map(int, item[0].split("x")))
+    )
+    lines = [
+        f"{'context':>7} {'games':>9} {'first':>6} {'second':>6} {'draws':>6} "
+        f"{'moves':>6} {'unfinished':>10} {'invalid':>7}"
+    ]
+    for key, stats in contexts:
+        games = stats.games or 1
+        lines.append(
+            f"{key:>7} {stats.games:>9} {stats.first_wins / games:>6.1%} "
+            f"{stats.second_wins / games:>6.1%} {stats.draws / games:>6.1%} "
+            f"{stats.moves / games:>6.1f} {stats.unfinished:>10} {stats.invalid:>7}"
+        )
+    for key, stats in contexts:
+        if not stats.games:
+            continue
+        grid_size = int(key.split("x")[0])
+        shares = [
+            stats.openings[box] * 100 // stats.games for box in range(grid_size**2)
+        ]
+        lines.append(f"\n{key} openings %")
+        for row in range(grid_size):
+            row_start = row * grid_size
+            lines.append(
+                " ".join(
+                    f"{shares[row_start + column]:>3}" for column in range(grid_size)
+                )
+            )
+    return "\n".join(lines)
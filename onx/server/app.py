@@ -1,14 +1,114 @@
+import asyncio
+import hmac
+import logging
+import time
+
 from aiohttp import web
 
+from onx import settings
+from onx.server.broker import Broker
+from onx.server.game import GameRegistry
+from onx.server.handler import MuxHandler
+from onx.server.handler import WatchHandler
 from onx.server.handler import WebsocketHandler
+from onx.server.metrics import CONTENT_TYPE
+from onx.server.profiler import profile
+from onx.server.snapshot import load
+
+logger = logging.getLogger(__name__)
 
 
 async def index_handler(_) -> web.Response:
     return web.json_response({})
 
 
-def get_application() -> web.Application:
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=request.app["registry"].metrics.expose().encode(),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+
+
+# samples the event loop for ?seconds=N and returns collapsed stacks, or the
+# stalls of the loop with ?report=slow
+async def profile_handler(request: web.Request) -> web.Response:
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise web.HTTPForbidden()
+    try:
+        seconds = float(request.query.get("seconds", 10))
+    except ValueError as err:
+        raise web.HTTPBadRequest(text="seconds must be a number") from err
+    if not 0 < seconds <= settings.PROFILE_MAX_SECONDS:
+        raise web.HTTPBadRequest(
+            text=f"seconds must be within {settings.PROFILE_MAX_SECONDS}"
+        )
+    report = request.query.get("report", "collapsed")
+    if report not in ("collapsed", "slow"):
+        raise web.HTTPBadRequest(text="report must be collapsed or slow")
+    profiling = request.app["profiling"]
+    if profiling.locked():
+        raise web.HTTPConflict(text="profiler is already running")
+    async with profiling:
+        sampler = await profile(
+            seconds, settings.PROFILE_INTERVAL, settings.SLOW_CALLBACK_DURATION
+        )
+    return web.Response(
+        text=sampler.collapsed() if report == "collapsed" else sampler.slow_callbacks()
+    )
+
+
+async def start_registry(app: web.Application) -> None:
+    await app["registry"].start()
+
+
+async def stop_registry(app: web.Application) -> None:
+    await app["registry"].stop()
+
+
+# runs before the server accepts connections
+async def restore_games(app: web.Application) -> None:
+    started = time.perf_counter()
+    snapshot = load(settings.SNAPSHOT_PATH)
+    if snapshot is None:
+        return
+    registry = app["registry"]
+    registry.snapshot = snapshot
+    logger.info(
+        "Restored %s players in %.2fs",
+        len(snapshot.index),
+        time.perf_counter() - started,
+    )
+
+
+# runs before the open connections are closed, so that awaiting games are kept
+async def save_games(app: web.Application) -> None:
+    started = time.perf_counter()
+    games = app["registry"].save(settings.SNAPSHOT_PATH)
+    logger.info("Saved %s games in %.2fs", games, time.perf_counter() - started)
+
+
+async def close_connections(app: web.Application) -> None:
+    await app["registry"].connections.close()
+
+
+def get_application(broker: Broker | None = None) -> web.Application:
     app = web.Application()
+    app["registry"] = GameRegistry(broker)
+    # held while the loop is sampled, the app state is frozen once started
+    app["profiling"] = asyncio.Lock()
+    app.on_startup.append(start_registry)
+    app.on_cleanup.append(stop_registry)
+    # the games of several workers can not be restored by any single one
+    if settings.SNAPSHOT_PATH and broker is None:
+        app.on_startup.append(restore_games)
+        app.on_shutdown.append(save_games)
+    app.on_shutdown.append(close_connections)
     app.router.add_route("GET", "/", index_handler)
+    app.router.add_route("GET", "/metrics", metrics_handler)
+    if settings.ADMIN_TOKEN:
+        app.router.add_route("GET", "/admin/profile", profile_handler)
     app.router.add_route("GET", "/ws", WebsocketHandler)
+    app.router.add_route("GET", "/ws/mux", MuxHandler)
+    app.router.add_route("GET", "/ws/watch/{game_id}", WatchHandler)
     return app
@@ -0,0 +1,52 @@
+import numpy as np
+
+from onx.server.game import BoxType
+
+
+def side_wins(taken: np.ndarray, winning_length: int) -> np.ndarray:
+    # taken is an (N, grid_size, grid_size) bool array of the boxes of one side.
+    # Every line start is checked at once per direction by and-ing the shifted
+    # views of the boards.
+    span = taken.shape[1] - winning_length + 1
+    if span <= 0:
+        return np.zeros(len(taken), dtype=bool)
+    whole = slice(None)
+
+    def shifted(step: int) -> slice:
+        return slice(step, step + span)
+
+    directions = (
+        # horizontal, vertical, main and minor diagonals
+        lambda step: (whole, whole, shifted(step)),
+        lambda step: (whole, shifted(step), whole),
+        lambda step: (whole, shifted(step), shifted(step)),
+        lambda step: (whole, shifted(step), shifted(winning_length - 1 - step)),
+    )
+    wins = np.zeros(len(taken), dtype=bool)
+    for view in directions:
+        run = taken[view(0)].copy()
+        for step in range(1, winning_length):
+            run &= taken[view(step)]
+        wins |= run.any(axis=(1, 2))
+    return wins
+
+
+# evaluates an (N, grid_size, grid_size) array of BoxType grids and returns the
+# BoxType of the winner of every board, 0 when there is none, and whether every
+# board is finished. Boards with lines of both sides do not occur in games and
+# are reported as won by crosses.
+def evaluate(boards: np.ndarray, winning_length: int) -> tuple[np.ndarray, np.ndarray]:
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError("boards must be an (N, grid_size, grid_size) array")
+    noughts = side_wins(boards == BoxType.nought, winning_length)
+    crosses = side_wins(boards == BoxType.cross, winning_length)
+    winners = np.where(
+        crosses, BoxType.cross, np.where(noughts, BoxType.nought, 0)
+    ).astype(np.int8)
+    full = (boards != BoxType.empty).all(axis=(1, 2))
+    return winners, noughts | crosses | full
+
+
+# stacks BoxType grids as lists of a grid size into an array for evaluate
+def from_grids(grids: list[list[int]], grid_size: int) -> np.ndarray:
+    return np.array(grids, dtype=np.int8).reshape((-1, grid_size, grid_size))
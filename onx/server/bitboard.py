@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+# (row step, column step) for horizontal, vertical, main and minor diagonals
+DIRECTIONS: tuple[tuple[int, int], ...] = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+@dataclass(frozen=True)
+class Layout:
+    grid_size: int
+    winning_length: int
+    full: int
+    # per box: (shift, mask of line starts covering the box) for every direction
+    lines: tuple[tuple[tuple[int, int], ...], ...]
+
+
+# the layouts of every game context the cli allows fit
+@lru_cache(maxsize=64)
+def get_layout(grid_size: int, winning_length: int) -> Layout:
+    lines = []
+    for box in range(grid_size**2):
+        row, col = divmod(box, grid_size)
+        box_lines = []
+        for row_step, col_step in DIRECTIONS:
+            starts = 0
+            for back in range(winning_length):
+                start_row, start_col = row - back * row_step, col - back * col_step
+                end_row = start_row + (winning_length - 1) * row_step
+                end_col = start_col + (winning_length - 1) * col_step
+                if (
+                    0 <= start_row < grid_size
+                    and 0 <= start_col < grid_size
+                    and 0 <= end_row < grid_size
+                    and 0 <= end_col < grid_size
+                ):
+                    starts |= 1 << (start_row * grid_size + start_col)
+            if starts:
+                box_lines.append((row_step * grid_size + col_step, starts))
+        lines.append(tuple(box_lines))
+    return Layout(
+        grid_size=grid_size,
+        winning_length=winning_length,
+        full=(1 << grid_size**2) - 1,
+        lines=tuple(lines),
+    )
+
+
+def runs(board: int, shift: int, length: int) -> int:
+    run = board
+    for step in range(1, length):
+        run &= board >> shift * step
+    return run
+
+
+def is_winning_move(layout: Layout, board: int, box: int) -> bool:
+    for shift, starts in layout.lines[box]:
+        if runs(board, shift, layout.winning_length) & starts:
+            return True
+    return False
@@ -0,0 +1,387 @@
+import abc
+import asyncio
+import base64
+import json
+import logging
+import struct
+import uuid
+from collections.abc import Awaitable
+from collections.abc import Callable
+from contextlib import suppress
+
+from cachetools import TTLCache
+
+from onx import settings
+from onx.server.matchmaking import Matchmaker
+from onx.server.matchmaking import Ticket
+
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[dict], Awaitable[None]]
+
+# length prefix of a unix socket frame
+FRAME_HEADER = struct.Struct("!I")
+
+
+# matchmaking and routing state shared by all workers
+class Exchange:
+    def __init__(self, tick: float = settings.MATCHMAKING_TICK) -> None:
+        self.matchmaker: Matchmaker = Matchmaker()
+        # pairs waiting games in batches every tick seconds, 0 pairs on arrival
+        self.tick: float = tick
+        # player id -> worker id that owns the player's game
+        self.owners: TTLCache[str, str] = TTLCache(maxsize=10**6, ttl=60 * 60)
+        self.workers: dict[str, Callable[[dict], None]] = {}
+        self._ticker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self.tick and self._ticker is None:
+            self._ticker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._ticker:
+            self._ticker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._ticker
+            self._ticker = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self.match()
+
+    def pair(self, key: str, game_id: str, worker_id: str) -> tuple[str, str] | None:
+        ticket = Ticket(game_id, worker_id)
+        if self.tick:
+            self.matchmaker.enqueue(key, ticket)
+            return None
+        match = self.matchmaker.pair(key, ticket)
+        return (match.game_id, match.worker_id) if match else None
+
+    # moves the later player of every batched pair into the earlier one's game
+    def match(self) -> None:
+        for first, second in self.matchmaker.match():
+            self.post(
+                second.worker_id,
+                {
+                    "type": "matched",
+                    "game_id": second.game_id,
+                    "target_game_id": first.game_id,
+                    "target_worker_id": first.worker_id,
+                },
+            )
+
+    def cancel(self, key: str, game_id: str) -> None:
+        self.matchmaker.cancel(key, game_id)
+
+    def stats(self) -> dict[str, dict]:
+        return self.matchmaker.to_dict()
+
+    def bind(self, player_id: str, worker_id: str) -> None:
+        self.owners[player_id] = worker_id
+
+    def unbind(self, player_id: str) -> None:
+        self.owners.pop(player_id, None)
+
+    def lookup(self, player_id: str) -> str | None:
+        return self.owners.get(player_id)
+
+    def post(self, worker_id: str, message: dict) -> None:
+        if worker_id in self.workers:
+            self.workers[worker_id](message)
+        else:
+            logger.warning("Message to unknown worker %s dropped", worker_id)
+
+
+# worker side of the exchange, posted messages are handled in order
+class Broker(abc.ABC):
+    def __init__(self) -> None:
+        self.worker_id: str = uuid.uuid4().hex
+        self._inbox: asyncio.Queue[dict] = asyncio.Queue()
+        self._consumer: asyncio.Task | None = None
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._consumer = asyncio.create_task(self._consume(handler))
+
+    async def stop(self) -> None:
+        if self._consumer:
+            self._consumer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._consumer
+
+    def deliver(self, message: dict) -> None:
+        self._inbox.put_nowait(message)
+
+    async def _consume(self, handler: MessageHandler) -> None:
+        while True:
+            message = await self._inbox.get()
+            try:
+                await handler(message)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to handle broker message %s", message)
+
+    @abc.abstractmethod
+    async def pair(self, key: str, game_id: str) -> tuple[str, str] | None:
+        ...
+
+    @abc.abstractmethod
+    def cancel(self, key: str, game_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def bind(self, player_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def unbind(self, player_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def lookup(self, player_id: str) -> str | None:
+        ...
+
+    @abc.abstractmethod
+    def post(self, worker_id: str, message: dict) -> None:
+        ...
+
+    # matchmaking wait time statistics per context key
+    @abc.abstractmethod
+    async def stats(self) -> dict[str, dict]:
+        ...
+
+
+class InProcessBroker(Broker):
+    def __init__(self, exchange: Exchange | None = None) -> None:
+        super().__init__()
+        # a shared exchange is started and stopped by its owner
+        self._own_exchange: bool = exchange is None
+        self.exchange: Exchange = exchange or Exchange()
+
+    async def start(self, handler: MessageHandler) -> None:
+        await super().start(handler)
+        self.exchange.workers[self.worker_id] = self.deliver
+        if self._own_exchange:
+            await self.exchange.start()
+
+    async def stop(self) -> None:
+        if self._own_exchange:
+            await self.exchange.stop()
+        self.exchange.workers.pop(self.worker_id, None)
+        await super().stop()
+
+    async def pair(self, key: str, game_id: str) -> tuple[str, str] | None:
+        return self.exchange.pair(key, game_id, self.worker_id)
+
+    def cancel(self, key: str, game_id: str) -> None:
+        self.exchange.cancel(key, game_id)
+
+    def bind(self, player_id: str) -> None:
+        self.exchange.bind(player_id, self.worker_id)
+
+    def unbind(self, player_id: str) -> None:
+        self.exchange.unbind(player_id)
+
+    async def lookup(self, player_id: str) -> str | None:
+        return self.exchange.lookup(player_id)
+
+    def post(self, worker_id: str, message: dict) -> None:
+        self.exchange.post(worker_id, message)
+
+    async def stats(self) -> dict[str, dict]:
+        return self.exchange.stats()
+
+
+def write_frame(writer: asyncio.StreamWriter, frame: dict) -> None:
+    data = json.dumps(frame).encode()
+    writer.write(FRAME_HEADER.pack(len(data)) + data)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return json.loads(await reader.readexactly(size))
+
+
+# serves an exchange to UnixSocketBroker workers over a local unix socket
+class BrokerServer:
+    def __init__(self, path: str, exchange: Exchange | None = None) -> None:
+        self.path: str = path
+        self.exchange: Exchange = exchange or Exchange()
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_unix_server(self._serve, self.path)
+        await self.exchange.start()
+
+    async def stop(self) -> None:
+        await self.exchange.stop()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        worker_id = ""
+        try:
+            while True:
+                frame = await read_frame(reader)
+                operation, args = frame["op"], frame["args"]
+                if operation == "hello":
+                    worker_id = args[0]
+                    self.exchange.workers[worker_id] = lambda message: write_frame(
+                        writer, {"op": "message", "args": [message]}
+                    )
+                elif operation == "pair":
+                    write_frame(
+                        writer,
+                        {
+                            "op": "result",
+                            "args": [
+                                frame["id"],
+                                self.exchange.pair(args[0], args[1], worker_id),
+                            ],
+                        },
+                    )
+                elif operation == "lookup":
+                    write_frame(
+                        writer,
+                        {
+                            "op": "result",
+                            "args": [frame["id"], self.exchange.lookup(args[0])],
+                        },
+                    )
+                elif operation == "stats":
+                    write_frame(
+                        writer,
+                        {"op": "result", "args": [frame["id"], self.exchange.stats()]},
+                    )
+                elif operation == "cancel":
+                    self.exchange.cancel(*args)
+                elif operation == "bind":
+                    self.exchange.bind(args[0], worker_id)
+                elif operation == "unbind":
+                    self.exchange.unbind(args[0])
+                elif operation == "post":
+                    self.exchange.post(*args)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            logger.debug("Broker connection of worker %s closed", worker_id)
+        finally:
+            self.exchange.workers.pop(worker_id, None)
+            writer.close()
+
+
+class UnixSocketBroker(Broker):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path: str = path
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._requests: dict[int, asyncio.Future] = {}
+        self._request_id: int = 0
+
+    async def start(self, handler: MessageHandler) -> None:
+        await super().start(handler)
+        reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._send("hello", self.worker_id)
+        self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def stop(self) -> None:
+        if self._reader_task:
+            self._reader_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader_task
+        if self._writer:
+            self._writer.close()
+        await super().stop()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame["op"] == "message":
+                    self.deliver(frame["args"][0])
+                elif frame["op"] == "result":
+                    request_id, result = frame["args"]
+                    future = self._requests.pop(request_id)
+                    if not future.done():
+                        future.set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            logger.error("Connection to the broker is lost")
+            for future in self._requests.values():
+                future.set_exception(ConnectionResetError())
+            self._requests.clear()
+
+    async def wait_closed(self) -> None:
+        assert self._reader_task, "Broker is not started"
+        await asyncio.shield(self._reader_task)
+
+    def _send(self, operation: str, *args, request_id: int | None = None) -> None:
+        assert self._writer, "Broker is not started"
+        write_frame(self._writer, {"op": operation, "args": args, "id": request_id})
+
+    async def _request(self, operation: str, *args) -> object:
+        if self._reader_task is None or self._reader_task.done():
+            raise ConnectionResetError("Broker is not connected")
+        self._request_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._requests[self._request_id] = future
+        self._send(operation, *args, request_id=self._request_id)
+        return await future
+
+    async def pair(self, key: str, game_id: str) -> tuple[str, str] | None:
+        result = await self._request("pair", key, game_id)
+        return tuple(result) if result else None  # type: ignore
+
+    def cancel(self, key: str, game_id: str) -> None:
+        self._send("cancel", key, game_id)
+
+    def bind(self, player_id: str) -> None:
+        self._send("bind", player_id)
+
+    def unbind(self, player_id: str) -> None:
+        self._send("unbind", player_id)
+
+    async def lookup(self, player_id: str) -> str | None:
+        return await self._request("lookup", player_id)  # type: ignore
+
+    def post(self, worker_id: str, message: dict) -> None:
+        self._send("post", worker_id, message)
+
+    async def stats(self) -> dict[str, dict]:
+        return await self._request("stats")  # type: ignore
+
+
+# stands in for the websocket of a player connected to another worker
+class RemoteSocket:
+    def __init__(
+        self, broker: Broker, worker_id: str, player_id: str, protocol: str | None
+    ) -> None:
+        self.broker: Broker = broker
+        self.worker_id: str = worker_id
+        self.player_id: str = player_id
+        self.ws_protocol: str | None = protocol
+
+    async def send_str(self, data: str) -> None:
+        self.broker.post(
+            self.worker_id, {"type": "frame", "player_id": self.player_id, "text": data}
+        )
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.broker.post(
+            self.worker_id,
+            {
+                "type": "frame",
+                "player_id": self.player_id,
+                "bytes": base64.b64encode(data).decode(),
+            },
+        )
+
+    async def close(self) -> None:
+        self.broker.post(self.worker_id, {"type": "close", "player_id": self.player_id})
+
+    @staticmethod
+    def decode_frame(message: dict) -> str | bytes:
+        if "bytes" in message:
+            return base64.b64decode(message["bytes"])
+        return message["text"]
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import suppress
+from dataclasses import dataclass
+from dataclasses import field
+
+import aiohttp
+from aiohttp import web
+from aiohttp import WebSocketError
+
+from onx import settings
+from onx.server.metrics import ServerMetrics
+from onx.server.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+# refills rate tokens a second up to burst, a frame or a connection takes one
+@dataclass(slots=True)
+class TokenBucket:
+    rate: float
+    burst: int
+    tokens: float = field(init=False)
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.tokens = self.burst
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+def bucket(rate: float, burst: int) -> TokenBucket | None:
+    return TokenBucket(rate, burst) if rate else None
+
+
+@dataclass(eq=False, slots=True)
+class Connection:
+    ws: web.WebSocketResponse
+    # address of the peer, the ip of a tcp client
+    remote: str
+    transport: asyncio.Transport | None
+    # monotonic time of the last frame received
+    last_seen: float = field(default_factory=time.monotonic)
+    # frames to a player, watchers are streamed from a broadcast instead
+    outbox: Outbox | None = None
+    # a quiet connection is pinged once, its pong or any other frame resets it
+    pinged: bool = False
+    # frame limits of the connection and of all the connections from its ip
+    limit: TokenBucket | None = None
+    ip_limit: TokenBucket | None = None
+    metrics: ServerMetrics | None = None
+
+    # yields data frames, answers pings and marks the connection alive on any
+    # frame, pongs included. Data frames over the limits are dropped before
+    # they are parsed.
+    async def messages(self) -> AsyncIterator[aiohttp.WSMessage]:
+        async for message in self.ws:
+            now = self.last_seen = time.monotonic()
+            self.pinged = False
+            if message.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                if self.limit is not None and not self.limit.take(now):
+                    self.drop("connection")
+                elif self.ip_limit is not None and not self.ip_limit.take(now):
+                    self.drop("ip")
+                else:
+                    yield message
+            elif message.type == aiohttp.WSMsgType.PING:
+                await self.ws.pong(message.data)
+            elif message.type != aiohttp.WSMsgType.PONG:
+                if (
+                    isinstance(message.data, WebSocketError)
+                    and message.data.code == aiohttp.WSCloseCode.MESSAGE_TOO_BIG
+                ):
+                    self.drop("size")
+                yield message
+
+    def drop(self, limit: str) -> None:
+        if self.metrics is not None:
+            self.metrics.dropped.inc(limit)
+
+
+async def ping(ws: web.WebSocketResponse) -> None:
+    with suppress(ConnectionError):
+        await ws.ping()
+
+
+# limits of the connections of a worker, the settings by default
+@dataclass(slots=True)
+class ConnectionLimits:
+    # 0 disables the sweep
+    ping_interval: float = settings.WS_PING_INTERVAL
+    idle_timeout: float = settings.WS_IDLE_TIMEOUT
+    stall_timeout: float = settings.WS_OUTBOX_STALL_TIMEOUT
+    # 0 is no limit
+    max_connections: int = settings.MAX_CONNECTIONS
+    max_connections_per_ip: int = settings.MAX_CONNECTIONS_PER_IP
+    # 0 rate is no limit
+    connection_rate: float = settings.CONNECTION_RATE_PER_IP
+    connection_burst: int = settings.CONNECTION_BURST_PER_IP
+    message_rate: float = settings.WS_MESSAGE_RATE
+    message_burst: int = settings.WS_MESSAGE_BURST
+    ip_message_rate: float = settings.WS_IP_MESSAGE_RATE
+    ip_message_burst: int = settings.WS_IP_MESSAGE_BURST
+    mux_message_rate: float = settings.MUX_MESSAGE_RATE
+    mux_message_burst: int = settings.MUX_MESSAGE_BURST
+
+
+# open websockets of a worker with their limits. A single sweep pings the
+# connections that went quiet and drops the ones that stayed quiet for longer
+# than the idle timeout or fell behind with their frames for too long, instead
+# of a timer per connection.
+class Connections:
+    def __init__(
+        self, metrics: ServerMetrics, limits: ConnectionLimits | None = None
+    ) -> None:
+        self.metrics: ServerMetrics = metrics
+        self.limits: ConnectionLimits = limits or ConnectionLimits()
+        self.open: set[Connection] = set()
+        self.per_ip: Counter[str] = Counter()
+        # buckets by ip, kept by the sweep until they refill
+        self.ip_connections: dict[str, TokenBucket] = {}
+        self.ip_messages: dict[str, TokenBucket] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    # registers a websocket before its handshake, the handshake is refused
+    # with 503 over the total limit and with 429 over the limits of the ip. A
+    # multiplexed connection carries the frames of many games, it has a frame
+    # limit of its own.
+    def accept(
+        self,
+        request: web.Request,
+        ws: web.WebSocketResponse,
+        multiplexed: bool = False,
+    ) -> Connection:
+        limits, remote = self.limits, request.remote or ""
+        if limits.max_connections and len(self.open) >= limits.max_connections:
+            self.metrics.rejected.inc("total")
+            raise web.HTTPServiceUnavailable(text="Too many connections")
+        if (
+            limits.max_connections_per_ip
+            and self.per_ip[remote] >= limits.max_connections_per_ip
+        ):
+            self.metrics.rejected.inc("ip")
+            raise web.HTTPTooManyRequests(text="Too many connections from the ip")
+        if limits.connection_rate:
+            connects = self.ip_connections.get(remote)
+            if connects is None:
+                connects = self.ip_connections[remote] = TokenBucket(
+                    limits.connection_rate, limits.connection_burst
+                )
+            if not connects.take(time.monotonic()):
+                self.metrics.rejected.inc("rate")
+                raise web.HTTPTooManyRequests(
+                    text="Too many new connections from the ip"
+                )
+        if multiplexed:
+            limit = bucket(limits.mux_message_rate, limits.mux_message_burst)
+            ip_limit = None
+        else:
+            limit = bucket(limits.message_rate, limits.message_burst)
+            ip_limit = self.ip_messages.get(remote)
+            if ip_limit is None and limits.ip_message_rate:
+                ip_limit = self.ip_messages[remote] = TokenBucket(
+                    limits.ip_message_rate, limits.ip_message_burst
+                )
+        connection = Connection(
+            ws=ws,
+            remote=remote,
+            transport=request.transport,
+            limit=limit,
+            ip_limit=ip_limit,
+            metrics=self.metrics,
+        )
+        self.open.add(connection)
+        self.per_ip[remote] += 1
+        return connection
+
+    def release(self, connection: Connection) -> None:
+        if connection not in self.open:
+            return
+        self.open.remove(connection)
+        self.per_ip[connection.remote] -= 1
+        if not self.per_ip[connection.remote]:
+            del self.per_ip[connection.remote]
+
+    # the transport is dropped without a closing handshake that a vanished
+    # client would never answer. The handler sees the connection closed on
+    # its next receive and leaves its game right away.
+    def reap(self, connection: Connection, reason: str) -> None:
+        self.release(connection)
+        self.metrics.reaped.inc(reason)
+        logger.debug("Reaped %s connection from %s", reason, connection.remote)
+        if connection.transport is not None:
+            connection.transport.abort()
+
+    def prune(self, now: float) -> None:
+        for buckets in (self.ip_connections, self.ip_messages):
+            for remote, limit in list(buckets.items()):
+                if remote not in self.per_ip and limit.full(now):
+                    del buckets[remote]
+
+    async def sweep(self) -> None:
+        limits, now = self.limits, time.monotonic()
+        self.prune(now)
+        quiet = []
+        for connection in list(self.open):
+            idle = now - connection.last_seen
+            if idle >= limits.idle_timeout:
+                self.reap(connection, "idle")
+            elif connection.outbox is not None and connection.outbox.stalled(
+                limits.stall_timeout
+            ):
+                self.reap(connection, "slow")
+            elif (
+                idle >= limits.ping_interval
+                and not connection.pinged
+                and not connection.ws.closed
+            ):
+                connection.pinged = True
+                quiet.append(asyncio.ensure_future(ping(connection.ws)))
+        if not quiet:
+            return
+        # a ping only waits on a client that does not read its frames
+        try:
+            await asyncio.wait(quiet, timeout=limits.ping_interval)
+        finally:
+            for task in quiet:
+                task.cancel()
+
+    # closes the open connections on shutdown, the handlers return and the
+    # server does not wait for them
+    async def close(self) -> None:
+        await asyncio.gather(
+            *(
+                connection.ws.close(
+                    code=aiohttp.WSCloseCode.GOING_AWAY, message=b"Server shutdown"
+                )
+                for connection in list(self.open)
+            ),
+            return_exceptions=True,
+        )
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.limits.ping_interval)
+            try:
+                await self.sweep()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Connection sweep failed")
+
+    def start(self) -> None:
+        if self.limits.ping_interval and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
@@ -22,3 +22,15 @@ class BoxIsNotEmptyError(BaseGameValidationError):
 
 class TurnWithoutSecondPlayerError(BaseGameValidationError):
     pass
+
+
+class GameNotFoundError(BaseGameValidationError):
+    pass
+
+
+class GameAlreadyJoinedError(BaseGameValidationError):
+    pass
+
+
+class TooManyGamesError(BaseGameValidationError):
+    pass
@@ -1,32 +1,97 @@
 import asyncio
 import logging
+import multiprocessing
+import os
+import signal
+import tempfile
 
 from aiohttp import web
 
 from onx import settings
 from onx.server.app import get_application
+from onx.server.broker import Broker
+from onx.server.broker import BrokerServer
+from onx.server.broker import UnixSocketBroker
 
 
-async def run_server() -> None:
-    app = get_application()
+async def run_server(
+    broker: Broker | None = None, reuse_port: bool = False
+) -> web.AppRunner:
+    app = get_application(broker)
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, settings.SERVER_HOST, settings.SERVER_PORT)
+    site = web.TCPSite(
+        runner, settings.SERVER_HOST, settings.SERVER_PORT, reuse_port=reuse_port
+    )
     logging.info(
         "Server started at ws://%s:%s", settings.SERVER_HOST, settings.SERVER_PORT
     )
     await site.start()
+    return runner
 
 
-def run_event_loop():
+def setup_logging() -> None:
     logging.basicConfig(
-        level=settings.LOGGING_LEVEL, format="%(asctime)s %(levelname)s: %(message)s"
+        level=settings.LOGGING_LEVEL,
+        format="%(asctime)s %(levelname)s [%(process)d]: %(message)s",
     )
 
+
+def run_worker(broker_path: str) -> None:
+    setup_logging()
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(run_server())
+    broker = UnixSocketBroker(broker_path)
+    runner = loop.run_until_complete(run_server(broker, reuse_port=True))
+    # a worker can not match players without the broker, the parent
+    # terminates the workers on its shutdown
+    closed = loop.create_task(broker.wait_closed())
+    loop.add_signal_handler(signal.SIGTERM, closed.cancel)
     try:
-        loop.run_forever()
-    except KeyboardInterrupt:
+        loop.run_until_complete(closed)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    logging.info("Worker is shutting down")
+    # stops the registry, so that the journal is flushed and the ai pool is shut
+    loop.run_until_complete(runner.cleanup())
+
+
+def run_event_loop(workers: int = 1):
+    setup_logging()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if workers == 1:
+        runner = loop.run_until_complete(run_server())
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        logging.info("Server is shutting down")
+        # closes the connections and saves the games
+        loop.run_until_complete(runner.cleanup())
+        return
+
+    with tempfile.TemporaryDirectory(prefix="onx-") as tmp_dir:
+        broker_server = BrokerServer(os.path.join(tmp_dir, "broker.sock"))
+        loop.run_until_complete(broker_server.start())
+        # workers are not daemons, so that they can run ai process pools. They
+        # are terminated below and exit on their own once the broker is gone.
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(broker_server.path,))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        logging.info("Started %s workers", workers)
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
         logging.info("Server is shutting down")
+        for process in processes:
+            process.terminate()
+            process.join()
+        loop.run_until_complete(broker_server.stop())
@@ -1,62 +1,154 @@
+import asyncio
 import logging
 import random
+import time
+import uuid
+import weakref
+from collections.abc import Awaitable
+from collections.abc import Callable
 from dataclasses import dataclass
 from types import TracebackType
 
 from aiohttp import web
 from cachetools import TTLCache
+from pydantic.error_wrappers import ValidationError
 
+from onx import binary
+from onx import codec
 from onx import settings
+from onx.models import BoxType
+from onx.models import GameStatus
 from onx.models import WsEvent
+from onx.models import WsGameDeltaEvent
+from onx.models import WsGameDeltaPayload
+from onx.models import WsGameSnapshotEvent
+from onx.models import WsGameSnapshotPayload
 from onx.models import WsGameStateEvent
 from onx.models import WsGameStatePayload
+from onx.server.ai import AiEngine
+from onx.server.ai import AiSocket
+from onx.server.bitboard import get_layout
+from onx.server.bitboard import is_winning_move
+from onx.server.broker import Broker
+from onx.server.broker import InProcessBroker
+from onx.server.broker import RemoteSocket
+from onx.server.connections import Connections
+from onx.server.errors import BaseGameValidationError
 from onx.server.errors import BoxIsNotEmptyError
 from onx.server.errors import InvalidTurnNumberError
 from onx.server.errors import NotYourTurnError
 from onx.server.errors import TurnWithoutSecondPlayerError
+from onx.server.journal import Journal
+from onx.server.metrics import ServerMetrics
+from onx.server.outbox import Channel
+from onx.server.outbox import Outbox
+from onx.server.snapshot import dump
+from onx.server.snapshot import NO_TURN
+from onx.server.snapshot import OfflineSocket
+from onx.server.snapshot import Snapshot
+from onx.server.watchers import Broadcast
+from onx.server.watchers import Relays
 
 logger = logging.getLogger(__name__)
 
 
-class BoxType:
-    empty: int = 1
-    nought: int = 2
-    cross: int = 3
-    opposite: dict = {cross: nought, nought: cross}
-
-
-class GameStatus:
-    # game is waiting for a player
-    awaiting: int = 100
-    # game is in progress
-    in_progress: int = 200
-    # game is finished
-    finished: int = 300
-
-
-@dataclass
+@dataclass(slots=True)
 class Player:
     id: str
-    ws: web.WebSocketResponse
+    ws: web.WebSocketResponse | Outbox | Channel | RemoteSocket | AiSocket | OfflineSocket
     box_type: int = BoxType.empty
+    # receive a snapshot and then deltas instead of the full state
+    delta: bool = False
+    # speak the binary subprotocol instead of json
+    binary: bool = False
+    ai: bool = False
 
 
-@dataclass(eq=True, frozen=True)
+@dataclass(eq=True, frozen=True, slots=True)
 class GameContext:
     winning_length: int = settings.DEFAULT_WINNING_LENGTH
     grid_size: int = settings.DEFAULT_GRID_SIZE
 
+    @property
+    def key(self) -> str:
+        return f"{self.grid_size}x{self.winning_length}"
+
 
-class Game:
+# the rules of a game and its frames in every protocol, the frames are built
+# from the game state directly
+class Game:  # pylint: disable=too-many-public-methods
     player_amount: int = 2
 
-    def __init__(self, context: GameContext) -> None:
-        self.grid: list[int] = [BoxType.empty] * context.grid_size**2
+    __slots__ = (
+        "id",
+        "context",
+        "layout",
+        "noughts",
+        "crosses",
+        "moves",
+        "seq",
+        "last_turn",
+        "_frames",
+        "_frames_seq",
+        "whose_turn",
+        "players",
+        "status",
+        "winner",
+        "broadcast",
+        "__weakref__",
+    )
+
+    def __init__(self, context: GameContext, game_id: str | None = None) -> None:
+        self.id: str = game_id or uuid.uuid4().hex
         self.context = context
+        self.layout = get_layout(context.grid_size, context.winning_length)
+        # bitboards of noughts and crosses
+        self.noughts: int = 0
+        self.crosses: int = 0
+        self.moves: int = 0
+        # bumped on every state change, sent to delta subscribers
+        self.seq: int = 0
+        self.last_turn: int | None = None
+        # encoded events for the current seq, shared by one broadcast
+        self._frames: dict[tuple[str, int], str | bytes] | None = None
+        self._frames_seq: int = -1
         self.whose_turn: Player | None = None
         self.players: list[Player] = []
         self.status: int = GameStatus.awaiting
         self.winner: Player | None = None
+        # created by the first watcher
+        self.broadcast: Broadcast | None = None
+
+    @property
+    def boards(self) -> dict[int, int]:
+        return {BoxType.nought: self.noughts, BoxType.cross: self.crosses}
+
+    def board(self, box_type: int) -> int:
+        return self.noughts if box_type == BoxType.nought else self.crosses
+
+    @property
+    def grid(self) -> list[int]:
+        noughts, crosses = self.noughts, self.crosses
+        return [
+            BoxType.nought
+            if noughts >> num & 1
+            else BoxType.cross
+            if crosses >> num & 1
+            else BoxType.empty
+            for num in range(self.context.grid_size**2)
+        ]
+
+    @grid.setter
+    def grid(self, grid: list[int]) -> None:
+        self.noughts = self.crosses = 0
+        for num, box_type in enumerate(grid):
+            if box_type == BoxType.nought:
+                self.noughts |= 1 << num
+            elif box_type == BoxType.cross:
+                self.crosses |= 1 << num
+        self.moves = sum(box_type != BoxType.empty for box_type in grid)
+        self.seq += 1
+        self.last_turn = None
 
     def add_player(self, player: Player) -> None:
         assert len(self.players) < Game.player_amount, "Max player amount reached."
@@ -72,6 +164,7 @@ class Game:
             player.box_type = box_type
         self.whose_turn = self.players[random.randint(0, 1)]
         self.status = GameStatus.in_progress
+        self.seq += 1
 
     def substitute_player(self, player: Player) -> None:
         for num, plr in enumerate(self.players):
@@ -88,6 +181,27 @@ class Game:
             "status": self.status,
         }
 
+    def to_snapshot_dict(self) -> dict:
+        return {**self.to_dict(), "seq": self.seq}
+
+    def to_delta_dict(self) -> dict:
+        assert self.last_turn is not None, "Delta is applicable after a turn"
+        return {
+            "seq": self.seq,
+            "turn": self.last_turn,
+            "box_type": self.box_type_at(self.last_turn),
+            "whose_turn": self.whose_turn and self.whose_turn.id or None,
+            "winner": self.winner and self.winner.id or None,
+            "status": self.status,
+        }
+
+    def box_type_at(self, turn: int) -> int:
+        if self.noughts >> turn & 1:
+            return BoxType.nought
+        if self.crosses >> turn & 1:
+            return BoxType.cross
+        return BoxType.empty
+
     def turn(self, player: Player, turn: int) -> None:
         if len(self.players) != Game.player_amount:
             raise TurnWithoutSecondPlayerError()
@@ -95,16 +209,23 @@ class Game:
             raise NotYourTurnError()
         if turn not in range(self.context.grid_size**2):
             raise InvalidTurnNumberError()
-        if self.grid[turn] != BoxType.empty:
+        box = 1 << turn
+        if (self.noughts | self.crosses) & box:
             raise BoxIsNotEmptyError()
 
-        self.grid[turn] = player.box_type
+        if player.box_type == BoxType.nought:
+            self.noughts |= box
+        else:
+            self.crosses |= box
+        self.moves += 1
+        self.seq += 1
+        self.last_turn = turn
         self.whose_turn = [p for p in self.players if p.id != self.whose_turn.id][0]
         if self.is_winner(player, turn):
             self.winner = player
             self.status = GameStatus.finished
             logger.debug("Game finished")
-        elif BoxType.empty not in self.grid:
+        elif self.moves == self.context.grid_size**2:
             self.status = GameStatus.finished
             logger.debug("Game finished")
 
@@ -176,62 +297,627 @@ class Game:
         )
 
     def is_winner(self, player: Player, turn: int) -> bool:
-        return any(
-            any(
-                len(s.replace(str(BoxType.empty), "")) == self.context.winning_length
-                for s in "".join(
-                    map(lambda x: str(self.grid[x]), line),
-                ).split(str(BoxType.opposite[player.box_type]))
+        return is_winning_move(self.layout, self.board(player.box_type), turn)
+
+    def state_event(self) -> WsEvent:
+        return WsEvent(
+            data=WsGameStateEvent(payload=WsGameStatePayload(**self.to_dict()))
+        )
+
+    def snapshot_event(self) -> WsEvent:
+        return WsEvent(
+            data=WsGameSnapshotEvent(
+                payload=WsGameSnapshotPayload(**self.to_snapshot_dict())
             )
-            for line in self.gen_winning_lines(turn)
         )
 
-    async def publish_state(self) -> None:
-        payload = WsEvent(
-            data=WsGameStateEvent(payload=WsGameStatePayload(**self.to_dict()))
+    def delta_event(self) -> WsEvent:
+        return WsEvent(
+            data=WsGameDeltaEvent(payload=WsGameDeltaPayload(**self.to_delta_dict()))
+        )
+
+    def slot(self, player: Player | None) -> int:
+        for num, plr in enumerate(self.players, start=1):
+            if player is not None and plr.id == player.id:
+                return num
+        return 0
+
+    def frame(self, kind: str, slot: int | None = None) -> str | bytes:
+        if self._frames is None or self._frames_seq != self.seq:
+            self._frames = {}
+            self._frames_seq = self.seq
+        key = (kind, -1 if slot is None else slot)
+        if key not in self._frames:
+            if slot is not None:
+                self._frames[key] = self.encode_binary(kind, slot)
+            else:
+                self._frames[key] = self.encode_json(kind)
+        return self._frames[key]
+
+    def encode_json(self, kind: str) -> str:
+        whose_turn = self.whose_turn.id if self.whose_turn else None
+        winner = self.winner.id if self.winner else None
+        if kind == "delta":
+            assert self.last_turn is not None, "Delta is applicable after a turn"
+            return codec.encode_delta(
+                self.seq,
+                self.last_turn,
+                self.box_type_at(self.last_turn),
+                whose_turn,
+                winner,
+                self.status,
+            )
+        if kind == "snapshot":
+            return codec.encode_snapshot(
+                whose_turn, self.grid, winner, self.status, self.seq
+            )
+        return codec.encode_state(whose_turn, self.grid, winner, self.status)
+
+    def encode_binary(self, kind: str, slot: int) -> bytes:
+        if kind == "delta":
+            assert self.last_turn is not None, "Delta is applicable after a turn"
+            return binary.encode_delta(
+                self.seq,
+                self.status,
+                self.slot(self.whose_turn),
+                self.slot(self.winner),
+                slot,
+                self.last_turn,
+                self.box_type_at(self.last_turn),
+            )
+        return binary.encode_state(
+            self.seq,
+            self.status,
+            self.slot(self.whose_turn),
+            self.slot(self.winner),
+            slot,
+            self.context.grid_size,
+            self.grid,
         )
+
+    def subscriber_frame(self, player: Player, kind: str) -> str | bytes:
+        return self.frame(kind, self.slot(player) if player.binary else None)
+
+    async def publish_state(self, delta: bool = False) -> None:
+        sends = []
         for subscriber in self.players:
-            try:
-                await subscriber.ws.send_json(payload.dict())
-            except ConnectionResetError as err:
-                logger.warning(err)
+            ws = subscriber.ws
+            if not subscriber.delta:
+                kind = "state"
+            elif not delta or isinstance(ws, (Outbox, Channel)) and ws.has_state():
+                # a delta can not replace a state that is not sent yet
+                kind = "snapshot"
+            else:
+                kind = "delta"
+            frame = self.subscriber_frame(subscriber, kind)
+            if isinstance(ws, (Outbox, Channel)):
+                ws.put_state(frame)
+            else:
+                sends.append(send_frame(ws, frame))
+        if sends:
+            await asyncio.gather(*sends)
+        # idle games do not keep encoded frames
+        self._frames = None
+        if self.broadcast is not None:
+            # watchers are served after the players are, off the turn path
+            asyncio.get_running_loop().call_soon(self.publish_watchers)
 
+    def watch(self) -> Broadcast:
+        if self.broadcast is None:
+            self.broadcast = Broadcast()
+            self.publish_watchers()
+        return self.broadcast
 
-class GamePool:
+    def publish_watchers(self) -> None:
+        assert self.broadcast is not None, "Game has no watchers"
+        self.broadcast.publish(
+            self.encode_json("state"), self.status == GameStatus.finished
+        )
 
-    _awaiting: dict[GameContext, Game] = {}
-    _active_games: TTLCache[str, Game] = TTLCache(maxsize=10**6, ttl=60 * 60)
+    async def publish_snapshot(self, player: Player) -> None:
+        frame = self.subscriber_frame(player, "snapshot")
+        if isinstance(player.ws, (Outbox, Channel)):
+            player.ws.put_state(frame)
+        else:
+            await send_frame(player.ws, frame)
 
-    def __init__(self, context: GameContext, player: Player):
-        self._context: GameContext = context
-        self._player: Player = player
-        self._game: Game | None = None
 
-    async def __aenter__(self) -> Game:
+async def send_frame(
+    ws: web.WebSocketResponse
+    | Outbox
+    | Channel
+    | RemoteSocket
+    | AiSocket
+    | OfflineSocket,
+    frame: str | bytes,
+) -> None:
+    try:
+        await asyncio.wait_for(
+            ws.send_bytes(frame) if isinstance(frame, bytes) else ws.send_str(frame),
+            settings.WS_SEND_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Sending to a stalled websocket timed out")
+    except ConnectionResetError as err:
+        logger.warning(err)
+
+
+async def send_error(
+    error: Exception,
+    ws: web.WebSocketResponse
+    | Outbox
+    | Channel
+    | RemoteSocket
+    | AiSocket
+    | OfflineSocket,
+) -> None:
+    if isinstance(error, ValidationError):
+        message = str(";".join(" ".join(map(str, e.values())) for e in error.errors()))
+    else:
+        message = str(error)
+    logger.warning(message)
+    if ws.ws_protocol == binary.PROTOCOL:
+        await ws.send_bytes(binary.encode_error(message))
+        return
+    await ws.send_str(codec.encode_error(message))
+
+
+# a game owned by another worker, the owner validates forwarded operations and
+# publishes the state back through the broker
+class RemoteGame:
+    def __init__(self, broker: Broker, worker_id: str) -> None:
+        self.broker: Broker = broker
+        self.worker_id: str = worker_id
+
+    def turn(self, player: Player, turn: int) -> None:
+        self.broker.post(
+            self.worker_id, {"type": "turn", "player_id": player.id, "turn": turn}
+        )
+
+    async def publish_state(self, delta: bool = False) -> None:
+        pass
+
+    async def publish_snapshot(self, player: Player) -> None:
+        self.broker.post(self.worker_id, {"type": "resync", "player_id": player.id})
+
+
+class GameRegistry:
+    def __init__(self, broker: Broker | None = None) -> None:
+        self.broker: Broker = broker or InProcessBroker()
+        # pools waiting for a second player in games owned by this worker by game id
+        self.awaiting: dict[str, GamePool] = {}
+        self.active_games: TTLCache[str, Game] = TTLCache(maxsize=10**6, ttl=60 * 60)
+        # finished games only answer late operations for a short while
+        self.finished_games: TTLCache[str, Game] = TTLCache(
+            maxsize=10**6, ttl=settings.FINISHED_GAME_TTL
+        )
+        # games owned by this worker by game id, for watchers
+        self.games: weakref.WeakValueDictionary[
+            str, Game
+        ] = weakref.WeakValueDictionary()
+        self.ai: AiEngine = AiEngine()
+        self.journal: Journal = Journal()
+        # pools of players connected to this worker in games owned by other workers
+        self.remote_pools: dict[str, GamePool] = {}
+        # games saved by the previous server process, not resumed yet
+        self.snapshot: Snapshot | None = None
+        self.metrics: ServerMetrics = ServerMetrics(
+            self.count_awaiting,
+            self.count_active,
+            [error.__name__ for error in BaseGameValidationError.__subclasses__()],
+        )
+        self.connections: Connections = Connections(self.metrics)
+        self.relays: Relays = Relays(self.broker, self.watch_local, self.metrics)
+        # handlers of the broker messages by type
+        self.handlers: dict[str, Callable[[dict], Awaitable[None]]] = {
+            "matched": self._matched,
+            "requeue": self._requeue,
+            "join": self._join,
+            "rejoin": self._rejoin,
+            "attach": self._attach,
+            "turn": self._turn,
+            "resync": self._resync,
+            "frame": self._frame,
+            "close": self._close,
+            "watch": self.relays.on_watch,
+            "watched": self.relays.on_watched,
+            "unwatch": self.relays.on_unwatch,
+        }
+
+    async def start(self) -> None:
+        await self.broker.start(self.on_message)
+        self.connections.start()
+
+    async def stop(self) -> None:
+        await self.connections.stop()
+        self.relays.stop()
+        await self.broker.stop()
+        self.ai.stop()
+        await self.journal.stop()
+
+    async def play(self, game: Game, player: Player, turn: int) -> None:
+        metrics = self.metrics
+        started = time.perf_counter()
+        try:
+            game.turn(player, turn)
+        except BaseGameValidationError as err:
+            metrics.errors.inc(type(err).__name__)
+            raise
+        turned = time.perf_counter()
+        metrics.turn_seconds.observe(turned - started)
+        metrics.turns.inc()
+        self.journal.turn(game, player, turn)
+        if game.status == GameStatus.finished:
+            self.journal.finished(game)
+            self.retire(game)
+        await game.publish_state(delta=True)
+        metrics.publish_seconds.observe(time.perf_counter() - turned)
+
+    def count_awaiting(self) -> dict[str, float]:
+        counts: dict[str, float] = {}
+        for pool in self.awaiting.values():
+            counts[pool.context.key] = counts.get(pool.context.key, 0) + 1
+        return counts
+
+    def count_active(self) -> dict[str, float]:
+        # both players of a local game share it
+        return {"": len({id(game) for game in self.active_games.values()})}
+
+    def retire(self, game: Game) -> None:
+        for player in game.players:
+            if self.active_games.get(player.id) is game:
+                del self.active_games[player.id]
+                self.broker.unbind(player.id)
+            self.finished_games[player.id] = game
+
+    # saves the awaiting and in progress games, the games of the previous
+    # snapshot that have not been resumed are saved again
+    def save(self, path: str) -> int:
+        if self.snapshot is not None:
+            for player_id in list(self.snapshot.index):
+                self.restore(player_id)
+        games = {
+            game.id: game
+            for game in self.active_games.values()
+            if game.status != GameStatus.finished
+            and not any(isinstance(player.ws, RemoteSocket) for player in game.players)
+        }
+        return dump(path, games.values())
+
+    # decodes the saved game of a player, the players are offline until they
+    # reconnect and substitute themselves
+    def restore(self, player_id: str) -> Game | None:
+        if self.snapshot is None or player_id not in self.snapshot.index:
+            return None
+        record, players = self.snapshot.read(self.snapshot.index[player_id])
+        game = Game(
+            GameContext(
+                grid_size=record.grid_size, winning_length=record.winning_length
+            ),
+            record.game_id.hex(),
+        )
+        game.noughts = int.from_bytes(record.noughts, "little")
+        game.crosses = int.from_bytes(record.crosses, "little")
+        game.moves, game.seq, game.status = record.moves, record.seq, record.status
+        game.last_turn = None if record.last_turn == NO_TURN else record.last_turn
+        for restored_id, box_type, delta, is_binary, ai in players:
+            del self.snapshot.index[restored_id]
+            game.add_player(
+                Player(
+                    id=restored_id,
+                    ws=AiSocket(self, game, restored_id) if ai else OfflineSocket(),
+                    box_type=box_type,
+                    delta=delta,
+                    binary=is_binary,
+                    ai=ai,
+                )
+            )
+            self.active_games[restored_id] = game
+            self.broker.bind(restored_id)
+        if record.whose_turn:
+            game.whose_turn = game.players[record.whose_turn - 1]
+        if record.winner:
+            game.winner = game.players[record.winner - 1]
+        self.register(game)
+        return game
+
+    # a game owned by this worker, watchable from every worker
+    def register(self, game: Game) -> None:
+        self.games[game.id] = game
+        self.relays.bind(game, game.id)
+
+    def watch_local(self, game_id: str) -> Broadcast | None:
+        game = self.games.get(game_id)
+        return game.watch() if game is not None else None
+
+    # the broadcast of a game, the games of other workers are relayed
+    async def watch(self, game_id: str) -> Broadcast | None:
+        return self.watch_local(game_id) or await self.relays.watch(game_id)
+
+    def remote_player(self, message: dict) -> Player:
+        return Player(
+            id=message["player_id"],
+            ws=RemoteSocket(
+                self.broker,
+                message["worker_id"],
+                message["player_id"],
+                binary.PROTOCOL if message["binary"] else None,
+            ),
+            delta=message["delta"],
+            binary=message["binary"],
+        )
+
+    async def on_message(self, message: dict) -> None:
+        handler = self.handlers.get(message["type"])
+        if handler is not None:
+            await handler(message)
+
+    async def _matched(self, message: dict) -> None:
+        pool = self.awaiting.pop(message["game_id"], None)
+        if pool is None:
+            # the player has left before the batch was delivered
+            self.broker.post(
+                message["target_worker_id"],
+                {"type": "requeue", "game_id": message["target_game_id"]},
+            )
+            return
+        await pool.join(message["target_game_id"], message["target_worker_id"])
+
+    async def _requeue(self, message: dict) -> None:
+        pool = self.awaiting.get(message["game_id"])
+        if pool is not None:
+            await pool.enqueue()
+
+    async def _join(self, message: dict) -> None:
+        player_id = message["player_id"]
+        pool = self.awaiting.pop(message["game_id"], None)
+        if pool is None:
+            self.broker.post(
+                message["worker_id"], {"type": "rejoin", "player_id": player_id}
+            )
+            return
+        pool.matched()
+        joined = pool.game
+        assert isinstance(joined, Game)
+        joined.add_player(self.remote_player(message))
+        self.active_games[player_id] = joined
+        self.broker.bind(player_id)
+        joined.toss()
+        self.journal.started(joined)
+        logger.debug("Game started %s", joined.context)
+        await joined.publish_state()
+
+    async def _rejoin(self, message: dict) -> None:
+        pool = self.remote_pools.get(message["player_id"])
+        if pool is not None:
+            await pool.enqueue()
+
+    async def _attach(self, message: dict) -> None:
+        player_id = message["player_id"]
+        game = self.active_games.get(player_id)
+        if game is None or game.status != GameStatus.in_progress:
+            self.broker.unbind(player_id)
+            self.broker.post(
+                message["worker_id"], {"type": "close", "player_id": player_id}
+            )
+            return
+        game.substitute_player(self.remote_player(message))
+        logger.debug("Game retrieved after disconnection for player_id=%s", player_id)
+        await game.publish_state()
+
+    # the game and the player of a forwarded operation, finished games included
+    def _operated(self, player_id: str) -> tuple[Game, Player] | None:
+        game = self.active_games.get(player_id) or self.finished_games.get(player_id)
+        if game is None:
+            return None
+        player = next((p for p in game.players if p.id == player_id), None)
+        if player is None:
+            return None
+        return game, player
+
+    async def _turn(self, message: dict) -> None:
+        operated = self._operated(message["player_id"])
+        if operated is None:
+            return
+        game, player = operated
+        try:
+            await self.play(game, player, message["turn"])
+        except BaseGameValidationError as err:
+            await send_error(err, player.ws)
+            await player.ws.close()
+
+    async def _resync(self, message: dict) -> None:
+        operated = self._operated(message["player_id"])
+        if operated is not None:
+            game, player = operated
+            await game.publish_snapshot(player)
+
+    async def _frame(self, message: dict) -> None:
+        pool = self.remote_pools.get(message["player_id"])
+        if pool is not None:
+            await send_frame(pool.player.ws, RemoteSocket.decode_frame(message))
+
+    async def _close(self, message: dict) -> None:
+        pool = self.remote_pools.get(message["player_id"])
+        if pool is not None:
+            await pool.player.ws.close()
+
+
+# the game session of a connected player, the game may change while the player
+# waits in the matchmaking queue
+class GamePool:
+    def __init__(
+        self,
+        context: GameContext,
+        player: Player,
+        registry: GameRegistry,
+        ai: bool = False,
+    ):
+        self.context: GameContext = context
+        self.player: Player = player
+        self.registry: GameRegistry = registry
+        # play against an ai instead of waiting for a partner
+        self.ai: bool = ai
+        self._game: Game | RemoteGame | None = None
+        self._ai_timer: asyncio.TimerHandle | None = None
+        self._ai_task: asyncio.Task | None = None
+        # when the player started waiting for a partner
+        self._waiting_since: float | None = None
+
+    @property
+    def game(self) -> Game | RemoteGame:
+        assert self._game is not None, "Game pool is not entered"
+        return self._game
+
+    async def __aenter__(self) -> "GamePool":
+        registry, broker = self.registry, self.registry.broker
+        game = registry.active_games.get(self.player.id) or registry.restore(
+            self.player.id
+        )
+        restored = None
         if (
-            self._player.id in GamePool._active_games
-            and GamePool._active_games[self._player.id].status == GameStatus.in_progress
+            game is not None
+            and game.status == GameStatus.awaiting
+            and game.id not in registry.awaiting
         ):
-            self._game = GamePool._active_games[self._player.id]
-            self._game.substitute_player(self._player)
+            # a restored game waits for a partner again if the context is kept
+            del registry.active_games[self.player.id]
+            if game.context == self.context:
+                game.players.clear()
+                restored = game
+        elif game is not None and game.status == GameStatus.in_progress:
+            game.substitute_player(self.player)
             logger.debug(
-                "Game retrieved after disconnection for player_id=%s", self._player.id
+                "Game retrieved after disconnection for player_id=%s", self.player.id
             )
-        elif self._context in GamePool._awaiting:
-            self._game = GamePool._awaiting[self._context]
-            del GamePool._awaiting[self._context]
-            self._game.add_player(self._player)
-            GamePool._active_games[self._player.id] = self._game
-            self._game.toss()
-            logger.debug("Game started %s", self._context)
+            self._game = game
+            await game.publish_state()
+            return self
+        owner = await broker.lookup(self.player.id)
+        if owner is not None and owner != broker.worker_id:
+            self.attach_remote("attach", owner)
+        elif self.ai:
+            self.adopt(Game(self.context))
+            await self.play_ai()
         else:
-            self._game = Game(self._context)
-            self._game.add_player(self._player)
-            GamePool._active_games[self._player.id] = self._game
-            GamePool._awaiting[self._context] = self._game
-            logger.debug("Game created %s", self._context)
-        await self._game.publish_state()
-        return self._game
+            self._waiting_since = time.perf_counter()
+            await self.enqueue(restored)
+        return self
+
+    def adopt(self, game: Game) -> None:
+        registry = self.registry
+        game.add_player(self.player)
+        self._game = game
+        registry.active_games[self.player.id] = game
+        registry.register(game)
+        registry.broker.bind(self.player.id)
+        registry.journal.created(game, self.player)
+        logger.debug("Game created %s %s", game.id, self.context)
+
+    # waits for a second player in an own game, unless one is already queued
+    async def enqueue(self, restored: Game | None = None) -> None:
+        registry, broker = self.registry, self.registry.broker
+        game = self._game
+        if not isinstance(game, Game):
+            registry.remote_pools.pop(self.player.id, None)
+            game = restored or Game(self.context)
+        match = await broker.pair(self.context.key, game.id)
+        if match is not None:
+            registry.awaiting.pop(game.id, None)
+            await self.join(*match)
+            return
+        registry.awaiting[game.id] = self
+        if game is not self._game:
+            self.adopt(game)
+            if settings.AI_WAIT_TIMEOUT:
+                self._ai_timer = asyncio.get_running_loop().call_later(
+                    settings.AI_WAIT_TIMEOUT, self.stop_waiting
+                )
+            await game.publish_state()
+
+    def matched(self) -> None:
+        if self._waiting_since is not None:
+            self.registry.metrics.match_seconds.observe(
+                time.perf_counter() - self._waiting_since, self.context.key
+            )
+            self._waiting_since = None
+
+    # an ai takes the place of the partner that has not arrived in time
+    def stop_waiting(self) -> None:
+        registry, game = self.registry, self._game
+        if isinstance(game, Game) and registry.awaiting.get(game.id) is self:
+            del registry.awaiting[game.id]
+            registry.broker.cancel(self.context.key, game.id)
+            self._ai_task = asyncio.create_task(self.play_ai())
+
+    async def play_ai(self) -> None:
+        game = self._game
+        assert isinstance(game, Game)
+        self.matched()
+        player_id = f"ai-{uuid.uuid4().hex}"
+        game.add_player(
+            Player(id=player_id, ws=AiSocket(self.registry, game, player_id), ai=True)
+        )
+        game.toss()
+        self.registry.journal.started(game)
+        logger.debug("Game started %s against ai", self.context)
+        await game.publish_state()
+
+    # the own game of the player is never started
+    def abandon(self) -> None:
+        game = self._game
+        if isinstance(game, Game) and game.status == GameStatus.awaiting:
+            self.registry.journal.closed(game, self.player)
+
+    # joins a game waiting for a second player
+    async def join(self, game_id: str, worker_id: str) -> None:
+        registry, broker = self.registry, self.registry.broker
+        if worker_id != broker.worker_id:
+            self.matched()
+            self.abandon()
+            self.attach_remote("join", worker_id, game_id=game_id)
+            return
+        pool = registry.awaiting.pop(game_id, None)
+        if pool is None:
+            # the other player has left in the meantime
+            await self.enqueue()
+            return
+        self.matched()
+        self.abandon()
+        pool.matched()
+        game = pool.game
+        assert isinstance(game, Game)
+        game.add_player(self.player)
+        game.toss()
+        registry.journal.started(game)
+        self._game = game
+        registry.active_games[self.player.id] = game
+        broker.bind(self.player.id)
+        logger.debug("Game started %s", self.context)
+        await game.publish_state()
+
+    async def turn(self, turn: int) -> None:
+        if isinstance(self.game, Game):
+            await self.registry.play(self.game, self.player, turn)
+            return
+        self.game.turn(self.player, turn)
+
+    def attach_remote(self, message_type: str, worker_id: str, **kwargs) -> None:
+        registry, broker = self.registry, self.registry.broker
+        registry.active_games.pop(self.player.id, None)
+        registry.remote_pools[self.player.id] = self
+        broker.post(
+            worker_id,
+            {
+                "type": message_type,
+                "player_id": self.player.id,
+                "worker_id": broker.worker_id,
+                "delta": self.player.delta,
+                "binary": self.player.binary,
+                **kwargs,
+            },
+        )
+        self._game = RemoteGame(broker, worker_id)
 
     async def __aexit__(
         self,
@@ -239,8 +925,21 @@ class GamePool:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        if (
-            self._context in GamePool._awaiting
-            and GamePool._awaiting[self._context] is self._game
+        registry = self.registry
+        if self._ai_timer is not None:
+            self._ai_timer.cancel()
+        if isinstance(self._game, RemoteGame):
+            if registry.remote_pools.get(self.player.id) is self:
+                del registry.remote_pools[self.player.id]
+        elif self._game is not None and registry.awaiting.get(self._game.id) is self:
+            del registry.awaiting[self._game.id]
+            registry.broker.cancel(self.context.key, self._game.id)
+            self.abandon()
+            if registry.active_games.get(self.player.id) is self._game:
+                del registry.active_games[self.player.id]
+                registry.broker.unbind(self.player.id)
+        elif isinstance(self._game, Game) and any(
+            player is self.player for player in self._game.players
         ):
-            del GamePool._awaiting[self._context]
+            # the game outlives the connection, it must not keep the socket
+            self.player.ws = OfflineSocket()
@@ -1,69 +1,263 @@
-import json
+import asyncio
 import logging
+from contextlib import AsyncExitStack
 
 import aiohttp
 from aiohttp import web
 from pydantic.error_wrappers import ValidationError
 
+from onx import binary
+from onx import codec
+from onx import settings
+from onx.deflate import DeflateResponse
+from onx.models import GameStatus
 from onx.models import WsCookie
-from onx.models import WsErrorEvent
-from onx.models import WsErrorEventPayload
-from onx.models import WsEvent
-from onx.models import WsOperation
+from onx.models import WsMuxJoinPayload
+from onx.server.connections import Connection
 from onx.server.errors import BaseGameValidationError
+from onx.server.errors import GameAlreadyJoinedError
+from onx.server.errors import GameNotFoundError
+from onx.server.errors import TooManyGamesError
+from onx.server.game import Game
 from onx.server.game import GameContext
 from onx.server.game import GamePool
 from onx.server.game import Player
+from onx.server.game import send_error
+from onx.server.outbox import Channel
+from onx.server.outbox import Outbox
+from onx.server.watchers import stream
 
 logger = logging.getLogger(__name__)
 
 
 class WebsocketHandler(web.View):
     async def get(self) -> web.WebSocketResponse:
-        ws = web.WebSocketResponse()
-        await ws.prepare(self.request)
+        registry = self.request.app["registry"]
+        # pings are answered by the connection, so that pongs keep it alive
+        ws = DeflateResponse(
+            protocols=(binary.PROTOCOL,),
+            autoping=False,
+            max_msg_size=settings.WS_MAX_FRAME_SIZE,
+        )
+        connection = registry.connections.accept(self.request, ws)
+        websockets = registry.metrics.websockets
+        websockets.inc("player")
+        try:
+            await ws.prepare(self.request)
+            return await self.play(connection)
+        finally:
+            websockets.dec("player")
+            registry.connections.release(connection)
+
+    async def play(self, connection: Connection) -> web.WebSocketResponse:
+        ws = connection.ws
         try:
             cookie = WsCookie(**self.request.cookies)
         except ValidationError as err:
-            await self.send_error(err, ws)
+            await send_error(err, ws)
             return ws
-        player = Player(id=cookie.player_id, ws=ws)
+        outbox = connection.outbox = Outbox(ws, self.request.transport)
+        outbox.start()
+        player = Player(
+            id=cookie.player_id,
+            ws=outbox,
+            delta=cookie.delta,
+            binary=ws.ws_protocol == binary.PROTOCOL,
+        )
         context = GameContext(
             grid_size=cookie.grid_size, winning_length=cookie.winning_length
         )
-        async with GamePool(context, player) as game:
-            async for message in ws:
-                if message.type == aiohttp.WSMsgType.TEXT:
+        try:
+            await self.receive(connection, player, context, cookie.ai)
+        finally:
+            # the queued frames, errors included, go out before the close
+            await outbox.close()
+        logger.debug("Websocket connection closed")
+        return ws
+
+    async def receive(
+        self, connection: Connection, player: Player, context: GameContext, ai: bool
+    ) -> None:
+        async with GamePool(
+            context, player, self.request.app["registry"], ai=ai
+        ) as pool:
+            async for message in connection.messages():
+                if message.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
                     try:
-                        operation = WsOperation(**json.loads(message.data))
-                    except ValidationError as err:
-                        await self.send_error(err, ws)
-                        return ws
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            turn = codec.decode_operation(message.data)
+                        else:
+                            turn = binary.decode_operation(message.data)
+                    except (ValidationError, binary.DecodeError) as err:
+                        await send_error(err, player.ws)
+                        return
+                    if turn is None:
+                        await pool.game.publish_snapshot(player)
+                        continue
                     try:
-                        game.turn(player, int(operation.payload.turn))
+                        await pool.turn(turn)
                     except BaseGameValidationError as err:
-                        await self.send_error(err, ws)
-                        return ws
-                    await game.publish_state()
+                        await send_error(err, player.ws)
+                        return
                 if message.type == aiohttp.WSMsgType.ERROR:
                     logger.debug(
                         "Websocket connection closed with exception %s",
-                        ws.exception(),
+                        connection.ws.exception(),
                     )
-        logger.debug("Websocket connection closed")
+
+
+# many games over one connection. Every frame of the client carries the id of
+# its game, the events of the games that are ready at once go out in one frame.
+class MuxHandler(web.View):
+    def __init__(self, request: web.Request) -> None:
+        super().__init__(request)
+        self.ws: web.WebSocketResponse = DeflateResponse(
+            autoping=False, max_msg_size=settings.WS_MAX_FRAME_SIZE
+        )
+        self.outbox: Outbox = Outbox(
+            self.ws,
+            request.transport,
+            size=2 * settings.MUX_MAX_GAMES,
+            high_water=settings.MUX_MAX_GAMES,
+            batch=True,
+        )
+        self.player_id: str = ""
+        # game pools with the exit stacks that leave them by game id
+        self.games: dict[str, tuple[GamePool, AsyncExitStack]] = {}
+
+    async def get(self) -> web.WebSocketResponse:
+        registry = self.request.app["registry"]
+        ws = self.ws
+        connection = registry.connections.accept(self.request, ws, multiplexed=True)
+        websockets = registry.metrics.websockets
+        websockets.inc("mux")
+        try:
+            await ws.prepare(self.request)
+            return await self.play(connection)
+        finally:
+            websockets.dec("mux")
+            registry.connections.release(connection)
+
+    async def play(self, connection: Connection) -> web.WebSocketResponse:
+        ws = connection.ws
+        try:
+            cookie = WsCookie(**self.request.cookies)
+        except ValidationError as err:
+            await send_error(err, ws)
+            return ws
+        self.player_id = cookie.player_id
+        connection.outbox = self.outbox
+        self.outbox.start()
+        try:
+            await self.receive(connection)
+        finally:
+            for game in list(self.games):
+                await self.leave(game)
+            await self.outbox.close()
+        logger.debug("Multiplexed connection closed")
         return ws
 
-    @staticmethod
-    async def send_error(error: Exception, ws: web.WebSocketResponse) -> None:
-        if isinstance(error, ValidationError):
-            message = str(
-                ";".join(" ".join(map(str, e.values())) for e in error.errors())
-            )
+    async def receive(self, connection: Connection) -> None:
+        async for message in connection.messages():
+            if message.type == aiohttp.WSMsgType.ERROR:
+                logger.debug(
+                    "Websocket connection closed with exception %s",
+                    connection.ws.exception(),
+                )
+                continue
+            try:
+                game, operation, value = codec.decode_mux_operation(message.data)
+            except ValueError as err:
+                await send_error(err, self.outbox)
+                return
+            try:
+                await self.operate(game, operation, value)
+            except BaseGameValidationError as err:
+                # a bad operation of one game leaves the others be
+                await send_error(err, Channel(self.outbox, game, self.close))
+
+    async def operate(
+        self, game: str, operation: str, value: int | WsMuxJoinPayload | None
+    ) -> None:
+        if operation == "join":
+            assert isinstance(value, WsMuxJoinPayload)
+            await self.join(game, value)
+            return
+        if game not in self.games:
+            raise GameNotFoundError()
+        pool, _ = self.games[game]
+        if operation == "leave":
+            await self.leave(game)
+        elif operation == "resync":
+            await pool.game.publish_snapshot(pool.player)
         else:
-            message = str(error)
-        logger.warning(message)
-        await ws.send_json(
-            WsEvent(
-                data=WsErrorEvent(payload=WsErrorEventPayload(message=message))
-            ).dict()
+            assert isinstance(value, int)
+            await pool.turn(value)
+
+    async def join(self, game: str, payload: WsMuxJoinPayload) -> None:
+        if game in self.games:
+            joined = self.games[game][0].game
+            # the id of a finished game is free for the next one
+            if not isinstance(joined, Game) or joined.status != GameStatus.finished:
+                raise GameAlreadyJoinedError()
+            await self.leave(game)
+        if len(self.games) >= settings.MUX_MAX_GAMES:
+            raise TooManyGamesError()
+        player = Player(
+            id=f"{self.player_id}.{game}",
+            ws=Channel(self.outbox, game, self.close),
+            delta=payload.delta,
         )
+        pool = GamePool(
+            GameContext(
+                grid_size=payload.grid_size, winning_length=payload.winning_length
+            ),
+            player,
+            self.request.app["registry"],
+            ai=payload.ai,
+        )
+        stack = AsyncExitStack()
+        await stack.enter_async_context(pool)
+        self.games[game] = pool, stack
+
+    async def leave(self, game: str) -> None:
+        _, stack = self.games.pop(game)
+        await stack.aclose()
+
+    # a game is closed by its owner worker after a bad forwarded turn
+    async def close(self, channel: Channel) -> None:
+        joined = self.games.get(channel.game)
+        if joined is not None and joined[0].player.ws is channel:
+            await self.leave(channel.game)
+
+
+# read-only stream of a game owned by this worker
+class WatchHandler(web.View):
+    async def get(self) -> web.WebSocketResponse:
+        registry = self.request.app["registry"]
+        ws = DeflateResponse(autoping=False, max_msg_size=settings.WS_MAX_FRAME_SIZE)
+        connection = registry.connections.accept(self.request, ws)
+        try:
+            await ws.prepare(self.request)
+            game_id = self.request.match_info["game_id"]
+            broadcast = await registry.watch(game_id)
+            if broadcast is None:
+                registry.metrics.errors.inc(GameNotFoundError.__name__)
+                await send_error(GameNotFoundError(), ws)
+                await ws.close()
+                return ws
+            registry.metrics.websockets.inc("watcher")
+            writer = asyncio.create_task(stream(ws, broadcast))
+            # the relay of a remote game is checked once the writer has left
+            writer.add_done_callback(lambda _: registry.relays.unwatch(game_id))
+            try:
+                # watchers can not make turns, incoming messages are ignored
+                async for _ in connection.messages():
+                    pass
+            finally:
+                writer.cancel()
+                registry.metrics.websockets.dec("watcher")
+        finally:
+            registry.connections.release(connection)
+        logger.debug("Watcher connection closed")
+        return ws
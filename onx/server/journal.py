@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from onx import settings
+
+if TYPE_CHECKING:
+    from onx.server.game import Game
+    from onx.server.game import Player
+
+logger = logging.getLogger(__name__)
+
+# magic, version and record size at the start of every segment
+HEADER = struct.Struct("<4sHH")
+MAGIC = b"ONXJ"
+VERSION = 1
+# game id, microseconds since the epoch, player key, game seq, value, event
+# kind, box type, grid size and winning length
+RECORD = struct.Struct("<16sQ8sIHBBBB")
+SUFFIX = ".journal"
+NO_PLAYER = bytes(8)
+
+
+class EventKind:
+    # the creator waits for a partner
+    created: int = 1
+    # one record per player after the toss, value is 1 for the first to move
+    started: int = 2
+    # value is the box taken
+    turn: int = 3
+    # the player and the box type of the winner if any, value is the moves made
+    finished: int = 4
+    # the creator left before a partner arrived or joined another game
+    closed: int = 5
+
+
+class Record(NamedTuple):
+    game_id: bytes
+    time_us: int
+    player: bytes
+    seq: int
+    value: int
+    kind: int
+    box_type: int
+    grid_size: int
+    winning_length: int
+
+
+# player ids are free form, records keep a short digest of them
+def player_key(player_id: str) -> bytes:
+    return hashlib.blake2b(player_id.encode(), digest_size=8).digest()
+
+
+# appends game events of a server process to a directory of segment files.
+# Records are packed into a buffer on the loop and written by a single thread,
+# a segment is closed for a new one once it reaches the segment size.
+class Journal:
+    def __init__(
+        self,
+        directory: str = settings.JOURNAL_DIR,
+        segment_size: int = settings.JOURNAL_SEGMENT_SIZE,
+        flush_interval: float = settings.JOURNAL_FLUSH_INTERVAL,
+    ) -> None:
+        # an empty directory disables the journal
+        self.directory: str = directory
+        # whole records only, so that a record never spans two segments
+        self.segment_size: int = max(
+            segment_size - (segment_size - HEADER.size) % RECORD.size,
+            HEADER.size + RECORD.size,
+        )
+        self.flush_interval: float = flush_interval
+        self._buffer: bytearray = bytearray()
+        self._timer: asyncio.TimerHandle | None = None
+        self._writer: ThreadPoolExecutor | None = None
+        self._pending: asyncio.Future | None = None
+        # accessed by the writer thread only
+        self._file: BinaryIO | None = None
+        self._file_size: int = 0
+
+    # one argument per field of the record
+    def append(  # pylint: disable=too-many-arguments
+        self,
+        kind: int,
+        game: "Game",
+        player: "Player | None" = None,
+        value: int = 0,
+        box_type: int = 0,
+    ) -> None:
+        if not self.directory:
+            return
+        self._buffer += RECORD.pack(
+            bytes.fromhex(game.id),
+            time.time_ns() // 1000,
+            NO_PLAYER if player is None else player_key(player.id),
+            game.seq,
+            value,
+            kind,
+            box_type,
+            game.context.grid_size,
+            game.context.winning_length,
+        )
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self.flush
+            )
+
+    def created(self, game: "Game", player: "Player") -> None:
+        self.append(EventKind.created, game, player)
+
+    def started(self, game: "Game") -> None:
+        for player in game.players:
+            self.append(
+                EventKind.started,
+                game,
+                player,
+                player is game.whose_turn,
+                player.box_type,
+            )
+
+    def turn(self, game: "Game", player: "Player", turn: int) -> None:
+        self.append(EventKind.turn, game, player, turn, player.box_type)
+
+    def finished(self, game: "Game") -> None:
+        winner = game.winner
+        self.append(
+            EventKind.finished,
+            game,
+            winner,
+            game.moves,
+            0 if winner is None else winner.box_type,
+        )
+
+    def closed(self, game: "Game", player: "Player") -> None:
+        self.append(EventKind.closed, game, player)
+
+    def flush(self) -> None:
+        self._timer = None
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1)
+        chunk, self._buffer = self._buffer, bytearray()
+        self._pending = asyncio.get_running_loop().run_in_executor(
+            self._writer, self.write, chunk
+        )
+
+    def write(self, chunk: bytearray) -> None:
+        try:
+            view = memoryview(chunk)
+            while view:
+                if self._file is None or self._file_size >= self.segment_size:
+                    self.rotate()
+                assert self._file is not None
+                size = min(len(view), self.segment_size - self._file_size)
+                self._file.write(view[:size])
+                self._file_size += size
+                view = view[size:]
+            assert self._file is not None
+            self._file.flush()
+        except OSError:
+            logger.exception("Journal write failed")
+
+    def rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        # names sort by creation time, the pid keeps the workers apart
+        path = os.path.join(
+            self.directory, f"{time.time_ns():020d}-{os.getpid()}{SUFFIX}"
+        )
+        self._file = open(path, "xb")  # pylint: disable=consider-using-with
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._file_size = HEADER.size
+
+    async def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self.flush()
+        if self._pending is not None:
+            await self._pending
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def segments(directory: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(SUFFIX)
+    )
+
+
+# microseconds since the epoch when a segment was started, from its name
+def segment_time_us(path: str) -> int:
+    return int(os.path.basename(path).split("-", 1)[0]) // 1000
+
+
+# maps a segment and unpacks records straight from the mapped pages. A record
+# cut short by a crash is skipped.
+def read_segment(path: str) -> Iterator[Record]:
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, size = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION or size != RECORD.size:
+                raise ValueError(f"{path} is not a journal segment")
+            start = HEADER.size
+            end = len(mapped) - (len(mapped) - start) % RECORD.size
+            with memoryview(mapped) as view, view[start:end] as records:
+                yield from map(Record._make, RECORD.iter_unpack(records))
+
+
+def read_journal(directory: str) -> Iterator[Record]:
+    for path in segments(directory):
+        yield from read_segment(path)
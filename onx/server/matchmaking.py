@@ -0,0 +1,86 @@
+import time
+from collections import defaultdict
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+
+
+@dataclass
+class Ticket:
+    game_id: str
+    worker_id: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class WaitStats:
+    waiting: int = 0
+    matched: int = 0
+    cancelled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.matched if self.matched else 0.0
+
+    def record(self, wait: float) -> None:
+        self.matched += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def to_dict(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "matched": self.matched,
+            "cancelled": self.cancelled,
+            "mean_wait": self.mean_wait,
+            "max_wait": self.max_wait,
+        }
+
+
+# FIFO queues of waiting games per context key. Games are indexed by id inside
+# their queue, so both enqueue and cancel are O(1).
+class Matchmaker:
+    def __init__(self) -> None:
+        self.queues: defaultdict[str, OrderedDict[str, Ticket]] = defaultdict(
+            OrderedDict
+        )
+        self.stats: defaultdict[str, WaitStats] = defaultdict(WaitStats)
+
+    def enqueue(self, key: str, ticket: Ticket) -> None:
+        self.queues[key][ticket.game_id] = ticket
+        self.stats[key].waiting += 1
+
+    def cancel(self, key: str, game_id: str) -> bool:
+        if self.queues[key].pop(game_id, None) is None:
+            return False
+        self.stats[key].waiting -= 1
+        self.stats[key].cancelled += 1
+        return True
+
+    def _pop(self, key: str, now: float) -> Ticket:
+        _, ticket = self.queues[key].popitem(last=False)
+        self.stats[key].waiting -= 1
+        self.stats[key].record(now - ticket.enqueued_at)
+        return ticket
+
+    # pairs the ticket with the longest waiting one, or queues it
+    def pair(self, key: str, ticket: Ticket) -> Ticket | None:
+        if not self.queues[key]:
+            self.enqueue(key, ticket)
+            return None
+        self.stats[key].record(0.0)
+        return self._pop(key, ticket.enqueued_at)
+
+    # pairs everything queued so far in arrival order, one pass for all contexts
+    def match(self) -> list[tuple[Ticket, Ticket]]:
+        now = time.monotonic()
+        matches = []
+        for key, queue in self.queues.items():
+            while len(queue) >= 2:
+                matches.append((self._pop(key, now), self._pop(key, now)))
+        return matches
+
+    def to_dict(self) -> dict[str, dict]:
+        return {key: stats.to_dict() for key, stats in self.stats.items()}
@@ -0,0 +1,222 @@
+from bisect import bisect_left
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+
+# content type of the prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+TURN_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+PUBLISH_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1)
+MATCH_BUCKETS = (0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# a metric is a family of samples that share a name, optionally split by one
+# label. Updates are plain arithmetic, the text is only built when scraped.
+class Metric:
+    kind: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, label: str = "") -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label: str = label
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def labels(self, value: str, **extra: str) -> str:
+        pairs = {self.label: value, **extra} if self.label else extra
+        if not pairs:
+            return ""
+        labels = ",".join(f'{key}="{val}"' for key, val in pairs.items())
+        return f"{{{labels}}}"
+
+    def expose(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, label: str = "", keys: Iterable[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, label)
+        # known label values are exposed before their first increment
+        self.values: dict[str, float] = {key: 0 for key in keys or ("",)}
+
+    def inc(self, key: str = "", amount: float = 1) -> None:
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        for key, value in self.values.items():
+            yield "", self.labels(key), value
+
+
+# a gauge is either set by the server or collected from its state when scraped
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label: str = "",
+        *,
+        keys: Iterable[str] = (),
+        collect: Callable[[], dict[str, float]] | None = None,
+    ) -> None:
+        super().__init__(name, documentation, label)
+        self.values: dict[str, float] = {key: 0 for key in keys or ("",)}
+        self.collect: Callable[[], dict[str, float]] | None = collect
+
+    def set(self, value: float, key: str = "") -> None:
+        self.values[key] = value
+
+    def inc(self, key: str = "", amount: float = 1) -> None:
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, key: str = "", amount: float = 1) -> None:
+        self.values[key] = self.values.get(key, 0) - amount
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        values = self.collect() if self.collect is not None else self.values
+        for key, value in values.items():
+            yield "", self.labels(key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...],
+        label: str = "",
+    ) -> None:
+        super().__init__(name, documentation, label)
+        self.buckets: tuple[float, ...] = buckets
+        # per bucket counts by label value, the last one is +Inf. Cumulated
+        # when scraped.
+        self.counts: dict[str, list[int]] = {}
+        self.sums: dict[str, float] = {}
+        if not label:
+            self.counts[""] = [0] * (len(buckets) + 1)
+            self.sums[""] = 0
+
+    def observe(self, value: float, key: str = "") -> None:
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[key] = self.sums.get(key, 0) + value
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        for key, counts in self.counts.items():
+            total = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                total += count
+                yield "_bucket", self.labels(key, le=format_value(bound)), total
+            yield "_sum", self.labels(key), self.sums[key]
+            yield "_count", self.labels(key), total
+
+
+def expose(metrics: Iterable[Metric]) -> str:
+    return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+# the metrics of a server process. Gauges of the game state are collected from
+# the registry when scraped, so they cost nothing on the hot path.
+class ServerMetrics:
+    def __init__(
+        self,
+        awaiting: Callable[[], dict[str, float]],
+        active: Callable[[], dict[str, float]],
+        errors: Iterable[str],
+    ) -> None:
+        self.awaiting_games = Gauge(
+            "onx_awaiting_games",
+            "Games waiting for a second player.",
+            label="context",
+            collect=awaiting,
+        )
+        self.active_games = Gauge(
+            "onx_active_games", "Games in progress or just finished.", collect=active
+        )
+        self.websockets = Gauge(
+            "onx_open_websockets",
+            "Open websocket connections.",
+            label="kind",
+            keys=("player", "watcher", "mux"),
+        )
+        self.rejected = Counter(
+            "onx_rejected_websockets_total",
+            "Websocket handshakes refused over a connection limit.",
+            label="limit",
+            keys=("total", "ip", "rate"),
+        )
+        self.reaped = Counter(
+            "onx_reaped_websockets_total",
+            "Websocket connections dropped for idling or falling behind.",
+            label="reason",
+            keys=("idle", "slow"),
+        )
+        self.dropped = Counter(
+            "onx_dropped_frames_total",
+            "Websocket frames dropped over a rate or size limit.",
+            label="limit",
+            keys=("connection", "ip", "size"),
+        )
+        self.turns = Counter("onx_turns_total", "Turns made.")
+        self.errors = Counter(
+            "onx_game_errors_total",
+            "Rejected game operations.",
+            label="error",
+            keys=errors,
+        )
+        self.turn_seconds = Histogram(
+            "onx_turn_seconds", "Time to validate and apply a turn.", TURN_BUCKETS
+        )
+        self.publish_seconds = Histogram(
+            "onx_publish_seconds",
+            "Time to send a game state to its players.",
+            PUBLISH_BUCKETS,
+        )
+        self.match_seconds = Histogram(
+            "onx_match_seconds",
+            "Time a player waits for a partner.",
+            MATCH_BUCKETS,
+            label="context",
+        )
+
+    def expose(self) -> str:
+        return expose(
+            (
+                self.awaiting_games,
+                self.active_games,
+                self.websockets,
+                self.rejected,
+                self.reaped,
+                self.dropped,
+                self.turns,
+                self.errors,
+                self.turn_seconds,
+                self.publish_seconds,
+                self.match_seconds,
+            )
+        )
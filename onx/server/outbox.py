@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from aiohttp import web
+
+from onx import codec
+from onx import settings
+
+logger = logging.getLogger(__name__)
+
+
+# an entry is a [frame, state key] list, so that a queued state is replaced in
+# place. Other frames have no state key.
+Entry = list
+
+
+# frames to one websocket, sent by a writer task of its own, so that a client
+# on a slow link does not hold up the turns of its opponent. A game state that
+# is not sent yet is replaced in place by a newer one, other frames are sent in
+# order. An outbox that overflows drops its connection. A batching outbox sends
+# the frames queued at once as one json array.
+class Outbox:
+    def __init__(
+        self,
+        ws: web.WebSocketResponse,
+        transport: asyncio.Transport | None = None,
+        *,
+        size: int = settings.WS_OUTBOX_SIZE,
+        high_water: int = settings.WS_OUTBOX_HIGH_WATER,
+        batch: bool = False,
+    ) -> None:
+        self.ws: web.WebSocketResponse = ws
+        self.transport: asyncio.Transport | None = transport
+        self.size: int = size
+        self.high_water: int = high_water
+        self.batch: bool = batch
+        self.frames: deque[Entry] = deque()
+        # queued states by key, one per game
+        self._states: dict[str, Entry] = {}
+        # monotonic time since when the outbox is at the high water mark
+        self.full_since: float | None = None
+        self.closed: bool = False
+        self._ready: asyncio.Event = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+
+    @property
+    def ws_protocol(self) -> str | None:
+        return self.ws.ws_protocol
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self.run())
+
+    def has_state(self, key: str = "") -> bool:
+        return key in self._states
+
+    def put(self, frame: str | bytes, key: str | None = None) -> Entry | None:
+        if self.closed:
+            return None
+        if len(self.frames) >= self.size:
+            logger.warning("Outbox overflow, connection dropped")
+            self.abort()
+            return None
+        entry = [frame, key]
+        self.frames.append(entry)
+        if self.full_since is None and len(self.frames) >= self.high_water:
+            self.full_since = time.monotonic()
+        self._ready.set()
+        return entry
+
+    def put_state(self, frame: str | bytes, key: str = "") -> None:
+        entry = self._states.get(key)
+        if entry is not None:
+            entry[0] = frame
+            return
+        entry = self.put(frame, key)
+        if entry is not None:
+            self._states[key] = entry
+
+    async def send_str(self, data: str) -> None:
+        self.put(data)
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.put(data)
+
+    def stalled(self, timeout: float) -> bool:
+        return (
+            self.full_since is not None
+            and time.monotonic() - self.full_since >= timeout
+        )
+
+    async def run(self) -> None:
+        frames, ws = self.frames, self.ws
+        try:
+            while frames or not self.closed:
+                if not frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                frame = self.pop_batch() if self.batch else self.pop()
+                if self.full_since is not None and len(frames) < self.high_water:
+                    self.full_since = None
+                if isinstance(frame, bytes):
+                    await ws.send_bytes(frame)
+                else:
+                    await ws.send_str(frame)
+        except ConnectionResetError:
+            self.closed = True
+            self.frames.clear()
+            self._states.clear()
+
+    def pop(self) -> str | bytes:
+        frame, key = self.frames.popleft()
+        if key is not None:
+            del self._states[key]
+        return frame
+
+    # the frames queued so far in one json array
+    def pop_batch(self) -> str:
+        batch = []
+        for _ in range(len(self.frames)):
+            frame = self.pop()
+            assert isinstance(frame, str), "Batched frames are json"
+            batch.append(frame)
+        return f"[{','.join(batch)}]"
+
+    # the frames queued so far are sent before the websocket is closed, a
+    # client that does not take them within the send timeout is dropped
+    async def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+        if self._writer is not None:
+            _, pending = await asyncio.wait(
+                {self._writer}, timeout=settings.WS_SEND_TIMEOUT
+            )
+            if pending:
+                self.abort()
+        await self.ws.close()
+
+    def abort(self) -> None:
+        self.closed = True
+        self.frames.clear()
+        self._states.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+        if self.transport is not None:
+            self.transport.abort()
+
+
+# one game of a multiplexed connection, its frames are tagged with the game id
+# and queued to the outbox of the connection. The handler leaves the game when
+# it is closed.
+class Channel:
+    ws_protocol: str | None = None
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        game: str,
+        on_close: Callable[["Channel"], Awaitable[None]],
+    ) -> None:
+        self.outbox: Outbox = outbox
+        self.game: str = game
+        self.on_close: Callable[["Channel"], Awaitable[None]] = on_close
+
+    def has_state(self) -> bool:
+        return self.outbox.has_state(self.game)
+
+    def put_state(self, frame: str | bytes) -> None:
+        assert isinstance(frame, str), "Multiplexed games speak json"
+        self.outbox.put_state(codec.tag_event(self.game, frame), self.game)
+
+    async def send_str(self, data: str) -> None:
+        self.outbox.put(codec.tag_event(self.game, data))
+
+    async def send_bytes(self, data: str | bytes) -> None:
+        assert isinstance(data, str), "Multiplexed games speak json"
+        await self.send_str(data)
+
+    async def close(self) -> None:
+        await self.on_close(self)
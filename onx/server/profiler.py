@@ -0,0 +1,114 @@
+import asyncio
+import inspect
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+
+def frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+# the outermost coroutine on the stack is the task the loop is running
+def task_name(frame: FrameType | None) -> str:
+    name = "-"
+    while frame is not None:
+        # the flag is set on inspect at import, pylint does not see it
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:  # pylint: disable=no-member
+            name = frame_name(frame)
+        frame = frame.f_back
+    return name
+
+
+def collapse(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# samples the stack of the event loop thread from a side thread. A heartbeat
+# scheduled on the loop tells the sampler whether the loop is stuck in one
+# callback, the samples of a stall longer than the threshold are kept apart.
+class Sampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float, threshold: float) -> None:
+        super().__init__(name="onx-profiler", daemon=True)
+        self.thread_id: int = thread_id
+        self.interval: float = interval
+        self.threshold: float = threshold
+        self.samples: Counter[str] = Counter()
+        # samples of stalls by running task and stack
+        self.blocked: Counter[tuple[str, str]] = Counter()
+        self.stalls: int = 0
+        # last time the loop ran the heartbeat, written by the loop thread
+        self.beat: float = time.perf_counter()
+        self._done: threading.Event = threading.Event()
+
+    def run(self) -> None:
+        stall: list[tuple[str, str]] = []
+        while not self._done.wait(self.interval):
+            # the only way to read the stack of another thread
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            frame = frames.get(self.thread_id)
+            if frame is None:
+                continue
+            stack = collapse(frame)
+            self.samples[stack] += 1
+            if time.perf_counter() - self.beat > self.interval * 2:
+                stall.append((task_name(frame), stack))
+            else:
+                self.flush(stall)
+                stall = []
+        self.flush(stall)
+
+    def flush(self, stall: list[tuple[str, str]]) -> None:
+        if stall and len(stall) * self.interval >= self.threshold:
+            self.stalls += 1
+            self.blocked.update(stall)
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+    def slow_callbacks(self) -> str:
+        interval_ms = self.interval * 10**3
+        lines = [
+            f"{self.stalls} stalls longer than {self.threshold * 10**3:.0f} ms, "
+            f"{sum(self.blocked.values()) * interval_ms:.0f} ms blocked "
+            f"of {sum(self.samples.values()) * interval_ms:.0f} ms sampled"
+        ]
+        for (task, stack), count in self.blocked.most_common():
+            lines.append(f"{count * interval_ms:>8.0f} ms {task} {stack}")
+        return "\n".join(lines) + "\n"
+
+
+# samples the running loop for the given seconds
+async def profile(seconds: float, interval: float, threshold: float) -> Sampler:
+    loop = asyncio.get_running_loop()
+    sampler = Sampler(threading.get_ident(), interval, threshold)
+    heartbeat: asyncio.TimerHandle | None = None
+
+    def beat() -> None:
+        nonlocal heartbeat
+        sampler.beat = time.perf_counter()
+        heartbeat = loop.call_later(interval, beat)
+
+    beat()
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        assert heartbeat is not None
+        heartbeat.cancel()
+        await loop.run_in_executor(None, sampler.stop)
+    return sampler
@@ -0,0 +1,264 @@
+import importlib
+import random
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from onx.models import BoxType
+from onx.server.ai import get_windows
+from onx.server.ai import search
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameStatus
+from onx.server.game import Player
+
+# a policy picks the box for the player to move, it sees the game as is and
+# must not change it
+Policy = Callable[[Game, Player], int]
+
+# games played by a pool process per task
+DEFAULT_BATCH = 1000
+# seconds a move of the ai policy may take
+AI_BUDGET = 0.001
+
+
+def empty_boxes(game: Game) -> list[int]:
+    taken = game.noughts | game.crosses
+    return [box for box in range(game.context.grid_size**2) if not taken >> box & 1]
+
+
+# random boxes are tried before the empty ones are listed while the most of the
+# board is empty. Either way every empty box is as likely.
+def random_policy(game: Game, _player: Player) -> int:
+    taken = game.noughts | game.crosses
+    size = game.context.grid_size**2
+    if game.moves * 2 < size:
+        while True:
+            box = random.randrange(size)
+            if not taken >> box & 1:
+                return box
+    return random.choice(empty_boxes(game))
+
+
+@lru_cache(maxsize=64)
+def get_lines(grid_size: int, winning_length: int) -> tuple[int, ...]:
+    # masks of every winning line of the board
+    windows = get_windows(grid_size, winning_length)
+    return tuple(sorted({mask for masks in windows for mask in masks}))
+
+
+# the box that completes a line of own, None if there is none
+def winning_box(lines: tuple[int, ...], need: int, own: int, other: int) -> int | None:
+    for mask in lines:
+        if not other & mask and (own & mask).bit_count() == need:
+            return (mask & ~own).bit_length() - 1
+    return None
+
+
+# wins when it can, blocks a win of the opponent otherwise, plays at random
+# when neither is at stake
+def greedy_policy(game: Game, player: Player) -> int:
+    context = game.context
+    lines = get_lines(context.grid_size, context.winning_length)
+    own = game.board(player.box_type)
+    other = (game.noughts | game.crosses) ^ own
+    need = context.winning_length - 1
+    box = winning_box(lines, need, own, other)
+    if box is None:
+        box = winning_box(lines, need, own=other, other=own)
+    if box is None:
+        box = random.choice(empty_boxes(game))
+    return box
+
+
+def ai_policy(game: Game, player: Player) -> int:
+    own = game.board(player.box_type)
+    other = (game.noughts | game.crosses) ^ own
+    box, _, _ = search(
+        game.context.grid_size,
+        game.context.winning_length,
+        own,
+        other,
+        0 if player.box_type == BoxType.nought else 1,
+        AI_BUDGET,
+    )
+    return box
+
+
+POLICIES: dict[str, Policy] = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "ai": ai_policy,
+}
+
+
+# a policy by its name or by the import path of any bot function,
+# "package.module:function"
+def get_policy(name: str) -> Policy:
+    if name in POLICIES:
+        return POLICIES[name]
+    module, sep, attr = name.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown policy {name}")
+    return getattr(importlib.import_module(module), attr)
+
+
+@dataclass
+class SelfPlayStats:
+    games: int = 0
+    moves: int = 0
+    first_wins: int = 0
+    second_wins: int = 0
+    draws: int = 0
+    # wins of the policies in the order they were given
+    policy_wins: tuple[int, int] = (0, 0)
+    # seconds spent playing summed over the pool processes, the rates of a
+    # context are per process
+    seconds: float = 0
+
+    def merge(self, other: "SelfPlayStats") -> None:
+        self.games += other.games
+        self.moves += other.moves
+        self.first_wins += other.first_wins
+        self.second_wins += other.second_wins
+        self.draws += other.draws
+        self.policy_wins = (
+            self.policy_wins[0] + other.policy_wins[0],
+            self.policy_wins[1] + other.policy_wins[1],
+        )
+        self.seconds += other.seconds
+
+
+# stats by game context key
+Summary = dict[str, SelfPlayStats]
+
+
+# plays one game to its end, returns the index of the policy that won or None
+# for a draw, and whether the winner moved first
+def play(
+    context: GameContext, policies: tuple[Policy, Policy]
+) -> tuple[Game, int | None, bool]:
+    game = Game(context)
+    players = [Player(id="0", ws=None), Player(id="1", ws=None)]  # type: ignore
+    game.add_player(players[0])
+    game.add_player(players[1])
+    game.toss()
+    first = game.whose_turn
+    while game.status != GameStatus.finished:
+        player = game.whose_turn
+        assert player is not None, "Game is in progress"
+        game.turn(player, policies[int(player.id)](game, player))
+    if game.winner is None:
+        return game, None, False
+    return game, int(game.winner.id), game.winner is first
+
+
+# runs in pool processes, so it only takes and returns plain values
+def play_batch(
+    grid_size: int,
+    winning_length: int,
+    policy_names: tuple[str, str],
+    games: int,
+    seed: int,
+) -> SelfPlayStats:
+    random.seed(seed)
+    context = GameContext(grid_size=grid_size, winning_length=winning_length)
+    policies = (get_policy(policy_names[0]), get_policy(policy_names[1]))
+    stats = SelfPlayStats()
+    wins = [0, 0]
+    started = time.perf_counter()
+    for _ in range(games):
+        game, winner, first = play(context, policies)
+        stats.moves += game.moves
+        if winner is None:
+            stats.draws += 1
+            continue
+        wins[winner] += 1
+        if first:
+            stats.first_wins += 1
+        else:
+            stats.second_wins += 1
+    stats.games = games
+    stats.policy_wins = (wins[0], wins[1])
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+# the games of every context in batches
+def split(
+    contexts: Iterable[GameContext], games: int, batch: int
+) -> list[tuple[GameContext, int]]:
+    return [
+        (context, min(batch, games - start))
+        for context in contexts
+        for start in range(0, games, batch)
+    ]
+
+
+# games of every context are split into batches that are played in parallel,
+# returns the summary and the wall time of the run. Takes the options of the
+# command as they are.
+def run(  # pylint: disable=too-many-arguments
+    contexts: Iterable[GameContext],
+    policy_names: tuple[str, str],
+    games: int,
+    workers: int | None = None,
+    batch: int = DEFAULT_BATCH,
+    seed: int = 0,
+) -> tuple[Summary, float]:
+    for name in policy_names:
+        get_policy(name)
+    tasks = split(contexts, games, batch)
+    summary: Summary = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (
+                context.key,
+                pool.submit(
+                    play_batch,
+                    context.grid_size,
+                    context.winning_length,
+                    policy_names,
+                    size,
+                    seed + num,
+                ),
+            )
+            for num, (context, size) in enumerate(tasks)
+        ]
+        for key, future in futures:
+            summary.setdefault(key, SelfPlayStats()).merge(future.result())
+    return summary, time.perf_counter() - started
+
+
+def format_summary(
+    summary: Summary, elapsed: float, policy_names: tuple[str, str]
+) -> str:
+    contexts = sorted(
+        summary.items(), key=lambda item: tuple(map(int, item[0].split("x")))
+    )
+    lines = [
+        f"{'context':>7} {'games':>9} {'games/s':>9} {'moves/s':>10} "
+        f"{'first':>6} {'second':>6} {'draws':>6} {'moves':>6} "
+        f"{policy_names[0][:8]:>8} {policy_names[1][:8]:>8}"
+    ]
+    for key, stats in contexts:
+        games = stats.games or 1
+        seconds = stats.seconds or 1
+        lines.append(
+            f"{key:>7} {stats.games:>9} {stats.games / seconds:>9.0f} "
+            f"{stats.moves / seconds:>10.0f} {stats.first_wins / games:>6.1%} "
+            f"{stats.second_wins / games:>6.1%} {stats.draws / games:>6.1%} "
+            f"{stats.moves / games:>6.1f} {stats.policy_wins[0] / games:>8.1%} "
+            f"{stats.policy_wins[1] / games:>8.1%}"
+        )
+    total = sum(stats.games for stats in summary.values())
+    moves = sum(stats.moves for stats in summary.values())
+    lines.append(
+        f"\n{total} games in {elapsed:.2f}s, {total / (elapsed or 1):.0f} games/s, "
+        f"{moves / (elapsed or 1):.0f} moves/s"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+import logging
+import os
+import struct
+from collections.abc import Iterable
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from onx.server.game import Game
+
+# magic, version and amount of games
+HEADER = struct.Struct("<4sHI")
+MAGIC = b"ONXS"
+VERSION = 1
+# game id, grid size, winning length, status, moves, seq, last turn, whose turn
+# and winner slots, noughts and crosses bitboards of up to 14x14 boxes
+GAME = struct.Struct("<16sBBHHIHBB25s25s")
+# offset and length of the id, box type, delta, binary and ai flags. Every game
+# has two player slots, the second one is empty in awaiting games.
+PLAYER = struct.Struct("<IHBBBB")
+NO_TURN = 0xFFFF
+EMPTY_PLAYER = PLAYER.pack(0, 0, 0, 0, 0, 0)
+
+logger = logging.getLogger(__name__)
+
+
+# the fields of a saved game in the order of the struct
+class GameRecord(NamedTuple):
+    game_id: bytes
+    grid_size: int
+    winning_length: int
+    status: int
+    moves: int
+    seq: int
+    last_turn: int
+    whose_turn: int
+    winner: int
+    noughts: bytes
+    crosses: bytes
+
+
+def dump(path: str, games: Iterable["Game"]) -> int:
+    records, players, ids = [], [], []
+    offset = 0
+    for game in games:
+        try:
+            record = GAME.pack(
+                bytes.fromhex(game.id),
+                game.context.grid_size,
+                game.context.winning_length,
+                game.status,
+                game.moves,
+                game.seq,
+                NO_TURN if game.last_turn is None else game.last_turn,
+                game.slot(game.whose_turn),
+                game.slot(game.winner),
+                game.noughts.to_bytes(25, "little"),
+                game.crosses.to_bytes(25, "little"),
+            )
+        except (OverflowError, struct.error):
+            # a game that does not fit the layout is lost, the others are saved
+            logger.warning("Game %s does not fit the snapshot", game.id)
+            continue
+        records.append(record)
+        for player in game.players:
+            player_id = player.id.encode()
+            players.append(
+                PLAYER.pack(
+                    offset,
+                    len(player_id),
+                    player.box_type,
+                    player.delta,
+                    player.binary,
+                    player.ai,
+                )
+            )
+            ids.append(player_id)
+            offset += len(player_id)
+        players.extend([EMPTY_PLAYER] * (2 - len(game.players)))
+    # a half written snapshot never replaces a whole one
+    with open(f"{path}.tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        file.write(b"".join(records))
+        file.write(b"".join(players))
+        file.write(b"".join(ids))
+    os.replace(f"{path}.tmp", path)
+    return len(records)
+
+
+# a loaded snapshot only indexes the games by player id. A game is decoded when
+# one of its players comes back, so that a restart is not slowed down by games
+# that are never resumed.
+class Snapshot:
+    def __init__(self, data: bytes) -> None:
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a game snapshot")
+        self.data: bytes = data
+        self.players_offset: int = HEADER.size + count * GAME.size
+        self.ids_offset: int = self.players_offset + count * 2 * PLAYER.size
+        # game numbers by player id of the games not resumed yet
+        self.index: dict[str, int] = {}
+        start, end = self.players_offset, self.ids_offset
+        ids = data[end:]
+        index = self.index
+        for num, player in enumerate(PLAYER.iter_unpack(memoryview(data)[start:end])):
+            if player[1]:
+                start = player[0]
+                end = start + player[1]
+                index[ids[start:end].decode()] = num >> 1
+
+    def read(
+        self, num: int
+    ) -> tuple[GameRecord, list[tuple[str, int, bool, bool, bool]]]:
+        game = GameRecord._make(
+            GAME.unpack_from(self.data, HEADER.size + num * GAME.size)
+        )
+        players = []
+        for slot in range(2):
+            offset, length, box_type, delta, binary, ai = PLAYER.unpack_from(
+                self.data, self.players_offset + (num * 2 + slot) * PLAYER.size
+            )
+            if length:
+                start = self.ids_offset + offset
+                end = start + length
+                player_id = self.data[start:end].decode()
+                players.append(
+                    (player_id, box_type, bool(delta), bool(binary), bool(ai))
+                )
+        return game, players
+
+
+def load(path: str) -> Snapshot | None:
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    snapshot = Snapshot(data)
+    # games are restored once, a later crash does not bring back stale games
+    os.remove(path)
+    return snapshot
+
+
+# stands in for the websocket of a restored player until the player reconnects
+class OfflineSocket:
+    ws_protocol: str | None = None
+
+    async def send_str(self, _data: str) -> None:
+        pass
+
+    async def send_bytes(self, _data: bytes) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import weakref
+from collections.abc import Callable
+
+from aiohttp import web
+
+from onx import codec
+from onx import settings
+from onx.server.broker import Broker
+from onx.server.errors import GameNotFoundError
+from onx.server.metrics import ServerMetrics
+
+logger = logging.getLogger(__name__)
+
+
+# the latest encoded state of a game, shared by all of its watchers
+class Broadcast:
+    def __init__(self) -> None:
+        self.frame: str = ""
+        self.version: int = 0
+        self.final: bool = False
+        self.watchers: int = 0
+        self._changed: asyncio.Event = asyncio.Event()
+
+    def publish(self, frame: str, final: bool = False) -> None:
+        self.frame = frame
+        self.version += 1
+        self.final = final
+        # wakes every waiting watcher at once, later waiters get a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, version: int) -> None:
+        while self.version == version:
+            await self._changed.wait()
+
+
+# streams a broadcast to one watcher. A watcher always gets the latest frame,
+# the frames published while it is busy sending are coalesced into that one.
+# A watcher that can not keep up with the send timeout is dropped.
+async def stream(ws: web.WebSocketResponse, broadcast: Broadcast) -> None:
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    assert task is not None
+    expired: list[bool] = []
+
+    def expire() -> None:
+        expired.append(True)
+        task.cancel()
+
+    broadcast.watchers += 1
+    version = 0
+    try:
+        while True:
+            await broadcast.wait(version)
+            version, frame, final = broadcast.version, broadcast.frame, broadcast.final
+            # a timer is cheaper than the task wait_for runs every send in
+            deadline = loop.call_later(settings.WS_SEND_TIMEOUT, expire)
+            try:
+                await ws.send_str(frame)
+            except asyncio.CancelledError:
+                if not expired:
+                    raise
+                logger.debug("Slow watcher dropped")
+                break
+            except ConnectionResetError:
+                break
+            finally:
+                deadline.cancel()
+            if final:
+                break
+    finally:
+        broadcast.watchers -= 1
+    await ws.close()
+
+
+# the exchange key of the worker that owns a game
+def watch_key(game_id: str) -> str:
+    return f"game:{game_id}"
+
+
+# the collector may run amid a write to the broker, so the key of a collected
+# game is unbound on the next loop iteration
+def unbind_later(loop: asyncio.AbstractEventLoop, broker: Broker, key: str) -> None:
+    if not loop.is_closed():
+        loop.call_soon(broker.unbind, key)
+
+
+# serves the watchers of the games owned by other workers. The owner relays the
+# broadcast of a game to every worker watching it, a watching worker shares the
+# relayed broadcast among its watchers and stops the relay with the last one.
+class Relays:
+    def __init__(
+        self,
+        broker: Broker,
+        find: Callable[[str], Broadcast | None],
+        metrics: ServerMetrics,
+    ) -> None:
+        self.broker: Broker = broker
+        # the broadcast of an own game by game id
+        self.find: Callable[[str], Broadcast | None] = find
+        self.metrics: ServerMetrics = metrics
+        # relays of the own games by game id and watching worker id
+        self.tasks: dict[tuple[str, str], asyncio.Task] = {}
+        # broadcasts of the games of other workers by game id, with the owner
+        self.remote: dict[str, tuple[Broadcast, str]] = {}
+
+    # binds an own game to this worker until the game is collected
+    def bind(self, game: object, game_id: str) -> None:
+        key = watch_key(game_id)
+        self.broker.bind(key)
+        loop = asyncio.get_running_loop()
+        weakref.finalize(game, unbind_later, loop, self.broker, key).atexit = False
+
+    def stop(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+
+    def post(self, worker_id: str, message: dict) -> None:
+        self.broker.post(worker_id, {**message, "worker_id": self.broker.worker_id})
+
+    async def watch(self, game_id: str) -> Broadcast | None:
+        if game_id not in self.remote:
+            owner = await self.broker.lookup(watch_key(game_id))
+            if owner is None or owner == self.broker.worker_id:
+                return None
+            # another watcher may have started the relay meanwhile
+            if game_id not in self.remote:
+                self.remote[game_id] = (Broadcast(), owner)
+                self.post(owner, {"type": "watch", "game_id": game_id})
+        return self.remote[game_id][0]
+
+    def unwatch(self, game_id: str) -> None:
+        remote = self.remote.get(game_id)
+        if remote is not None and not remote[0].watchers:
+            del self.remote[game_id]
+            self.post(remote[1], {"type": "unwatch", "game_id": game_id})
+
+    # forwards the broadcast of an own game until the final frame, counts as
+    # one watcher of the game
+    async def relay(self, game_id: str, broadcast: Broadcast, worker_id: str) -> None:
+        broadcast.watchers += 1
+        version = 0
+        try:
+            while True:
+                await broadcast.wait(version)
+                version = broadcast.version
+                self.post(
+                    worker_id,
+                    {
+                        "type": "watched",
+                        "game_id": game_id,
+                        "frame": broadcast.frame,
+                        "final": broadcast.final,
+                    },
+                )
+                if broadcast.final:
+                    break
+        finally:
+            broadcast.watchers -= 1
+            if self.tasks.get((game_id, worker_id)) is asyncio.current_task():
+                del self.tasks[game_id, worker_id]
+
+    async def on_watch(self, message: dict) -> None:
+        game_id, worker_id = message["game_id"], message["worker_id"]
+        broadcast = self.find(game_id)
+        if broadcast is None:
+            self.post(
+                worker_id,
+                {"type": "watched", "game_id": game_id, "frame": None, "final": True},
+            )
+        elif (game_id, worker_id) not in self.tasks:
+            self.tasks[game_id, worker_id] = asyncio.create_task(
+                self.relay(game_id, broadcast, worker_id)
+            )
+
+    async def on_watched(self, message: dict) -> None:
+        game_id, final = message["game_id"], message["final"]
+        remote = self.remote.get(game_id)
+        if remote is None:
+            # the last watcher has left before the relay stopped
+            if not final:
+                self.post(message["worker_id"], {"type": "unwatch", "game_id": game_id})
+            return
+        frame = message["frame"]
+        if frame is None:
+            self.metrics.errors.inc(GameNotFoundError.__name__)
+            frame = codec.encode_error(str(GameNotFoundError()))
+        remote[0].publish(frame, final)
+        if final:
+            del self.remote[game_id]
+
+    async def on_unwatch(self, message: dict) -> None:
+        task = self.tasks.pop((message["game_id"], message["worker_id"]), None)
+        if task is not None:
+            task.cancel()
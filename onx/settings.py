@@ -9,6 +9,108 @@ LOGGING_LEVEL = logging.DEBUG
 
 WS_HEARTBEAT_TIMEOUT = 10
 
+WS_SEND_TIMEOUT = 1
+
+# seconds a player or watcher connection is quiet before the server pings it,
+# also the period of the sweep over the connections
+WS_PING_INTERVAL = float(os.environ.get("WS_PING_INTERVAL", 15))
+
+# seconds without any frame, pongs included, before a connection is dropped
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", 45))
+
+# frames queued to a player connection before it is dropped
+WS_OUTBOX_SIZE = int(os.environ.get("WS_OUTBOX_SIZE", 32))
+
+# queued frames of a connection that count as a client falling behind
+WS_OUTBOX_HIGH_WATER = int(os.environ.get("WS_OUTBOX_HIGH_WATER", 8))
+
+# seconds a connection stays behind before it is dropped, checked by the sweep
+WS_OUTBOX_STALL_TIMEOUT = float(os.environ.get("WS_OUTBOX_STALL_TIMEOUT", 10))
+
+# frames a second and burst of a player or watcher connection, before the frames
+# are parsed. Frames over the limit are dropped. 0 is no limit.
+WS_MESSAGE_RATE = float(os.environ.get("WS_MESSAGE_RATE", 20))
+WS_MESSAGE_BURST = int(os.environ.get("WS_MESSAGE_BURST", 40))
+
+# frames a second and burst of all the connections from one ip, 0 is no limit
+WS_IP_MESSAGE_RATE = float(os.environ.get("WS_IP_MESSAGE_RATE", 200))
+WS_IP_MESSAGE_BURST = int(os.environ.get("WS_IP_MESSAGE_BURST", 400))
+
+# bytes of a frame, larger ones close the connection before they are decoded,
+# 0 is no limit
+WS_MAX_FRAME_SIZE = int(os.environ.get("WS_MAX_FRAME_SIZE", 4096))
+
+# new websockets a second and burst from one ip, 0 is no limit
+CONNECTION_RATE_PER_IP = float(os.environ.get("CONNECTION_RATE_PER_IP", 10))
+CONNECTION_BURST_PER_IP = int(os.environ.get("CONNECTION_BURST_PER_IP", 50))
+
+# window bits of permessage-deflate, 9 to 15. Negotiated with the clients that
+# offer it, 0 disables it.
+WS_COMPRESS_WBITS = int(os.environ.get("WS_COMPRESS_WBITS", 15))
+
+# zlib level of the compressed frames, 1 is the fastest
+WS_COMPRESS_LEVEL = int(os.environ.get("WS_COMPRESS_LEVEL", 1))
+
+# bytes of a frame below which it is sent uncompressed
+WS_COMPRESS_MIN_SIZE = int(os.environ.get("WS_COMPRESS_MIN_SIZE", 256))
+
+# games of one multiplexed connection
+MUX_MAX_GAMES = int(os.environ.get("MUX_MAX_GAMES", 1000))
+
+# frames a second and burst of a multiplexed connection, it is not limited by
+# the frame limit of its ip. 0 is no limit.
+MUX_MESSAGE_RATE = float(os.environ.get("MUX_MESSAGE_RATE", 1000))
+MUX_MESSAGE_BURST = int(os.environ.get("MUX_MESSAGE_BURST", 2000))
+
+# open websockets of a worker, 0 is no limit
+MAX_CONNECTIONS = int(os.environ.get("MAX_CONNECTIONS", 10_000))
+
+# open websockets of a worker from one ip, 0 is no limit
+MAX_CONNECTIONS_PER_IP = int(os.environ.get("MAX_CONNECTIONS_PER_IP", 100))
+
+# seconds between batched matchmaking passes, 0 pairs players on arrival
+MATCHMAKING_TICK = float(os.environ.get("MATCHMAKING_TICK", 0))
+
+# seconds a finished game is kept for late operations of its players
+FINISHED_GAME_TTL = 10
+
+# seconds a player waits for a partner before an ai joins, 0 never
+AI_WAIT_TIMEOUT = float(os.environ.get("AI_WAIT_TIMEOUT", 0))
+
+# seconds an ai searches for a move
+AI_MOVE_TIME = 0.5
+
+# ai search processes, None for one per cpu
+AI_WORKERS = None
+
+# ai searches submitted to the process pool at once
+AI_MAX_PENDING = 64
+
+# directory of the game event journal, empty disables it
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "")
+
+# bytes a journal segment grows to before a new one is started
+JOURNAL_SEGMENT_SIZE = 64 * 2**20
+
+# seconds journal records are buffered before they are written
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("JOURNAL_FLUSH_INTERVAL", 0.5))
+
+# file the games are saved to on shutdown and restored from on startup, empty
+# disables it
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "")
+
+# token of the admin routes, they are disabled unless it is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# seconds between profiler samples of the event loop
+PROFILE_INTERVAL = 0.005
+
+# longest profile run in seconds
+PROFILE_MAX_SECONDS = 60
+
+# seconds the event loop is stuck in one callback to be reported as slow
+SLOW_CALLBACK_DURATION = 0.1
+
 CLIENT_RECONNECT_TIMEOUT = 1
 
 DEFAULT_GRID_SIZE = 3
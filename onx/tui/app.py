@@ -2,23 +2,30 @@ import asyncio
 import uuid
 from contextlib import suppress
 from enum import IntEnum
+from typing import TYPE_CHECKING
 
-import aiohttp
 from textual.app import App
 
+from onx import binary
 from onx import settings
+from onx.models import BoxType
+from onx.models import GameStatus
 from onx.models import WsEvent
+from onx.models import WsGameDeltaEvent
+from onx.models import WsGameSnapshotEvent
 from onx.models import WsGameStateEvent
 from onx.models import WsOperation
 from onx.models import WsOperationPayload
-from onx.server.game import BoxType
-from onx.server.game import GameStatus
+from onx.models import WsResyncOperation
 from onx.tui.events import Connect
 from onx.tui.events import Disconnect
 from onx.tui.footer import Footer
 from onx.tui.grid import Grid
 from onx.tui.header import Header
 
+if TYPE_CHECKING:
+    import aiohttp
+
 
 class WebsocketConnectionState(IntEnum):
     CONNECTED = 1
@@ -31,6 +38,7 @@ class GameApp(App):
         *args,
         grid_size: int = settings.DEFAULT_GRID_SIZE,
         winning_length: int = settings.DEFAULT_WINNING_LENGTH,
+        ai: bool = False,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
@@ -39,10 +47,13 @@ class GameApp(App):
         self._grid: Grid = Grid(grid_size=grid_size)
         self._winning_length: int = winning_length
         self._grid_size: int = grid_size
+        self._ai: bool = ai
         self._player_id: str = str(uuid.uuid4())
-        self._ws: None | aiohttp.client.ClientWebSocketResponse = None
+        self._ws: "None | aiohttp.ClientWebSocketResponse" = None
         self._game_status: int = GameStatus.awaiting
         self._whose_turn: None | str = ""
+        # sequence number of the last applied state, None until a snapshot
+        self._seq: None | int = None
         self._box_types: dict = {
             BoxType.empty: " ",
             BoxType.nought: "0",
@@ -68,17 +79,30 @@ class GameApp(App):
             await self._ws.close()
 
     async def keep_connection(self) -> None:
+        # the client library is imported once the app is up, not before the
+        # first frame
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        # pylint: disable-next=import-outside-toplevel
+        from onx.deflate import DeflateClientResponse
+
         url = f"ws://{settings.SERVER_HOST}:{settings.SERVER_PORT}/ws"
         while True:
             with suppress(aiohttp.ClientConnectionError):
-                async with aiohttp.ClientSession() as session:
+                async with aiohttp.ClientSession(
+                    ws_response_class=DeflateClientResponse
+                ) as session:
                     async with session.ws_connect(
                         url,
+                        protocols=(binary.PROTOCOL,),
+                        compress=settings.WS_COMPRESS_WBITS,
                         heartbeat=settings.WS_HEARTBEAT_TIMEOUT,
                         headers={
                             "Cookie": f"player_id={self._player_id};"
                             f"grid_size={self._grid_size};"
-                            f"winning_length={self._winning_length}"
+                            f"winning_length={self._winning_length};"
+                            "delta=true;"
+                            f"ai={str(self._ai).lower()}"
                         },
                     ) as ws:
                         if (
@@ -90,54 +114,87 @@ class GameApp(App):
                             )
                             self._footer.post_message_no_wait(Connect(self))
                         self._ws = ws
+                        self._seq = None
                         async for msg in ws:
                             if msg.type == aiohttp.WSMsgType.TEXT:
                                 ws_event = WsEvent.parse_raw(msg.data)
                                 await self.on_ws_event(ws_event)
+                            elif msg.type == aiohttp.WSMsgType.BINARY:
+                                ws_event = binary.decode_event(
+                                    msg.data, self._player_id
+                                )
+                                await self.on_ws_event(ws_event)
             if self._websocket_connection_state == WebsocketConnectionState.CONNECTED:
                 self._websocket_connection_state = WebsocketConnectionState.DISCONNECTED
                 self._footer.post_message_no_wait(Disconnect(self))
             await asyncio.sleep(settings.CLIENT_RECONNECT_TIMEOUT)
 
     async def on_ws_event(self, event: WsEvent) -> None:
-        if isinstance(event.data, WsGameStateEvent):
-            self._game_status = event.data.payload.status
-            self._whose_turn = event.data.payload.whose_turn
-            if (
-                self._game_status == GameStatus.in_progress
-                and self._whose_turn == self._player_id
-            ):
-                self._header.state = "Your turn"
-            elif (
-                self._game_status == GameStatus.in_progress
-                and self._whose_turn != self._player_id
-            ):
-                self._header.state = "Waiting"
-            elif (
-                self._game_status == GameStatus.finished
-                and event.data.payload.winner != self._player_id
-            ):
-                self._header.state = "Looser"
-            elif (
-                self._game_status == GameStatus.finished
-                and event.data.payload.winner == self._player_id
-            ):
-                self._header.state = "Winner"
-            elif self._game_status == GameStatus.awaiting:
-                self._header.state = "Waiting"
+        if isinstance(event.data, (WsGameStateEvent, WsGameSnapshotEvent)):
+            if isinstance(event.data, WsGameSnapshotEvent):
+                self._seq = event.data.payload.seq
+            self.update_state(
+                event.data.payload.status,
+                event.data.payload.whose_turn,
+                event.data.payload.winner,
+            )
             for num, box_type in enumerate(event.data.payload.grid):
                 self._grid.tiles[num].text = self._box_types[box_type]
                 self._grid.tiles[num].refresh()
+        elif isinstance(event.data, WsGameDeltaEvent):
+            if self._seq is None:
+                return
+            if event.data.payload.seq != self._seq + 1:
+                self._seq = None
+                await self.send_operation(WsResyncOperation())
+                return
+            self._seq = event.data.payload.seq
+            self.update_state(
+                event.data.payload.status,
+                event.data.payload.whose_turn,
+                event.data.payload.winner,
+            )
+            tile = self._grid.tiles[event.data.payload.turn]
+            tile.text = self._box_types[event.data.payload.box_type]
+            tile.refresh()
+
+    def update_state(
+        self, status: int, whose_turn: None | str, winner: None | str
+    ) -> None:
+        self._game_status = status
+        self._whose_turn = whose_turn
+        if (
+            self._game_status == GameStatus.in_progress
+            and self._whose_turn == self._player_id
+        ):
+            self._header.state = "Your turn"
+        elif (
+            self._game_status == GameStatus.in_progress
+            and self._whose_turn != self._player_id
+        ):
+            self._header.state = "Waiting"
+        elif self._game_status == GameStatus.finished and winner != self._player_id:
+            self._header.state = "Looser"
+        elif self._game_status == GameStatus.finished and winner == self._player_id:
+            self._header.state = "Winner"
+        elif self._game_status == GameStatus.awaiting:
+            self._header.state = "Waiting"
 
     async def make_turn(self, tile_num: int) -> None:
         if (
             self._game_status == GameStatus.in_progress
             and self._whose_turn == self._player_id
         ):
-            if self._ws:
-                try:
-                    await self._ws.send_json(
-                        WsOperation(payload=WsOperationPayload(turn=tile_num)).dict()
-                    )
-                except ConnectionResetError as err:
-                    self.log(err)
+            await self.send_operation(
+                WsOperation(payload=WsOperationPayload(turn=tile_num))
+            )
+
+    async def send_operation(self, operation: WsOperation | WsResyncOperation) -> None:
+        if self._ws:
+            try:
+                if self._ws.protocol == binary.PROTOCOL:
+                    await self._ws.send_bytes(binary.encode_operation(operation))
+                else:
+                    await self._ws.send_json(operation.dict())
+            except ConnectionResetError as err:
+                self.log(err)
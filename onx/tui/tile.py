@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pyfiglet import Figlet  # type: ignore
 from rich.align import Align
 from rich.console import Console
@@ -10,6 +12,21 @@ from textual.reactive import Reactive
 from textual.widget import Widget
 
 
+# fonts are parsed once per process
+@lru_cache(maxsize=None)
+def get_figlet(font_name: str) -> Figlet:
+    return Figlet(font=font_name)
+
+
+# tiles only show noughts, crosses and blanks, so a redraw renders from the
+# cache once every tile size has been seen
+@lru_cache(maxsize=256)
+def render_glyph(text: str, font_name: str, width: int) -> str:
+    figlet = get_figlet(font_name)
+    figlet.width = width
+    return figlet.renderText(text).rstrip("\n")
+
+
 class FigletText:
     def __init__(self, text: str) -> None:
         self.text: str = text
@@ -27,8 +44,9 @@ class FigletText:
                 font_name = "standard"
             else:
                 font_name = "big"
-            font = Figlet(font=font_name, width=options.max_width)
-            yield Text(font.renderText(self.text).rstrip("\n"), style="bold")
+            yield Text(
+                render_glyph(self.text, font_name, options.max_width), style="bold"
+            )
 
 
 class Tile(Widget):
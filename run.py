@@ -3,7 +3,10 @@ import click
 from onx import settings
 
 
-@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.group(
+    context_settings=dict(help_option_names=["-h", "--help"]),
+    invoke_without_command=True,
+)
 @click.option("-d", "--daemon", is_flag=True, help="Run server.")
 @click.option(
     "-g",
@@ -19,10 +22,27 @@ from onx import settings
     default=settings.DEFAULT_WINNING_LENGTH,
     type=click.IntRange(min=settings.DEFAULT_WINNING_LENGTH, max=5),
 )
-def main(daemon: bool, grid_size: int, winning_length: int) -> None:
+@click.option("--ai", is_flag=True, help="Play against the computer.")
+@click.option(
+    "--workers",
+    help="Amount of server worker processes = 1 by default.",
+    default=1,
+    type=click.IntRange(min=1),
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    daemon: bool,
+    grid_size: int,
+    winning_length: int,
+    ai: bool,
+    workers: int,
+) -> None:
     """
     Noughts & Crosses game. Client and server command.
     """
+    if ctx.invoked_subcommand is not None:
+        return
     if winning_length > grid_size:
         raise click.BadParameter(
             "'-w' / '--winning-length' has to be less or equal to '-g' / '--grid-size'"
@@ -30,7 +50,7 @@ def main(daemon: bool, grid_size: int, winning_length: int) -> None:
     elif daemon:
         from onx.server.event_loop import run_event_loop
 
-        run_event_loop()
+        run_event_loop(workers)
     else:
         from onx.tui.app import GameApp
         from onx import __version__
@@ -39,8 +59,113 @@ def main(daemon: bool, grid_size: int, winning_length: int) -> None:
             title=f"Noughts & Crosses v{__version__}",
             grid_size=grid_size,
             winning_length=winning_length,
+            ai=ai,
         )
 
 
+@main.command()
+@click.argument(
+    "journal",
+    type=click.Path(exists=True, file_okay=False),
+    envvar="JOURNAL_DIR",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    help="Amount of analysis processes = one per cpu by default.",
+    type=click.IntRange(min=1),
+)
+def analyze(journal: str, jobs: int | None) -> None:
+    """
+    Summarize the games recorded in a journal directory.
+    """
+    from onx.server.analytics import analyze as analyze_journal
+    from onx.server.analytics import format_summary
+
+    click.echo(format_summary(analyze_journal(journal, jobs)))
+
+
+def parse_context(
+    ctx: click.Context, param: click.Parameter, values: tuple[str, ...]
+) -> list:
+    from onx.server.game import GameContext
+
+    contexts = []
+    for value in values:
+        try:
+            grid_size, winning_length = map(int, value.split("x"))
+        except ValueError:
+            raise click.BadParameter(f"'{value}' is not GRIDxLENGTH")
+        if not 3 <= winning_length <= grid_size <= 14 or winning_length > 5:
+            raise click.BadParameter(f"'{value}' is not a valid game context")
+        contexts.append(GameContext(grid_size=grid_size, winning_length=winning_length))
+    return contexts
+
+
+@main.command()
+@click.option(
+    "-c",
+    "--context",
+    "contexts",
+    help="Game context GRIDxLENGTH, repeat for more = 3x3 by default.",
+    multiple=True,
+    default=("3x3",),
+    callback=parse_context,
+)
+@click.option(
+    "-p",
+    "--policy",
+    "policies",
+    help="Policy of a side: random, greedy, ai or module:function, "
+    "given twice for both sides = random by default.",
+    multiple=True,
+    default=("random",),
+)
+@click.option(
+    "-n",
+    "--games",
+    help="Amount of games per context = 10000 by default.",
+    default=10_000,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    help="Amount of game processes = one per cpu by default.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "-b",
+    "--batch",
+    help="Amount of games a process plays per task = 1000 by default.",
+    default=1000,
+    type=click.IntRange(min=1),
+)
+@click.option("--seed", help="Seed of the first batch = 0 by default.", default=0)
+def selfplay(
+    contexts: list,
+    policies: tuple[str, ...],
+    games: int,
+    jobs: int | None,
+    batch: int,
+    seed: int,
+) -> None:
+    """
+    Play games between policies on the game engine, without networking.
+    """
+    from onx.server import selfplay as runner
+
+    if len(policies) > 2:
+        raise click.BadParameter("'-p' / '--policy' is given at most twice")
+    sides = (policies[0], policies[-1])
+    for name in sides:
+        try:
+            runner.get_policy(name)
+        except (ValueError, ImportError, AttributeError):
+            raise click.BadParameter(f"Unknown policy '{name}'")
+    summary, elapsed = runner.run(contexts, sides, games, jobs, batch, seed)
+    click.echo(runner.format_summary(summary, elapsed, sides))
+
+
 if __name__ == "__main__":
     main()
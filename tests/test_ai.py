@@ -0,0 +1,94 @@
+import json
+import random
+import unittest
+import uuid
+from unittest import mock
+
+from aiohttp.test_utils import AioHTTPTestCase
+
+from onx.server.ai import search
+from onx.server.app import get_application
+from onx.server.game import BoxType
+from onx.server.game import GameStatus
+
+
+def board(*boxes: int) -> int:
+    return sum(1 << box for box in boxes)
+
+
+class SearchTestCase(unittest.TestCase):
+    def test_takes_winning_box(self):
+        turn, _, _ = search(3, 3, board(0, 1), board(3, 4), 0, 1)
+        self.assertEqual(turn, 2)
+
+    def test_blocks_losing_box(self):
+        turn, _, _ = search(3, 3, board(4), board(0, 1), 1, 1)
+        self.assertEqual(turn, 2)
+
+    def test_solves_small_board(self):
+        turn, depth, _ = search(3, 3, 0, 0, 0, 5)
+        self.assertEqual(turn, 4)
+        self.assertEqual(depth, 9)
+
+    def test_open_four(self):
+        # four in a row open at both ends loses whatever the other side does
+        turn, _, _ = search(10, 5, board(41, 42, 43), board(0, 1, 2), 0, 0.5)
+        self.assertIn(turn, (40, 44))
+
+    def test_every_board(self):
+        rand = random.Random(0)
+        for grid_size in range(3, 15):
+            for winning_length in range(3, min(grid_size, 5) + 1):
+                with self.subTest(grid_size=grid_size, winning_length=winning_length):
+                    boxes = rand.sample(range(grid_size**2), grid_size)
+                    own, other = board(*boxes[::2]), board(*boxes[1::2])
+                    turn, depth, _ = search(
+                        grid_size, winning_length, other, own, 1, 0.2
+                    )
+                    self.assertNotIn(turn, boxes)
+                    self.assertIn(turn, range(grid_size**2))
+                    self.assertGreaterEqual(depth, 1)
+
+
+class AiGameTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        return get_application()
+
+    async def connect(self, cookie):
+        player_id = str(uuid.uuid4())
+        ws = await self.client.ws_connect(
+            "/ws", headers={"Cookie": f"player_id={player_id};{cookie}"}
+        )
+        return player_id, ws
+
+    async def play(self, player_id, ws):
+        # takes the first empty box on every turn until the game is over
+        while True:
+            payload = json.loads((await ws.receive(timeout=5)).data)["data"]["payload"]
+            if payload["status"] == GameStatus.finished:
+                return payload
+            if payload["whose_turn"] == player_id:
+                turn = payload["grid"].index(BoxType.empty)
+                await ws.send_json({"operation": "turn", "payload": {"turn": turn}})
+
+    @mock.patch("onx.settings.AI_MOVE_TIME", 0.05)
+    async def test_play_against_ai(self):
+        player_id, ws = await self.connect("ai=true")
+        payload = await self.play(player_id, ws)
+        # the ai never loses to such a player
+        self.assertNotEqual(payload["winner"], player_id)
+        self.assertIsNotNone(payload["winner"])
+
+    @mock.patch("onx.settings.AI_MOVE_TIME", 0.05)
+    @mock.patch("onx.settings.AI_WAIT_TIMEOUT", 0.05)
+    async def test_ai_joins_after_timeout(self):
+        player_id, ws = await self.connect("")
+        payload = json.loads((await ws.receive(timeout=5)).data)["data"]["payload"]
+        self.assertEqual(payload["status"], GameStatus.awaiting)
+        payload = await self.play(player_id, ws)
+        self.assertEqual(self.app["registry"].awaiting, {})
+        self.assertNotEqual(payload["winner"], player_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
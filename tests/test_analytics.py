@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from onx.server.analytics import analyze
+from onx.server.analytics import complete_games
+from onx.server.analytics import HORIZON_US
+from onx.server.analytics import format_summary
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.journal import EventKind
+from onx.server.journal import HEADER
+from onx.server.journal import Journal
+from onx.server.journal import RECORD
+from onx.server.journal import Record
+from onx.server.journal import segments
+from run import main
+
+
+def play(journal: Journal, context: GameContext, turns: list[int]) -> Game:
+    game = Game(context)
+    players = [Player(id="first", ws=None), Player(id="second", ws=None)]
+    game.add_player(players[0])
+    journal.created(game, players[0])
+    game.add_player(players[1])
+    game.toss()
+    game.whose_turn = players[0]
+    journal.started(game)
+    for turn in turns:
+        player = game.whose_turn
+        game.turn(player, turn)
+        journal.turn(game, player, turn)
+    if game.winner is not None or game.moves == context.grid_size**2:
+        journal.finished(game)
+    return game
+
+
+async def write_journal(directory: str) -> None:
+    # small segments cut most games in two
+    journal = Journal(directory, segment_size=HEADER.size + RECORD.size * 5)
+    three, four = GameContext(), GameContext(grid_size=4, winning_length=3)
+    # the first player wins twice, the second once, one draw and one unfinished
+    play(journal, three, [0, 3, 1, 4, 2])
+    play(journal, three, [4, 0, 8, 1, 2, 6, 5])
+    play(journal, three, [0, 4, 1, 2, 8, 6])
+    play(journal, three, [0, 4, 8, 1, 7, 6, 2, 5, 3])
+    play(journal, four, [5, 0, 6])
+    await journal.stop()
+
+
+class AnalyticsTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        asyncio.run(write_journal(self.directory))
+
+    def test_analyze(self):
+        self.assertGreater(len(segments(self.directory)), 5)
+        summary = analyze(self.directory, workers=2)
+        stats = summary["3x3"]
+        self.assertEqual(
+            (stats.games, stats.first_wins, stats.second_wins, stats.draws),
+            (4, 2, 1, 1),
+        )
+        self.assertEqual(stats.moves, 5 + 7 + 6 + 9)
+        self.assertEqual(stats.openings, {0: 3, 4: 1})
+        self.assertEqual((stats.unfinished, stats.invalid), (0, 0))
+        self.assertEqual((summary["4x3"].games, summary["4x3"].unfinished), (0, 1))
+
+    def test_format_summary(self):
+        lines = format_summary(analyze(self.directory, workers=1)).splitlines()
+        self.assertEqual(
+            lines[1].split(), ["3x3", "4", "50.0%", "25.0%", "25.0%", "6.8", "0", "0"]
+        )
+        self.assertEqual(lines[5:8], [" 75   0   0", "  0  25   0", "  0   0   0"])
+
+    def test_command(self):
+        result = CliRunner().invoke(main, ["analyze", self.directory, "-j", "1"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertTrue(result.output.startswith("context"))
+
+
+def record(game_id: bytes, time_us: int, kind: int) -> Record:
+    return Record(game_id, time_us, bytes(8), 0, 0, kind, 0, 3, 3)
+
+
+class CompleteGamesTestCase(unittest.TestCase):
+    def test_closed_and_idle_games_are_not_kept(self):
+        records = [
+            record(b"closed", 0, EventKind.created),
+            record(b"idle", 0, EventKind.created),
+            record(b"cut", 0, EventKind.turn),
+            record(b"closed", 1, EventKind.closed),
+            record(b"open", HORIZON_US + 1, EventKind.created),
+            record(b"open", HORIZON_US + 2, EventKind.started),
+        ]
+        pending = {}
+        games = list(complete_games(records, pending))
+        self.assertEqual(
+            [[r.kind for r in game] for game in games],
+            [[EventKind.created, EventKind.closed], [EventKind.created]],
+        )
+        self.assertEqual(games[1][0].game_id, b"idle")
+        # the start of a cut game may be in an earlier segment
+        self.assertEqual(sorted(pending), [b"cut", b"open"])
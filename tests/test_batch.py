@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+
+try:
+    import numpy as np
+
+    from onx.server.batch import evaluate
+    from onx.server.batch import from_grids
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class BatchEvaluateTestCase(unittest.TestCase):
+    def test_against_game(self):
+        rand = random.Random(0)
+        for grid_size in range(3, 15):
+            for winning_length in range(3, min(grid_size, 5) + 1):
+                context = GameContext(
+                    grid_size=grid_size, winning_length=winning_length
+                )
+                grids, winners, finished = [], [], []
+                for _ in range(20):
+                    game = Game(context)
+                    game.add_player(Player(id="nought", ws=None))
+                    game.add_player(Player(id="cross", ws=None))
+                    game.toss()
+                    boxes = list(range(grid_size**2))
+                    rand.shuffle(boxes)
+                    for box in boxes:
+                        player = game.whose_turn
+                        game.turn(player, box)
+                        won = game.is_winner(player, box)
+                        grids.append(game.grid)
+                        winners.append(player.box_type if won else 0)
+                        finished.append(won or game.moves == grid_size**2)
+                        if won:
+                            break
+                with self.subTest(context=context.key):
+                    batch_winners, batch_finished = evaluate(
+                        from_grids(grids, grid_size), winning_length
+                    )
+                    self.assertEqual(batch_winners.tolist(), winners)
+                    self.assertEqual(batch_finished.tolist(), finished)
+
+    def test_lines(self):
+        empty, nought, cross = BoxType.empty, BoxType.nought, BoxType.cross
+        boards = np.full((4, 5, 5), empty)
+        boards[0, 1, 1:5] = nought
+        boards[1, 0:4, 4] = cross
+        boards[2, [1, 2, 3, 4], [0, 1, 2, 3]] = nought
+        boards[3, [0, 1, 2, 3], [3, 2, 1, 0]] = cross
+        winners, finished = evaluate(boards, 4)
+        self.assertEqual(winners.tolist(), [nought, cross, nought, cross])
+        self.assertEqual(finished.tolist(), [True] * 4)
+        winners, finished = evaluate(boards, 5)
+        self.assertEqual(winners.tolist(), [0] * 4)
+        self.assertEqual(finished.tolist(), [False] * 4)
+
+    def test_invalid_shape(self):
+        with self.assertRaises(ValueError):
+            evaluate(np.ones((2, 3, 4)), 3)
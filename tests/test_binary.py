@@ -0,0 +1,84 @@
+import random
+import unittest
+
+from onx import binary
+from onx.models import WsGameDeltaEvent
+from onx.models import WsGameSnapshotEvent
+from onx.models import WsOperation
+from onx.models import WsOperationPayload
+from onx.models import WsResyncOperation
+from onx.server.game import BoxType
+from onx.server.game import GameStatus
+
+
+class BinaryTestCase(unittest.TestCase):
+    def test_pack_grid(self):
+        for grid_size in range(3, 15):
+            grid = [
+                random.choice([BoxType.empty, BoxType.nought, BoxType.cross])
+                for _ in range(grid_size**2)
+            ]
+            packed = binary.pack_grid(grid)
+            self.assertEqual(len(packed), (grid_size**2 + 3) // 4)
+            self.assertEqual(binary.unpack_grid(packed, grid_size), grid)
+
+    def test_operation(self):
+        operation = WsOperation(payload=WsOperationPayload(turn=195))
+        self.assertEqual(
+            binary.decode_operation(binary.encode_operation(operation)), 195
+        )
+        self.assertIsNone(
+            binary.decode_operation(binary.encode_operation(WsResyncOperation()))
+        )
+        for data in (b"", b"\x01", b"\x01\x02\x03", b"\x09"):
+            with self.assertRaises(binary.DecodeError):
+                binary.decode_operation(data)
+
+    def test_state(self):
+        grid = [BoxType.empty] * 16
+        grid[5] = BoxType.cross
+        event = binary.decode_event(
+            binary.encode_state(7, GameStatus.in_progress, 2, 0, 1, 4, grid), "me"
+        )
+        self.assertIsInstance(event.data, WsGameSnapshotEvent)
+        self.assertEqual(
+            event.data.payload.dict(),
+            {
+                "whose_turn": binary.OPPONENT,
+                "grid": grid,
+                "winner": None,
+                "status": GameStatus.in_progress,
+                "seq": 7,
+            },
+        )
+        with self.assertRaises(binary.DecodeError):
+            binary.decode_event(
+                binary.encode_state(7, GameStatus.in_progress, 2, 0, 1, 4, grid)[:-1],
+                "me",
+            )
+
+    def test_delta(self):
+        event = binary.decode_event(
+            binary.encode_delta(8, GameStatus.finished, 0, 2, 2, 195, BoxType.nought),
+            "me",
+        )
+        self.assertIsInstance(event.data, WsGameDeltaEvent)
+        self.assertEqual(
+            event.data.payload.dict(),
+            {
+                "seq": 8,
+                "turn": 195,
+                "box_type": BoxType.nought,
+                "whose_turn": None,
+                "winner": "me",
+                "status": GameStatus.finished,
+            },
+        )
+
+    def test_error(self):
+        event = binary.decode_event(binary.encode_error("not your turn error"), "me")
+        self.assertEqual(event.data.payload.message, "not your turn error")
+
+
+if __name__ == "__main__":
+    unittest.main()
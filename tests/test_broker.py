@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import uuid
+
+import aiohttp
+from aiohttp.test_utils import TestClient
+from aiohttp.test_utils import TestServer
+
+from onx.server.app import get_application
+from onx.server.broker import BrokerServer
+from onx.server.broker import Exchange
+from onx.server.broker import InProcessBroker
+from onx.server.broker import UnixSocketBroker
+from onx.server.game import BoxType
+from onx.server.game import GameStatus
+
+
+class ExchangeTestCase(unittest.TestCase):
+    def test_pair(self):
+        exchange = Exchange()
+        self.assertIsNone(exchange.pair("3x3", "game-1", "worker-1"))
+        self.assertIsNone(exchange.pair("4x3", "game-2", "worker-1"))
+        self.assertEqual(
+            exchange.pair("3x3", "game-3", "worker-2"), ("game-1", "worker-1")
+        )
+        exchange.cancel("4x3", "game-2")
+        self.assertIsNone(exchange.pair("4x3", "game-4", "worker-2"))
+
+    def test_lookup(self):
+        exchange = Exchange()
+        exchange.bind("player", "worker-1")
+        self.assertEqual(exchange.lookup("player"), "worker-1")
+        exchange.unbind("player")
+        self.assertIsNone(exchange.lookup("player"))
+
+
+class CrossWorkerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.clients = []
+        for broker in self.get_brokers():
+            client = TestClient(TestServer(get_application(broker)))
+            await client.start_server()
+            self.clients.append(client)
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.close()
+
+    def get_brokers(self):
+        exchange = Exchange()
+        return [InProcessBroker(exchange), InProcessBroker(exchange)]
+
+    async def connect(self, client, player_id):
+        return await client.ws_connect(
+            "/ws", headers={"Cookie": f"player_id={player_id}"}
+        )
+
+    async def receive(self, ws):
+        return json.loads((await ws.receive(timeout=5)).data)["data"]
+
+    async def test_players_on_different_workers(self):
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        sockets = {ids[0]: await self.connect(self.clients[0], ids[0])}
+        self.assertEqual(
+            (await self.receive(sockets[ids[0]]))["payload"]["status"],
+            GameStatus.awaiting,
+        )
+        sockets[ids[1]] = await self.connect(self.clients[1], ids[1])
+        states = [await self.receive(sockets[player_id]) for player_id in ids]
+        self.assertEqual(states[0], states[1])
+        self.assertEqual(states[0]["payload"]["status"], GameStatus.in_progress)
+        acting = states[0]["payload"]["whose_turn"]
+
+        for num, turn in enumerate((0, 1, 3, 4, 6)):
+            await sockets[acting].send_json(
+                {"operation": "turn", "payload": {"turn": turn}}
+            )
+            states = [await self.receive(sockets[player_id]) for player_id in ids]
+            self.assertEqual(states[0], states[1])
+            self.assertNotEqual(states[0]["payload"]["grid"][turn], BoxType.empty)
+            if num == 1:
+                # move the remote player to the owner and the owner to the remote
+                for player_id in ids:
+                    await sockets[player_id].close()
+                sockets[ids[1]] = await self.connect(self.clients[0], ids[1])
+                await self.receive(sockets[ids[1]])
+                sockets[ids[0]] = await self.connect(self.clients[1], ids[0])
+                states = [await self.receive(sockets[player_id]) for player_id in ids]
+                self.assertEqual(states[0], states[1])
+                self.assertNotEqual(states[0]["payload"]["grid"][turn], BoxType.empty)
+            if turn != 6:
+                acting = states[0]["payload"]["whose_turn"]
+        self.assertEqual(states[0]["payload"]["status"], GameStatus.finished)
+        self.assertEqual(states[0]["payload"]["winner"], acting)
+
+        await sockets[acting].send_json({"operation": "turn", "payload": {"turn": 8}})
+        self.assertEqual(
+            (await self.receive(sockets[acting]))["payload"]["message"],
+            "not your turn error",
+        )
+
+    async def test_watch_game_of_another_worker(self):
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        sockets = {}
+        states = []
+        for client, player_id in zip(self.clients, ids):
+            sockets[player_id] = await self.connect(client, player_id)
+        for player_id in ids:
+            # the first player waits for a partner, batched ones both do
+            state = await self.receive(sockets[player_id])
+            while state["payload"]["status"] != GameStatus.in_progress:
+                state = await self.receive(sockets[player_id])
+            states.append(state)
+        owner, other = self.clients
+        game = owner.app["registry"].active_games[ids[0]]
+        if game.id not in owner.app["registry"].games:
+            owner, other = other, owner
+            game = owner.app["registry"].active_games[ids[0]]
+
+        # a watcher that leaves stops the relay of the owner
+        watcher = await other.ws_connect(f"/ws/watch/{game.id}")
+        self.assertEqual(await self.receive(watcher), states[0])
+        await watcher.close()
+        for _ in range(100):
+            if not owner.app["registry"].relays.tasks:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(owner.app["registry"].relays.tasks, {})
+
+        watcher = await other.ws_connect(f"/ws/watch/{game.id}")
+        state = await self.receive(watcher)
+        acting = state["payload"]["whose_turn"]
+        for turn in (0, 1, 3, 4, 6):
+            await sockets[acting].send_json(
+                {"operation": "turn", "payload": {"turn": turn}}
+            )
+            states = [await self.receive(sockets[player_id]) for player_id in ids]
+            if turn != 6:
+                acting = states[0]["payload"]["whose_turn"]
+        # the watcher gets the latest state, intermediate ones may be coalesced
+        while state["payload"]["status"] != GameStatus.finished:
+            state = await self.receive(watcher)
+        self.assertEqual(state, states[0])
+        self.assertEqual((await watcher.receive()).type, aiohttp.WSMsgType.CLOSE)
+        self.assertEqual(other.app["registry"].relays.remote, {})
+
+    async def test_watch_unknown_game_error(self):
+        watcher = await self.clients[1].ws_connect(f"/ws/watch/{uuid.uuid4().hex}")
+        self.assertEqual(
+            (await self.receive(watcher))["payload"]["message"],
+            "game not found error",
+        )
+
+
+class BatchedMatchmakingTestCase(CrossWorkerTestCase):
+    def get_brokers(self):
+        self.exchange = Exchange(tick=0.01)
+        return [InProcessBroker(self.exchange), InProcessBroker(self.exchange)]
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.exchange.start()
+
+    async def asyncTearDown(self):
+        await self.exchange.stop()
+        await super().asyncTearDown()
+
+    async def test_players_on_different_workers(self):
+        await self.check_batch([self.clients[0], self.clients[1]])
+
+    async def test_players_on_same_worker(self):
+        await self.check_batch([self.clients[0], self.clients[0]])
+
+    async def check_batch(self, clients):
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        sockets = {}
+        for client, player_id in zip(clients, ids):
+            sockets[player_id] = await self.connect(client, player_id)
+            self.assertEqual(
+                (await self.receive(sockets[player_id]))["payload"]["status"],
+                GameStatus.awaiting,
+            )
+        states = [await self.receive(sockets[player_id]) for player_id in ids]
+        self.assertEqual(states[0], states[1])
+        self.assertEqual(states[0]["payload"]["status"], GameStatus.in_progress)
+        acting = states[0]["payload"]["whose_turn"]
+        await sockets[acting].send_json({"operation": "turn", "payload": {"turn": 4}})
+        states = [await self.receive(sockets[player_id]) for player_id in ids]
+        self.assertEqual(states[0], states[1])
+        self.assertNotEqual(states[0]["payload"]["grid"][4], BoxType.empty)
+        self.assertEqual(
+            (await self.clients[0].app["registry"].broker.stats())["3x3"]["matched"],
+            2,
+        )
+
+
+class UnixSocketCrossWorkerTestCase(CrossWorkerTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.broker_server = BrokerServer(os.path.join(self.tmp_dir.name, "broker"))
+        await self.broker_server.start()
+        await super().asyncSetUp()
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        await self.broker_server.stop()
+        self.tmp_dir.cleanup()
+
+    def get_brokers(self):
+        return [
+            UnixSocketBroker(self.broker_server.path),
+            UnixSocketBroker(self.broker_server.path),
+        ]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import unittest
+import uuid
+
+from pydantic.error_wrappers import ValidationError
+
+from onx import codec
+from onx.models import parse_operation
+from onx.models import WsErrorEvent
+from onx.models import WsErrorEventPayload
+from onx.models import WsEvent
+from onx.models import WsResyncOperation
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+
+
+def decode_with_model(raw: str) -> int | None:
+    operation = parse_operation(json.loads(raw))
+    if isinstance(operation, WsResyncOperation):
+        return None
+    return int(operation.payload.turn)
+
+
+class CodecTestCase(unittest.TestCase):
+    def assertSameDecoding(self, raw):
+        try:
+            expected = decode_with_model(raw)
+        except ValidationError as err:
+            with self.assertRaises(ValidationError) as ctx:
+                codec.decode_operation(raw)
+            self.assertEqual(ctx.exception.errors(), err.errors())
+        else:
+            self.assertEqual(codec.decode_operation(raw), expected)
+
+    def test_decode_operation(self):
+        for raw in (
+            '{"operation": "turn", "payload": {"turn": 4}}',
+            '{"payload": {"turn": 0}}',
+            '{"operation": "turn", "payload": {"turn": "4"}}',
+            '{"operation": "turn", "payload": {"turn": 4.0}}',
+            '{"operation": "turn", "payload": {"turn": true}}',
+            '{"operation": "turn", "payload": {"turn": "x"}}',
+            '{"operation": "turn", "payload": {}}',
+            '{"operation": "turn", "payload": []}',
+            '{"operation": "turn"}',
+            '{"operation": "move", "payload": {"turn": 4}}',
+            '{"operation": "resync"}',
+            '{"operation": "resync", "payload": {"turn": 4}}',
+            "{}",
+        ):
+            with self.subTest(raw=raw):
+                self.assertSameDecoding(raw)
+
+    def test_encode_events(self):
+        game = Game(GameContext(grid_size=4))
+        game.add_player(Player(id=str(uuid.uuid4()), ws=None))
+        self.assertEqual(
+            game.encode_json("state"), json.dumps(game.state_event().dict())
+        )
+        game.add_player(Player(id=str(uuid.uuid4()), ws=None))
+        game.toss()
+        game.turn(game.whose_turn, 5)
+        for kind, event in (
+            ("state", game.state_event()),
+            ("snapshot", game.snapshot_event()),
+            ("delta", game.delta_event()),
+        ):
+            with self.subTest(kind=kind):
+                self.assertEqual(game.encode_json(kind), json.dumps(event.dict()))
+        game.grid = [BoxType.cross] * 4 + [BoxType.empty] * 12
+        game.winner = game.players[0]
+        self.assertEqual(
+            game.encode_json("state"), json.dumps(game.state_event().dict())
+        )
+
+    def test_encode_error(self):
+        self.assertEqual(
+            codec.encode_error("not your turn error"),
+            json.dumps(
+                WsEvent(
+                    data=WsErrorEvent(
+                        payload=WsErrorEventPayload(message="not your turn error")
+                    )
+                ).dict()
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
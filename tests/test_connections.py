@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+import uuid
+
+import aiohttp
+from aiohttp.test_utils import AioHTTPTestCase
+
+from onx import settings
+from onx.server.app import get_application
+from onx.server.connections import ConnectionLimits
+from onx.server.connections import Connections
+from onx.server.connections import TokenBucket
+
+
+class ConnectionsTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        app = get_application()
+        registry = app["registry"]
+        registry.connections = Connections(
+            registry.metrics,
+            ConnectionLimits(
+                ping_interval=0.05,
+                idle_timeout=0.2,
+                max_connections=3,
+                max_connections_per_ip=2,
+            ),
+        )
+        return app
+
+    async def connect(self, **kwargs):
+        return await self.client.ws_connect(
+            "/ws", headers={"Cookie": f"player_id={uuid.uuid4()}"}, **kwargs
+        )
+
+    async def wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("condition is not met")
+
+    async def test_silent_client_is_reaped(self):
+        # a client that does not answer pings looks like a vanished one
+        ws = await self.connect(autoping=False)
+        await ws.receive()
+        registry = self.app["registry"]
+        self.assertEqual(len(registry.awaiting), 1)
+        message = await ws.receive(timeout=1)
+        self.assertEqual(message.type, aiohttp.WSMsgType.PING)
+        # a quiet connection is pinged once before it is dropped
+        message = await ws.receive(timeout=1)
+        self.assertIn(message.type, (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED))
+        await self.wait_for(lambda: not registry.awaiting)
+        self.assertEqual(registry.active_games, {})
+        self.assertEqual(registry.connections.open, set())
+        self.assertEqual(registry.connections.per_ip, {})
+        self.assertEqual(registry.metrics.reaped.values["idle"], 1)
+
+    async def test_answering_client_is_kept(self):
+        ws = await self.connect()
+        await ws.receive()
+        # the client answers pings while it waits for a frame
+        reader = asyncio.create_task(ws.receive())
+        await asyncio.sleep(0.5)
+        self.assertFalse(reader.done())
+        reader.cancel()
+        registry = self.app["registry"]
+        self.assertEqual(len(registry.connections.open), 1)
+        self.assertEqual(len(registry.awaiting), 1)
+        self.assertEqual(registry.metrics.reaped.values["idle"], 0)
+
+    async def test_connection_limits(self):
+        registry = self.app["registry"]
+        await self.connect()
+        await self.connect()
+        with self.assertRaises(aiohttp.WSServerHandshakeError) as err:
+            await self.connect()
+        self.assertEqual(err.exception.status, 429)
+        registry.connections.limits.max_connections_per_ip = 0
+        await self.connect()
+        with self.assertRaises(aiohttp.WSServerHandshakeError) as err:
+            await self.connect()
+        self.assertEqual(err.exception.status, 503)
+        self.assertEqual(
+            registry.metrics.rejected.values, {"total": 1, "ip": 1, "rate": 0}
+        )
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_take_and_refill(self):
+        bucket = TokenBucket(rate=2, burst=3, updated=0)
+        self.assertEqual([bucket.take(0) for _ in range(4)], [True, True, True, False])
+        self.assertFalse(bucket.full(1))
+        self.assertTrue(bucket.take(0.5))
+        self.assertFalse(bucket.take(0.5))
+        # tokens never pile up over the burst
+        self.assertTrue(bucket.full(10))
+        self.assertEqual([bucket.take(10) for _ in range(4)], [True, True, True, False])
+
+
+class RateLimitTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        app = get_application()
+        registry = app["registry"]
+        registry.connections = Connections(
+            registry.metrics,
+            ConnectionLimits(
+                ping_interval=60,
+                connection_rate=0.001,
+                connection_burst=2,
+                message_rate=0.001,
+                message_burst=3,
+            ),
+        )
+        return app
+
+    async def connect(self):
+        return await self.client.ws_connect(
+            "/ws", headers={"Cookie": f"player_id={uuid.uuid4()}"}
+        )
+
+    async def test_flood_is_dropped_before_parsing(self):
+        ws = await self.connect()
+        await ws.receive_json()
+        for _ in range(3):
+            await ws.send_json({"operation": "resync"})
+            message = await ws.receive_json(timeout=1)
+            self.assertEqual(message["data"]["event"], "game_snapshot")
+        # the burst is spent, the next frames are not answered
+        for _ in range(7):
+            await ws.send_json({"operation": "resync"})
+        with self.assertRaises(asyncio.TimeoutError):
+            await ws.receive(timeout=0.2)
+        self.assertFalse(ws.closed)
+        metrics = self.app["registry"].metrics
+        self.assertEqual(metrics.dropped.values, {"connection": 7, "ip": 0, "size": 0})
+
+    async def test_oversized_frame_closes_connection(self):
+        ws = await self.connect()
+        await ws.receive_json()
+        await ws.send_str("x" * (settings.WS_MAX_FRAME_SIZE + 1))
+        message = await ws.receive(timeout=1)
+        self.assertEqual(message.type, aiohttp.WSMsgType.CLOSE)
+        self.assertEqual(message.data, aiohttp.WSCloseCode.MESSAGE_TOO_BIG)
+        self.assertEqual(self.app["registry"].metrics.dropped.values["size"], 1)
+
+    async def test_connection_rate(self):
+        await self.connect()
+        await self.connect()
+        with self.assertRaises(aiohttp.WSServerHandshakeError) as err:
+            await self.connect()
+        self.assertEqual(err.exception.status, 429)
+        self.assertEqual(self.app["registry"].metrics.rejected.values["rate"], 1)
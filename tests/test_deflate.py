@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+import uuid
+import zlib
+from unittest import mock
+
+import aiohttp
+from aiohttp.http_websocket import WebSocketWriter
+from aiohttp.test_utils import AioHTTPTestCase
+
+from onx import settings
+from onx.deflate import DeflateClientResponse
+from onx.deflate import DeflateWriter
+from onx.server.app import get_application
+
+
+class Transport:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):
+        self.frames.append(bytes(data))
+
+    def is_closing(self):
+        return False
+
+
+class DeflateWriterTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_small_frames_are_not_compressed(self):
+        transport = Transport()
+        writer = DeflateWriter(
+            WebSocketWriter(mock.Mock(), transport, compress=15),
+            wbits=15,
+            level=9,
+            min_size=64,
+        )
+        large = '{"grid": [%s]}' % ", ".join(["1"] * 196)
+        await writer.send("small")
+        await writer.send(large)
+        await writer.send(large)
+        await writer.ping()
+        inflate = zlib.decompressobj(-15)
+        small_frame, *large_frames, ping_frame = transport.frames
+        # rsv1 flags a compressed frame
+        self.assertFalse(small_frame[0] & 0x40)
+        self.assertTrue(small_frame.endswith(b"small"))
+        self.assertFalse(ping_frame[0] & 0x40)
+        for frame in large_frames:
+            self.assertTrue(frame[0] & 0x40)
+            self.assertLess(len(frame), len(large) // 4)
+            # the payload length of the frames is under 126 bytes
+            payload = frame[2:] + b"\x00\x00\xff\xff"
+            self.assertEqual(inflate.decompress(payload).decode(), large)
+
+
+class DeflateTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        return get_application()
+
+    async def connect(self, **kwargs):
+        return await self.client.ws_connect(
+            "/ws",
+            headers={"Cookie": f"player_id={uuid.uuid4()};grid_size=14"},
+            **kwargs,
+        )
+
+    async def handshake(self):
+        response = await self.client.get(
+            "/ws",
+            headers={
+                "Upgrade": "websocket",
+                "Connection": "Upgrade",
+                "Sec-WebSocket-Version": "13",
+                "Sec-WebSocket-Key": "dGhlIHNhbXBsZSBub25jZQ==",
+                "Sec-WebSocket-Extensions": "permessage-deflate",
+                "Cookie": f"player_id={uuid.uuid4()}",
+            },
+        )
+        self.assertEqual(response.status, 101)
+        response.close()
+        return response.headers.get("Sec-WebSocket-Extensions")
+
+    async def test_negotiated_compression(self):
+        self.assertEqual(await self.handshake(), "permessage-deflate")
+        with mock.patch.object(settings, "WS_COMPRESS_WBITS", 10):
+            self.assertEqual(
+                await self.handshake(), "permessage-deflate; server_max_window_bits=10"
+            )
+        with mock.patch.object(settings, "WS_COMPRESS_WBITS", 0):
+            self.assertIsNone(await self.handshake())
+        # the compressed states of a big board are inflated by the client
+        ws = await self.connect(compress=15)
+        message = await ws.receive_json(timeout=1)
+        self.assertEqual(len(message["data"]["payload"]["grid"]), 14**2)
+
+    async def test_client_response(self):
+        async with aiohttp.ClientSession(
+            ws_response_class=DeflateClientResponse
+        ) as session:
+            ws = await session.ws_connect(
+                self.client.make_url("/ws"),
+                compress=15,
+                headers={"Cookie": f"player_id={uuid.uuid4()}"},
+            )
+            await ws.receive_json(timeout=1)
+            await ws.send_json({"operation": "resync"})
+            message = await ws.receive_json(timeout=1)
+            self.assertEqual(message["data"]["event"], "game_snapshot")
+            await ws.close()
+        await asyncio.sleep(0)
@@ -1,5 +1,8 @@
+import asyncio
+import json
 import unittest
 import uuid
+from unittest import mock
 
 from aiohttp import web
 
@@ -45,6 +48,41 @@ class GameTestCase(unittest.TestCase):
         ]
         self.assertFalse(game.is_winner(player, 0))
 
+    def test_is_winner_requires_unbroken_line(self):
+        game = Game(GameContext(grid_size=5))
+        ws = web.WebSocketResponse()
+        player = Player(id=str(uuid.uuid4()), ws=ws)
+        player.box_type = BoxType.cross
+        game.grid = [BoxType.cross, BoxType.empty, BoxType.cross, BoxType.cross] + [
+            BoxType.empty
+        ] * 21
+        self.assertFalse(game.is_winner(player, 3))
+        game.grid = [BoxType.cross] * 4 + [BoxType.empty] * 21
+        self.assertTrue(game.is_winner(player, 1))
+        game.grid = (
+            [BoxType.empty] * 4
+            + [BoxType.cross]
+            + [BoxType.empty] * 3
+            + [BoxType.cross]
+            + [BoxType.empty] * 3
+            + [BoxType.cross]
+            + [BoxType.empty] * 12
+        )
+        self.assertTrue(game.is_winner(player, 12))
+
+    def test_drawn_game(self):
+        game = Game(GameContext())
+        ws = web.WebSocketResponse()
+        game.add_player(Player(id=str(uuid.uuid4()), ws=ws))
+        game.add_player(Player(id=str(uuid.uuid4()), ws=ws))
+        game.toss()
+        for turn in (0, 1, 2, 4, 7, 6, 8, 5, 3):
+            self.assertEqual(game.status, GameStatus.in_progress)
+            game.turn(game.whose_turn, turn)
+        self.assertEqual(game.status, GameStatus.finished)
+        self.assertIsNone(game.winner)
+        self.assertEqual(game.moves, 9)
+
     def test_gen_winning_lines(self):
         game = Game(GameContext(grid_size=4))
         self.assertEqual(
@@ -100,5 +138,39 @@ class GameTestCase(unittest.TestCase):
         )
 
 
+class FakeWebSocket:
+    def __init__(self, stalled: bool = False) -> None:
+        self.stalled = stalled
+        self.frames: list[str] = []
+
+    async def send_str(self, frame: str) -> None:
+        if self.stalled:
+            await asyncio.sleep(60)
+        self.frames.append(frame)
+
+
+class GamePublishTestCase(unittest.IsolatedAsyncioTestCase):
+    @mock.patch("onx.settings.WS_SEND_TIMEOUT", 0.01)
+    async def test_stalled_subscriber(self):
+        game = Game(GameContext())
+        stalled, alive = FakeWebSocket(stalled=True), FakeWebSocket()
+        game.add_player(Player(id=str(uuid.uuid4()), ws=stalled))
+        game.add_player(Player(id=str(uuid.uuid4()), ws=alive))
+        game.toss()
+        await asyncio.wait_for(game.publish_state(), 1)
+        self.assertEqual(alive.frames, [game.frame("state")])
+        self.assertEqual(stalled.frames, [])
+
+    async def test_frame_is_encoded_once_per_state(self):
+        game = Game(GameContext())
+        game.add_player(Player(id=str(uuid.uuid4()), ws=FakeWebSocket()))
+        game.add_player(Player(id=str(uuid.uuid4()), ws=FakeWebSocket()))
+        frame = game.frame("state")
+        self.assertIs(game.frame("state"), frame)
+        game.toss()
+        self.assertIsNot(game.frame("state"), frame)
+        self.assertEqual(json.loads(game.frame("state")), game.state_event().dict())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+
+import aiohttp
+
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameStatus
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.journal import EventKind
+from onx.server.journal import HEADER
+from onx.server.journal import Journal
+from onx.server.journal import player_key
+from onx.server.journal import read_journal
+from onx.server.journal import read_segment
+from onx.server.journal import RECORD
+from onx.server.journal import segments
+
+
+class JournalTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.game = Game(GameContext(grid_size=4, winning_length=3))
+        self.players = [Player(id="nought", ws=None), Player(id="cross", ws=None)]
+        for player in self.players:
+            self.game.add_player(player)
+        self.game.toss()
+        self.first = self.game.whose_turn
+
+    async def write_turns(self, journal: Journal, turns: int) -> None:
+        for turn in range(turns):
+            player = self.game.whose_turn
+            self.game.turn(player, turn)
+            journal.turn(self.game, player, turn)
+        await journal.stop()
+
+    async def test_records(self):
+        journal = Journal(self.directory)
+        journal.created(self.game, self.players[0])
+        journal.started(self.game)
+        await self.write_turns(journal, 3)
+        records = list(read_journal(self.directory))
+        self.assertEqual(len(records), 6)
+        created, started, turn = records[0], records[1], records[3]
+        self.assertEqual(created.kind, EventKind.created)
+        self.assertEqual(created.game_id.hex(), self.game.id)
+        self.assertEqual(created.player, player_key("nought"))
+        self.assertEqual((created.grid_size, created.winning_length), (4, 3))
+        self.assertEqual(started.box_type, self.players[0].box_type)
+        self.assertEqual(started.value, int(self.players[0] is self.first))
+        self.assertEqual(turn.kind, EventKind.turn)
+        self.assertIn(turn.box_type, (BoxType.nought, BoxType.cross))
+        self.assertEqual([record.value for record in records[3:]], [0, 1, 2])
+        self.assertEqual([record.seq for record in records[3:]], [2, 3, 4])
+
+    async def test_disabled(self):
+        journal = Journal("")
+        journal.created(self.game, self.players[0])
+        await journal.stop()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    async def test_segments_are_rotated(self):
+        journal = Journal(self.directory, segment_size=HEADER.size + RECORD.size * 4)
+        await self.write_turns(journal, 10)
+        self.assertEqual(len(segments(self.directory)), 3)
+        records = list(read_journal(self.directory))
+        self.assertEqual([record.value for record in records], list(range(10)))
+
+    async def test_cut_record_is_skipped(self):
+        journal = Journal(self.directory)
+        await self.write_turns(journal, 3)
+        (path,) = segments(self.directory)
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 1)
+        self.assertEqual(len(list(read_segment(path))), 2)
+
+    def test_invalid_segment(self):
+        path = os.path.join(self.directory, "0-0.journal")
+        with open(path, "wb") as file:
+            file.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            list(read_segment(path))
+
+
+# the tail of the journal is only written when a worker stops its registry
+class WorkerShutdownTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.server = subprocess.Popen(
+            [sys.executable, "run.py", "-d", "--workers", "2"],
+            cwd=Path(__file__).parent.parent,
+            env={
+                **os.environ,
+                "LOCALHOST": "127.0.0.1",
+                "PORT": str(self.port),
+                "JOURNAL_DIR": self.directory,
+                "JOURNAL_FLUSH_INTERVAL": "60",
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(self.server.kill)
+        self.session = aiohttp.ClientSession()
+        self.addAsyncCleanup(self.session.close)
+
+    async def connect(self, player_id):
+        for _ in range(100):
+            try:
+                return await self.session.ws_connect(
+                    f"http://127.0.0.1:{self.port}/ws",
+                    headers={"Cookie": f"player_id={player_id}"},
+                )
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+        self.fail("server is not started")
+
+    async def receive(self, ws):
+        return json.loads((await ws.receive(timeout=5)).data)["data"]["payload"]
+
+    async def test_tail_is_written_on_shutdown(self):
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        sockets = {player_id: await self.connect(player_id) for player_id in ids}
+        self.assertEqual(
+            (await self.receive(sockets[ids[0]]))["status"], GameStatus.awaiting
+        )
+        for ws in sockets.values():
+            state = await self.receive(ws)
+        acting = sockets[state["whose_turn"]]
+        await acting.send_json({"operation": "turn", "payload": {"turn": 4}})
+        state = await self.receive(acting)
+        self.assertNotEqual(state["grid"][4], BoxType.empty)
+
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(await asyncio.to_thread(self.server.wait, 30), 0)
+        kinds = [record.kind for record in read_journal(self.directory)]
+        self.assertEqual(
+            kinds,
+            [EventKind.created, EventKind.started, EventKind.started, EventKind.turn],
+        )
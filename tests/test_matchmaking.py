@@ -0,0 +1,53 @@
+import unittest
+
+from onx.server.matchmaking import Matchmaker
+from onx.server.matchmaking import Ticket
+
+
+class MatchmakerTestCase(unittest.TestCase):
+    def test_pair_in_arrival_order(self):
+        matchmaker = Matchmaker()
+        matchmaker.enqueue("3x3", Ticket("game-1", "worker", enqueued_at=1.0))
+        matchmaker.enqueue("3x3", Ticket("game-2", "worker", enqueued_at=2.0))
+        matchmaker.enqueue("4x3", Ticket("game-3", "worker", enqueued_at=2.0))
+        match = matchmaker.pair("3x3", Ticket("game-4", "worker", enqueued_at=4.0))
+        self.assertEqual(match.game_id, "game-1")
+        match = matchmaker.pair("3x3", Ticket("game-5", "worker", enqueued_at=4.0))
+        self.assertEqual(match.game_id, "game-2")
+        self.assertIsNone(
+            matchmaker.pair("3x3", Ticket("game-6", "worker", enqueued_at=4.0))
+        )
+        stats = matchmaker.to_dict()["3x3"]
+        self.assertEqual(stats["waiting"], 1)
+        self.assertEqual(stats["matched"], 4)
+        self.assertEqual(stats["max_wait"], 3.0)
+        self.assertEqual(stats["mean_wait"], 1.25)
+
+    def test_cancel(self):
+        matchmaker = Matchmaker()
+        matchmaker.enqueue("3x3", Ticket("game-1", "worker"))
+        matchmaker.enqueue("3x3", Ticket("game-2", "worker"))
+        self.assertTrue(matchmaker.cancel("3x3", "game-1"))
+        self.assertFalse(matchmaker.cancel("3x3", "game-1"))
+        match = matchmaker.pair("3x3", Ticket("game-3", "worker"))
+        self.assertEqual(match.game_id, "game-2")
+        stats = matchmaker.to_dict()["3x3"]
+        self.assertEqual(stats["waiting"], 0)
+        self.assertEqual(stats["cancelled"], 1)
+
+    def test_match_batch(self):
+        matchmaker = Matchmaker()
+        for num in range(5):
+            matchmaker.enqueue("3x3", Ticket(f"game-{num}", "worker"))
+        matchmaker.enqueue("4x3", Ticket("game-5", "worker"))
+        matches = [
+            (first.game_id, second.game_id) for first, second in matchmaker.match()
+        ]
+        self.assertEqual(matches, [("game-0", "game-1"), ("game-2", "game-3")])
+        self.assertEqual(list(matchmaker.queues["3x3"]), ["game-4"])
+        self.assertEqual(list(matchmaker.queues["4x3"]), ["game-5"])
+        self.assertEqual(matchmaker.to_dict()["3x3"]["matched"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from onx.server.metrics import Counter
+from onx.server.metrics import Gauge
+from onx.server.metrics import Histogram
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_counter(self):
+        counter = Counter("errors_total", "Errors.", label="error", keys=("a", "b"))
+        counter.inc("a")
+        counter.inc("a")
+        counter.inc("c", 3)
+        self.assertEqual(
+            counter.expose(),
+            "# HELP errors_total Errors.\n"
+            "# TYPE errors_total counter\n"
+            'errors_total{error="a"} 2\n'
+            'errors_total{error="b"} 0\n'
+            'errors_total{error="c"} 3',
+        )
+
+    def test_collected_gauge(self):
+        gauge = Gauge("games", "Games.", label="context", collect=lambda: {"3x3": 2})
+        gauge.set(5, "3x3")
+        self.assertEqual(
+            gauge.expose().splitlines()[-1],
+            'games{context="3x3"} 2',
+        )
+
+    def test_gauge(self):
+        gauge = Gauge("sockets", "Sockets.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(gauge.expose().splitlines()[-1], "sockets 1")
+
+    def test_histogram(self):
+        histogram = Histogram("seconds", "Seconds.", (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+        self.assertEqual(
+            histogram.expose().splitlines()[2:],
+            [
+                'seconds_bucket{le="0.1"} 2',
+                'seconds_bucket{le="1"} 3',
+                'seconds_bucket{le="+Inf"} 4',
+                "seconds_sum 2.65",
+                "seconds_count 4",
+            ],
+        )
+
+    def test_labeled_histogram(self):
+        histogram = Histogram("seconds", "Seconds.", (1,), label="context")
+        self.assertEqual(histogram.expose().splitlines()[2:], [])
+        histogram.observe(0.5, "3x3")
+        histogram.observe(2, "4x3")
+        self.assertEqual(
+            histogram.expose().splitlines()[2:],
+            [
+                'seconds_bucket{context="3x3",le="1"} 1',
+                'seconds_bucket{context="3x3",le="+Inf"} 1',
+                'seconds_sum{context="3x3"} 0.5',
+                'seconds_count{context="3x3"} 1',
+                'seconds_bucket{context="4x3",le="1"} 0',
+                'seconds_bucket{context="4x3",le="+Inf"} 1',
+                'seconds_sum{context="4x3"} 2',
+                'seconds_count{context="4x3"} 1',
+            ],
+        )
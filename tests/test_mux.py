@@ -0,0 +1,125 @@
+import uuid
+from unittest import mock
+
+import aiohttp
+from aiohttp.test_utils import AioHTTPTestCase
+
+from onx import settings
+from onx.server.app import get_application
+from onx.server.game import BoxType
+from onx.server.game import GameStatus
+
+
+class MuxTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        return get_application()
+
+    async def connect(self):
+        self.player_id = str(uuid.uuid4())
+        return await self.client.ws_connect(
+            "/ws/mux", headers={"Cookie": f"player_id={self.player_id}"}
+        )
+
+    async def receive(self, ws):
+        return [
+            (event["game"], event["data"]) for event in await ws.receive_json(timeout=1)
+        ]
+
+    async def start(self, ws):
+        # the second game of the connection is paired with its first one
+        await ws.send_json({"game": "g1", "operation": "join"})
+        [(game, data)] = await self.receive(ws)
+        self.assertEqual(game, "g1")
+        self.assertEqual(data["payload"]["status"], GameStatus.awaiting)
+        await ws.send_json({"game": "g2", "operation": "join"})
+        events = await self.receive(ws)
+        self.assertEqual([game for game, _ in events], ["g1", "g2"])
+        self.assertEqual(events[0][1], events[1][1])
+        self.assertEqual(events[0][1]["payload"]["status"], GameStatus.in_progress)
+        whose_turn = events[0][1]["payload"]["whose_turn"]
+        self.assertIn(whose_turn, (f"{self.player_id}.g1", f"{self.player_id}.g2"))
+        return whose_turn.rsplit(".", 1)[1]
+
+    async def test_games_share_connection(self):
+        ws = await self.connect()
+        acting = await self.start(ws)
+        await ws.send_json({"game": acting, "payload": {"turn": 0}})
+        events = await self.receive(ws)
+        self.assertEqual(len(events), 2)
+        for _, data in events:
+            self.assertEqual(data["event"], "game_state")
+            self.assertNotEqual(data["payload"]["grid"][0], BoxType.empty)
+        # a bad operation of a game is answered in the game only
+        await ws.send_json({"game": acting, "payload": {"turn": 1}})
+        self.assertEqual(
+            await self.receive(ws),
+            [
+                (
+                    acting,
+                    {"event": "error", "payload": {"message": "not your turn error"}},
+                )
+            ],
+        )
+        await ws.send_json({"game": "g3", "operation": "resync"})
+        [(game, data)] = await self.receive(ws)
+        self.assertEqual(
+            (game, data["payload"]["message"]), ("g3", "game not found error")
+        )
+        await ws.send_json({"game": "g1", "operation": "join"})
+        [(game, data)] = await self.receive(ws)
+        self.assertEqual(data["payload"]["message"], "game already joined error")
+        await ws.send_json({"game": "g1", "operation": "resync"})
+        [(game, data)] = await self.receive(ws)
+        self.assertEqual((game, data["event"]), ("g1", "game_snapshot"))
+        await ws.send_json({"game": "g1", "operation": "leave"})
+        await ws.send_json({"game": "g1", "operation": "resync"})
+        [(game, data)] = await self.receive(ws)
+        self.assertEqual(data["payload"]["message"], "game not found error")
+        self.assertFalse(ws.closed)
+
+    async def test_delta_games(self):
+        ws = await self.connect()
+        for game in ("g1", "g2"):
+            await ws.send_json(
+                {"game": game, "operation": "join", "payload": {"delta": True}}
+            )
+            events = await self.receive(ws)
+        self.assertEqual([data["event"] for _, data in events], ["game_snapshot"] * 2)
+        acting = events[0][1]["payload"]["whose_turn"].rsplit(".", 1)[1]
+        await ws.send_json({"game": acting, "payload": {"turn": 4}})
+        events = await self.receive(ws)
+        self.assertEqual([data["event"] for _, data in events], ["game_delta"] * 2)
+        self.assertEqual(events[0][1]["payload"]["turn"], 4)
+
+    async def test_games_limit(self):
+        ws = await self.connect()
+        with mock.patch.object(settings, "MUX_MAX_GAMES", 1):
+            await ws.send_json(
+                {"game": "g1", "operation": "join", "payload": {"grid_size": 4}}
+            )
+            await self.receive(ws)
+            await ws.send_json({"game": "g2", "operation": "join"})
+            [(game, data)] = await self.receive(ws)
+        self.assertEqual(
+            (game, data["payload"]["message"]), ("g2", "too many games error")
+        )
+
+    async def test_malformed_operation_closes_connection(self):
+        for operation in ({"game": "bad game", "operation": "join"}, [1, 2]):
+            with self.subTest(operation=operation):
+                ws = await self.connect()
+                await ws.send_json(operation)
+                [event] = await ws.receive_json(timeout=1)
+                self.assertNotIn("game", event)
+                self.assertEqual(event["data"]["event"], "error")
+                message = await ws.receive(timeout=1)
+                self.assertEqual(message.type, aiohttp.WSMsgType.CLOSE)
+
+    async def test_leaving_connection_keeps_games(self):
+        ws = await self.connect()
+        await self.start(ws)
+        await ws.close()
+        registry = self.app["registry"]
+        # both players left, the game waits for them to come back
+        self.assertEqual(len(registry.active_games), 2)
+        self.assertEqual(registry.metrics.websockets.values["mux"], 0)
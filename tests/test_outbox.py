@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+
+from onx.server.connections import Connection
+from onx.server.connections import ConnectionLimits
+from onx.server.connections import Connections
+from onx.server.metrics import ServerMetrics
+from onx.server.outbox import Outbox
+
+
+# a websocket whose client reads a frame only when it is let through
+class SlowSocket:
+    def __init__(self):
+        self.sent = []
+        self.gate = asyncio.Semaphore(0)
+        self.closed = False
+        self.ws_protocol = None
+
+    async def send_str(self, data):
+        await self.gate.acquire()
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        await self.send_str(data)
+
+    async def close(self):
+        self.closed = True
+
+
+class Transport:
+    def __init__(self):
+        self.aborted = False
+
+    def abort(self):
+        self.aborted = True
+
+
+class OutboxTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.ws = SlowSocket()
+        self.transport = Transport()
+        self.outbox = Outbox(self.ws, self.transport, size=4, high_water=2)
+        self.outbox.start()
+
+    async def asyncTearDown(self):
+        self.outbox.abort()
+
+    async def drain(self, count):
+        for _ in range(count):
+            self.ws.gate.release()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    async def test_frames_are_sent_in_order(self):
+        await self.outbox.send_str("a")
+        await self.outbox.send_bytes(b"b")
+        await self.outbox.send_str("c")
+        await self.drain(3)
+        self.assertEqual(self.ws.sent, ["a", b"b", "c"])
+
+    async def test_queued_state_is_replaced(self):
+        await self.outbox.send_str("first")
+        await asyncio.sleep(0)
+        # the writer waits on the first frame, the states queue up behind it
+        self.outbox.put_state("state 1")
+        await self.outbox.send_str("error")
+        self.outbox.put_state("state 2")
+        self.assertTrue(self.outbox.has_state())
+        await self.drain(3)
+        self.assertEqual(self.ws.sent, ["first", "state 2", "error"])
+        self.assertFalse(self.outbox.has_state())
+        # a state after the sent one is queued anew
+        self.outbox.put_state("state 3")
+        await self.drain(1)
+        self.assertEqual(self.ws.sent[-1], "state 3")
+
+    async def test_overflow_aborts_connection(self):
+        for frame in "abcd":
+            await self.outbox.send_str(frame)
+        self.assertFalse(self.transport.aborted)
+        await self.outbox.send_str("e")
+        self.assertTrue(self.transport.aborted)
+        self.assertTrue(self.outbox.closed)
+        self.assertFalse(self.outbox.frames)
+
+    async def test_stall_resets_below_high_water(self):
+        self.assertFalse(self.outbox.stalled(0))
+        for frame in "abc":
+            await self.outbox.send_str(frame)
+        self.assertTrue(self.outbox.stalled(0))
+        self.assertFalse(self.outbox.stalled(60))
+        await self.drain(2)
+        self.assertFalse(self.outbox.stalled(0))
+
+    async def test_close_flushes_queued_frames(self):
+        await self.outbox.send_str("a")
+        await self.outbox.send_str("b")
+        self.ws.gate.release()
+        self.ws.gate.release()
+        await self.outbox.close()
+        self.assertEqual(self.ws.sent, ["a", "b"])
+        self.assertTrue(self.ws.closed)
+        self.assertFalse(self.transport.aborted)
+
+    async def test_stalled_connection_is_reaped(self):
+        connections = Connections(
+            ServerMetrics(lambda: 0, lambda: 0, []),
+            ConnectionLimits(
+                ping_interval=60,
+                idle_timeout=60,
+                stall_timeout=0,
+            ),
+        )
+        connection = Connection(
+            ws=self.ws, remote="127.0.0.1", transport=self.transport
+        )
+        connection.outbox = self.outbox
+        connections.open.add(connection)
+        connections.per_ip[connection.remote] += 1
+        await connections.sweep()
+        self.assertEqual(connections.open, {connection})
+        for frame in "abc":
+            await self.outbox.send_str(frame)
+        await connections.sweep()
+        self.assertEqual(connections.open, set())
+        self.assertTrue(self.transport.aborted)
+        self.assertEqual(connections.metrics.reaped.values["slow"], 1)
+
+
+class BatchOutboxTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_queued_frames_go_out_in_one_array(self):
+        ws = SlowSocket()
+        outbox = Outbox(ws, batch=True)
+        outbox.start()
+        await outbox.send_str('"first"')
+        await asyncio.sleep(0)
+        # the states of every game are coalesced on their own
+        outbox.put_state('"a1"', "a")
+        outbox.put_state('"b1"', "b")
+        await outbox.send_str('"error"')
+        outbox.put_state('"a2"', "a")
+        self.assertTrue(outbox.has_state("b"))
+        ws.gate.release()
+        ws.gate.release()
+        await outbox.close()
+        self.assertEqual(ws.sent, ['["first"]', '["a2","b1","error"]'])
+        self.assertFalse(outbox.has_state("a"))
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from aiohttp.test_utils import AioHTTPTestCase
+
+from onx.server.app import get_application
+from onx.server.profiler import profile
+
+
+async def block_loop() -> None:
+    await asyncio.sleep(0.05)
+    time.sleep(0.2)
+
+
+class ProfilerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_callbacks(self):
+        task = asyncio.create_task(block_loop())
+        sampler = await profile(0.4, 0.005, 0.1)
+        await task
+        self.assertEqual(sampler.stalls, 1)
+        report = sampler.slow_callbacks().splitlines()
+        self.assertEqual(len(report), 2)
+        self.assertIn("tests.test_profiler:block_loop", report[1])
+
+    async def test_collapsed_stacks(self):
+        task = asyncio.create_task(block_loop())
+        sampler = await profile(0.3, 0.005, 0.1)
+        await task
+        stack, count = sampler.collapsed().splitlines()[0].rsplit(" ", 1)
+        self.assertTrue(stack.endswith("tests.test_profiler:block_loop"))
+        self.assertGreater(int(count), 10)
+
+
+class ProfileRouteTestCase(AioHTTPTestCase):
+    async def asyncSetUp(self):
+        patcher = mock.patch("onx.settings.ADMIN_TOKEN", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        await super().asyncSetUp()
+
+    async def get_application(self):
+        return get_application()
+
+    async def test_profile(self):
+        response = await self.client.get(
+            "/admin/profile?seconds=0.1&report=slow",
+            headers={"Authorization": "Bearer secret"},
+        )
+        self.assertEqual(response.status, 200)
+        self.assertTrue((await response.text()).startswith("0 stalls"))
+
+    async def test_token_required(self):
+        response = await self.client.get(
+            "/admin/profile?seconds=0.1", headers={"Authorization": "Bearer wrong"}
+        )
+        self.assertEqual(response.status, 403)
+
+    async def test_invalid_seconds(self):
+        response = await self.client.get(
+            "/admin/profile?seconds=600", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(response.status, 400)
+
+
+class ProfileRouteDisabledTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        return get_application()
+
+    async def test_disabled_by_default(self):
+        response = await self.client.get("/admin/profile")
+        self.assertEqual(response.status, 404)
@@ -0,0 +1,87 @@
+import unittest
+
+from click.testing import CliRunner
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import Player
+from onx.server.selfplay import get_policy
+from onx.server.selfplay import greedy_policy
+from onx.server.selfplay import play_batch
+from onx.server.selfplay import random_policy
+from onx.server.selfplay import run
+from run import main
+
+
+# a bot function given by its import path
+def first_empty(game, player):
+    taken = game.noughts | game.crosses
+    return next(
+        box for box in range(game.context.grid_size**2) if not taken >> box & 1
+    )
+
+
+def new_game(turns):
+    game = Game(GameContext())
+    players = [Player(id="0", ws=None), Player(id="1", ws=None)]
+    game.add_player(players[0])
+    game.add_player(players[1])
+    game.toss()
+    game.whose_turn = players[0]
+    for turn in turns:
+        game.turn(game.whose_turn, turn)
+    return game, players
+
+
+class SelfPlayTestCase(unittest.TestCase):
+    def test_greedy_wins_then_blocks(self):
+        # the player to move can win at 2 and has to block at 5
+        game, players = new_game([0, 3, 1, 4])
+        self.assertEqual(greedy_policy(game, players[0]), 2)
+        game, players = new_game([0, 3, 8, 4])
+        self.assertEqual(greedy_policy(game, players[0]), 5)
+
+    def test_get_policy(self):
+        self.assertIs(get_policy("random"), random_policy)
+        self.assertIs(get_policy("tests.test_selfplay:first_empty"), first_empty)
+        with self.assertRaises(ValueError):
+            get_policy("unknown")
+
+    def test_play_batch(self):
+        stats = play_batch(3, 3, ("greedy", "random"), 200, seed=1)
+        self.assertEqual(stats.games, 200)
+        self.assertEqual(stats.first_wins + stats.second_wins + stats.draws, 200)
+        self.assertEqual(sum(stats.policy_wins) + stats.draws, 200)
+        self.assertGreater(stats.policy_wins[0], stats.policy_wins[1])
+        self.assertTrue(5 * 200 <= stats.moves <= 9 * 200)
+        # a batch is reproducible by its seed
+        again = play_batch(3, 3, ("greedy", "random"), 200, seed=1)
+        self.assertEqual(again.policy_wins, stats.policy_wins)
+        self.assertEqual(again.moves, stats.moves)
+
+    def test_run(self):
+        contexts = [GameContext(), GameContext(grid_size=4, winning_length=3)]
+        summary, elapsed = run(
+            contexts,
+            ("tests.test_selfplay:first_empty", "random"),
+            games=50,
+            workers=2,
+            batch=20,
+        )
+        self.assertEqual(sorted(summary), ["3x3", "4x3"])
+        self.assertEqual([stats.games for stats in summary.values()], [50, 50])
+        self.assertGreater(elapsed, 0)
+
+    def test_command(self):
+        result = CliRunner().invoke(
+            main,
+            ["selfplay", "-c", "3x3", "-p", "greedy", "-p", "random", "-n", "20"]
+            + ["-j", "1"],
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertTrue(result.output.startswith("context"))
+        self.assertIn("20 games in", result.output)
+        result = CliRunner().invoke(main, ["selfplay", "-c", "3x5"])
+        self.assertEqual(result.exit_code, 2)
+        result = CliRunner().invoke(main, ["selfplay", "-p", "unknown"])
+        self.assertEqual(result.exit_code, 2)
@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from aiohttp.test_utils import TestClient
+from aiohttp.test_utils import TestServer
+
+from onx.server.ai import AiSocket
+from onx.server.app import get_application
+from onx.server.game import BoxType
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameRegistry
+from onx.server.game import GameStatus
+from onx.server.game import Player
+from onx.server.snapshot import load
+from onx.server.snapshot import OfflineSocket
+
+
+class SnapshotTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "games.snapshot")
+
+    def add_game(self, registry, context, player_ids, turns=()):
+        game = Game(context)
+        for player_id in player_ids:
+            player = Player(id=player_id, ws=None, delta=True)
+            game.add_player(player)
+            registry.active_games[player_id] = game
+        if len(player_ids) == 2:
+            game.toss()
+        for turn in turns:
+            game.turn(game.whose_turn, turn)
+        return game
+
+    async def test_save_and_restore(self):
+        registry = GameRegistry()
+        context = GameContext(grid_size=14, winning_length=5)
+        playing = self.add_game(registry, context, ["a", "b"], (0, 195, 14))
+        awaiting = self.add_game(registry, GameContext(), ["c"])
+        self.add_game(registry, GameContext(), ["d", "e"], (0, 3, 1, 4, 2))
+        computer = self.add_game(registry, GameContext(), ["f", "ai-1"])
+        computer.players[1].ai = True
+        self.assertEqual(registry.save(self.path), 3)
+
+        restored = GameRegistry()
+        restored.snapshot = load(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(sorted(restored.snapshot.index), ["a", "ai-1", "b", "c", "f"])
+        game = restored.restore("b")
+        self.assertIs(restored.active_games["a"], game)
+        self.assertEqual(game.id, playing.id)
+        self.assertEqual(game.context, context)
+        self.assertEqual(game.grid, playing.grid)
+        self.assertEqual(
+            (game.moves, game.seq, game.last_turn, game.status),
+            (3, playing.seq, 14, GameStatus.in_progress),
+        )
+        self.assertEqual(game.whose_turn.id, playing.whose_turn.id)
+        self.assertIsNone(game.winner)
+        for player, saved in zip(game.players, playing.players):
+            self.assertEqual(
+                (player.id, player.box_type, player.delta),
+                (saved.id, saved.box_type, True),
+            )
+            self.assertIsInstance(player.ws, OfflineSocket)
+        self.assertIsNone(restored.restore("a"))
+
+        game = restored.restore("c")
+        self.assertEqual((game.id, game.status), (awaiting.id, GameStatus.awaiting))
+        game = restored.restore("ai-1")
+        self.assertTrue(game.players[1].ai)
+        self.assertIsInstance(game.players[1].ws, AiSocket)
+        self.assertEqual(restored.snapshot.index, {})
+
+    async def test_game_off_the_layout_skipped(self):
+        registry = GameRegistry()
+        context = GameContext(grid_size=15, winning_length=5)
+        self.add_game(registry, context, ["a", "b"], (0, 224))
+        saved = self.add_game(registry, GameContext(), ["c", "d"], (0,))
+        with self.assertLogs("onx.server.snapshot", "WARNING"):
+            self.assertEqual(registry.save(self.path), 1)
+        restored = GameRegistry()
+        restored.snapshot = load(self.path)
+        self.assertEqual(sorted(restored.snapshot.index), ["c", "d"])
+        self.assertEqual(restored.restore("c").grid, saved.grid)
+
+
+class RestartTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch(
+            "onx.settings.SNAPSHOT_PATH", os.path.join(directory.name, "snapshot")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def start(self):
+        client = TestClient(TestServer(get_application()))
+        await client.start_server()
+        return client
+
+    async def connect(self, client, player_id):
+        return await client.ws_connect(
+            "/ws", headers={"Cookie": f"player_id={player_id}"}
+        )
+
+    async def receive(self, ws):
+        return json.loads((await ws.receive(timeout=5)).data)["data"]["payload"]
+
+    async def test_games_survive_restart(self):
+        client = await self.start()
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        sockets = [await self.connect(client, player_id) for player_id in ids]
+        self.assertEqual(
+            (await self.receive(sockets[0]))["status"], GameStatus.awaiting
+        )
+        for ws in sockets:
+            state = await self.receive(ws)
+        acting = ids.index(state["whose_turn"])
+        await sockets[acting].send_json({"operation": "turn", "payload": {"turn": 4}})
+        for ws in sockets:
+            state = await self.receive(ws)
+        await client.close()
+
+        client = await self.start()
+        self.addAsyncCleanup(client.close)
+        self.assertEqual(len(client.app["registry"].snapshot.index), 2)
+        sockets = [await self.connect(client, player_id) for player_id in ids]
+        # every reconnect publishes the restored state, the first player gets
+        # its own and the one of the second player
+        self.assertEqual(await self.receive(sockets[0]), state)
+        self.assertEqual(await self.receive(sockets[1]), state)
+        self.assertEqual(await self.receive(sockets[0]), state)
+        await sockets[1 - acting].send_json(
+            {"operation": "turn", "payload": {"turn": 0}}
+        )
+        for ws in sockets:
+            state = await self.receive(ws)
+            self.assertNotEqual(state["grid"][0], BoxType.empty)
+            self.assertEqual(state["whose_turn"], ids[acting])
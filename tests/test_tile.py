@@ -0,0 +1,38 @@
+import io
+import unittest
+
+from pyfiglet import Figlet  # type: ignore
+from rich.console import Console
+
+from onx.tui.tile import FigletText
+from onx.tui.tile import get_figlet
+from onx.tui.tile import render_glyph
+
+
+class FigletTextTestCase(unittest.TestCase):
+    def setUp(self):
+        render_glyph.cache_clear()
+        self.console = Console(file=io.StringIO(), width=200, height=60)
+
+    def render(self, text, width, height):
+        options = self.console.options.update(width=width, height=height)
+        return self.console.render_lines(FigletText(text), options, pad=False)
+
+    def test_renders_as_figlet(self):
+        for font_name, width in (("mini", 12), ("small", 14), ("big", 40)):
+            for text in ("0", "X", " "):
+                with self.subTest(font_name=font_name, text=text):
+                    self.assertEqual(
+                        render_glyph(text, font_name, width),
+                        Figlet(font=font_name, width=width)
+                        .renderText(text)
+                        .rstrip("\n"),
+                    )
+
+    def test_redraws_hit_cache(self):
+        for _ in range(3):
+            for text in ("0", "X", " "):
+                self.render(text, 20, 10)
+        info = render_glyph.cache_info()
+        self.assertEqual((info.misses, info.hits), (3, 6))
+        self.assertIs(get_figlet("standard"), get_figlet("standard"))
@@ -0,0 +1,12 @@
+import re
+import unittest
+from pathlib import Path
+
+from onx import __version__
+
+
+class VersionTestCase(unittest.TestCase):
+    def test_version_matches_project(self):
+        pyproject = (Path(__file__).parent.parent / "pyproject.toml").read_text()
+        match = re.search(r'^version = "(.+)"$', pyproject, re.MULTILINE)
+        self.assertEqual(__version__, match.group(1))
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from onx.server.game import Game
+from onx.server.game import GameContext
+from onx.server.game import GameStatus
+from onx.server.game import Player
+from onx.server.watchers import Broadcast
+from onx.server.watchers import stream
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.frames: list[str] = []
+        self.closed = False
+
+    async def send_str(self, frame: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class BroadcastTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_frames_are_coalesced(self):
+        broadcast = Broadcast()
+        broadcast.publish("1")
+        ws = FakeWebSocket(delay=0.05)
+        watcher = asyncio.create_task(stream(ws, broadcast))
+        await asyncio.sleep(0.01)
+        for frame in ("2", "3", "4"):
+            broadcast.publish(frame)
+        await asyncio.sleep(0.01)
+        broadcast.publish("5", final=True)
+        await asyncio.wait_for(watcher, 1)
+        self.assertEqual(ws.frames, ["1", "5"])
+        self.assertTrue(ws.closed)
+        self.assertEqual(broadcast.watchers, 0)
+
+    @mock.patch("onx.settings.WS_SEND_TIMEOUT", 0.01)
+    async def test_slow_watcher_is_dropped(self):
+        broadcast = Broadcast()
+        slow, alive = FakeWebSocket(delay=60), FakeWebSocket()
+        watchers = [asyncio.create_task(stream(ws, broadcast)) for ws in (slow, alive)]
+        broadcast.publish("1")
+        await asyncio.wait_for(watchers[0], 1)
+        self.assertTrue(slow.closed)
+        self.assertEqual(slow.frames, [])
+        self.assertEqual(alive.frames, ["1"])
+        self.assertEqual(broadcast.watchers, 1)
+        watchers[1].cancel()
+
+    async def test_game_publishes_to_watchers(self):
+        game = Game(GameContext())
+        for _ in range(2):
+            game.add_player(Player(id=str(uuid.uuid4()), ws=FakeWebSocket()))
+        ws = FakeWebSocket()
+        watcher = asyncio.create_task(stream(ws, game.watch()))
+        game.toss()
+        await game.publish_state()
+        for turn in (0, 3, 1, 4, 2):
+            game.turn(game.whose_turn, turn)
+            await game.publish_state(delta=True)
+            await asyncio.sleep(0)
+        await asyncio.wait_for(watcher, 1)
+        self.assertEqual(game.status, GameStatus.finished)
+        self.assertEqual(json.loads(ws.frames[-1]), game.state_event().dict())
+        self.assertTrue(ws.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
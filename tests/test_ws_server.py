@@ -1,13 +1,22 @@
+import asyncio
 import json
+import tempfile
 import unittest
 import uuid
 
+import aiohttp
 from aiohttp.test_utils import AioHTTPTestCase
 
+from onx import binary
 from onx.server.app import get_application
 from onx.server.game import BoxType
 from onx.server.game import GameStatus
 from onx.server.game import Player
+from onx.server.journal import EventKind
+from onx.server.journal import Journal
+from onx.server.journal import player_key
+from onx.server.journal import read_journal
+from onx.server.snapshot import OfflineSocket
 
 
 class WebsocketServerTestCase(AioHTTPTestCase):
@@ -93,6 +102,34 @@ class WebsocketServerTestCase(AioHTTPTestCase):
             expected_winner=self.acting.id,
         )
 
+    async def test_journal(self):
+        registry = self.app["registry"]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry.journal = Journal(directory.name)
+        await self.connect_players()
+        winner = self.acting.id
+        for box_num in (0, 1, 3, 4):
+            await self.turn(
+                box_num=box_num, expected_game_status=GameStatus.in_progress
+            )
+        await self.turn(
+            box_num=6, expected_game_status=GameStatus.finished, expected_winner=winner
+        )
+        await registry.journal.stop()
+        records = list(read_journal(directory.name))
+        self.assertEqual(
+            [record.kind for record in records],
+            [EventKind.created, EventKind.started, EventKind.started]
+            + [EventKind.turn] * 5
+            + [EventKind.finished],
+        )
+        self.assertEqual(len({record.game_id for record in records}), 1)
+        self.assertEqual(records[0].player, player_key(self.players[0].id))
+        self.assertEqual([record.value for record in records[3:8]], [0, 1, 3, 4, 6])
+        self.assertEqual(records[-1].player, player_key(winner))
+        self.assertEqual(records[-1].value, 5)
+
     async def test_drawn_game(self):
         await self.connect_players()
 
@@ -106,6 +143,106 @@ class WebsocketServerTestCase(AioHTTPTestCase):
         await self.turn(box_num=5, expected_game_status=GameStatus.in_progress)
         await self.turn(box_num=3, expected_game_status=GameStatus.finished)
 
+    async def test_finished_game_is_evicted(self):
+        await self.connect_players()
+        registry = self.app["registry"]
+        for player in self.players:
+            self.assertIn(player.id, registry.active_games)
+
+        for box_num in (0, 1, 3, 4):
+            await self.turn(
+                box_num=box_num, expected_game_status=GameStatus.in_progress
+            )
+        await self.turn(
+            box_num=6,
+            expected_game_status=GameStatus.finished,
+            expected_winner=self.acting.id,
+        )
+        for player in self.players:
+            self.assertNotIn(player.id, registry.active_games)
+            self.assertIn(player.id, registry.finished_games)
+
+    async def test_awaiting_game_is_evicted(self):
+        registry = self.app["registry"]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry.journal = Journal(directory.name)
+        player = await self.connect_player()
+        await player.ws.receive()
+        self.assertIn(player.id, registry.active_games)
+        await player.ws.close()
+        for _ in range(100):
+            if player.id not in registry.active_games:
+                break
+            await asyncio.sleep(0.01)
+        self.assertNotIn(player.id, registry.active_games)
+        self.assertEqual(registry.awaiting, {})
+        await registry.journal.stop()
+        self.assertEqual(
+            [record.kind for record in read_journal(directory.name)],
+            [EventKind.created, EventKind.closed],
+        )
+
+    async def test_watch_game(self):
+        await self.connect_players()
+        game = self.app["registry"].active_games[self.acting.id]
+        watcher = await self.client.ws_connect(f"/ws/watch/{game.id}")
+        state = json.loads((await watcher.receive()).data)
+        self.assertEqual(state["data"]["payload"]["status"], GameStatus.in_progress)
+
+        for box_num in (0, 1, 3, 4):
+            await self.turn(
+                box_num=box_num, expected_game_status=GameStatus.in_progress
+            )
+        await self.turn(
+            box_num=6,
+            expected_game_status=GameStatus.finished,
+            expected_winner=self.acting.id,
+        )
+        # the watcher gets the latest state, intermediate ones may be coalesced
+        while state["data"]["payload"]["status"] != GameStatus.finished:
+            state = json.loads((await watcher.receive()).data)
+        self.assertEqual(state, game.state_event().dict())
+        self.assertEqual((await watcher.receive()).type, aiohttp.WSMsgType.CLOSE)
+
+    async def test_watch_unknown_game_error(self):
+        watcher = await self.client.ws_connect(f"/ws/watch/{uuid.uuid4().hex}")
+        response = json.loads((await watcher.receive()).data)
+        self.assertEqual(response["data"]["payload"]["message"], "game not found error")
+
+    async def test_metrics(self):
+        await self.connect_players()
+        await self.turn(box_num=0, expected_game_status=GameStatus.in_progress)
+        await self.acting.ws.send_json({"operation": "turn", "payload": {"turn": 0}})
+        await self.acting.ws.receive()
+        # the socket of the rejected turn is closed
+        await self.acting.ws.receive()
+        response = await self.client.get("/metrics")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        lines = (await response.text()).splitlines()
+        self.assertIn("onx_active_games 1", lines)
+        self.assertIn('onx_open_websockets{kind="player"} 1', lines)
+        self.assertIn("onx_turns_total 1", lines)
+        self.assertIn('onx_game_errors_total{error="BoxIsNotEmptyError"} 1', lines)
+        self.assertIn('onx_game_errors_total{error="NotYourTurnError"} 0', lines)
+        self.assertIn("onx_turn_seconds_count 1", lines)
+        self.assertIn("onx_publish_seconds_count 1", lines)
+        self.assertIn('onx_match_seconds_count{context="3x3"} 2', lines)
+
+    async def test_disconnected_player_socket_released(self):
+        await self.connect_players()
+        await self.turn(box_num=0, expected_game_status=GameStatus.in_progress)
+        game = self.app["registry"].active_games[self.acting.id]
+        await self.acting.ws.close()
+        (player,) = [player for player in game.players if player.id == self.acting.id]
+        for _ in range(100):
+            if isinstance(player.ws, OfflineSocket):
+                break
+            await asyncio.sleep(0.01)
+        self.assertIsInstance(player.ws, OfflineSocket)
+        self.assertIs(self.app["registry"].active_games[self.acting.id], game)
+
     async def test_retrieve_game_after_disconnection(self):
         await self.connect_players()
 
@@ -135,6 +272,22 @@ class WebsocketServerTestCase(AioHTTPTestCase):
             },
         )
 
+    async def test_cookie_game_bounds_error(self):
+        for cookie in (
+            "grid_size=15",
+            "grid_size=2",
+            "winning_length=6",
+            "grid_size=4;winning_length=5",
+        ):
+            with self.subTest(cookie=cookie):
+                ws = await self.client.ws_connect(
+                    "/ws", headers={"Cookie": f"player_id=player;{cookie}"}
+                )
+                response = json.loads((await ws.receive()).data)
+                self.assertEqual(response["data"]["event"], "error")
+                self.assertEqual(self.app["registry"].active_games, {})
+                await ws.close()
+
     async def test_not_your_turn_error(self):
         await self.connect_players()
         await self.awaiting.ws.send_json({"operation": "turn", "payload": {"turn": 0}})
@@ -174,6 +327,72 @@ class WebsocketServerTestCase(AioHTTPTestCase):
             },
         )
 
+    async def test_delta_mode(self):
+        players = []
+        for _ in range(2):
+            player_id = str(uuid.uuid4())
+            ws = await self.client.ws_connect(
+                "/ws", headers={"Cookie": f"player_id={player_id};delta=true"}
+            )
+            players.append(Player(id=player_id, ws=ws))
+        await players[0].ws.receive()
+        snapshot = json.loads((await players[0].ws.receive()).data)
+        self.assertEqual(snapshot["data"]["event"], "game_snapshot")
+        self.assertEqual(snapshot, json.loads((await players[1].ws.receive()).data))
+        seq = snapshot["data"]["payload"]["seq"]
+        whose_turn = snapshot["data"]["payload"]["whose_turn"]
+        acting = [p for p in players if p.id == whose_turn][0]
+
+        await acting.ws.send_json({"operation": "turn", "payload": {"turn": 4}})
+        delta = json.loads((await players[0].ws.receive()).data)
+        self.assertEqual(delta, json.loads((await players[1].ws.receive()).data))
+        self.assertEqual(delta["data"]["event"], "game_delta")
+        self.assertEqual(delta["data"]["payload"]["seq"], seq + 1)
+        self.assertEqual(delta["data"]["payload"]["turn"], 4)
+        self.assertNotEqual(delta["data"]["payload"]["whose_turn"], acting.id)
+        self.assertNotEqual(delta["data"]["payload"]["box_type"], BoxType.empty)
+
+        await acting.ws.send_json({"operation": "resync"})
+        snapshot = json.loads((await acting.ws.receive()).data)
+        self.assertEqual(snapshot["data"]["event"], "game_snapshot")
+        self.assertEqual(snapshot["data"]["payload"]["seq"], seq + 1)
+        self.assertEqual(
+            snapshot["data"]["payload"]["grid"][4], delta["data"]["payload"]["box_type"]
+        )
+
+    async def test_binary_protocol(self):
+        players = []
+        for _ in range(2):
+            player_id = str(uuid.uuid4())
+            ws = await self.client.ws_connect(
+                "/ws",
+                protocols=(binary.PROTOCOL,),
+                headers={"Cookie": f"player_id={player_id}"},
+            )
+            self.assertEqual(ws.protocol, binary.PROTOCOL)
+            players.append(Player(id=player_id, ws=ws))
+        await players[0].ws.receive()
+        events = [
+            binary.decode_event((await player.ws.receive()).data, player.id)
+            for player in players
+        ]
+        acting = [
+            player
+            for player, event in zip(players, events)
+            if event.data.payload.whose_turn == player.id
+        ][0]
+
+        await acting.ws.send_bytes(bytes([binary.MessageType.turn, 4]))
+        for player in players:
+            event = binary.decode_event((await player.ws.receive()).data, player.id)
+            self.assertEqual(event.data.payload.status, GameStatus.in_progress)
+            self.assertNotEqual(event.data.payload.grid[4], BoxType.empty)
+            self.assertNotEqual(event.data.payload.whose_turn, acting.id)
+
+        await acting.ws.send_bytes(bytes([binary.MessageType.turn, 5]))
+        event = binary.decode_event((await acting.ws.receive()).data, acting.id)
+        self.assertEqual(event.data.payload.message, "not your turn error")
+
     async def test_turn_without_second_player_error(self):
         player = await self.connect_player()
         await player.ws.receive()